@@ -0,0 +1,403 @@
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import dashboard_data
+import fetch
+from calendar_dim import GRANULARITIES
+from category_filter import decode_mask, encode_mask
+from clustering import DEFAULT_K
+from cohorts import METRICS
+
+# Layanan agregat lokal: satu proses menghitung (dan meng-cache) agregat dashboard,
+# beberapa proses Streamlit mengambilnya lewat HTTP, contoh:
+#   python aggregate_api.py --port 8600
+#   AGGREGATE_API_URL=http://127.0.0.1:8600 streamlit run app_dinamyc.py
+API_URL = os.environ.get("AGGREGATE_API_URL", "")
+API_PORT = int(os.environ.get("AGGREGATE_API_PORT", "8600"))
+# Jumlah respons (per endpoint, parameter, format, dan versi data) yang disimpan di server
+CACHE_ENTRIES = int(os.environ.get("AGGREGATE_API_CACHE", "256"))
+
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+JSON_TYPE = "application/json"
+
+logger = logging.getLogger(__name__)
+
+
+# ----- Format respons: frame sebagai Arrow IPC stream atau JSON (orient="table") -----
+
+def frame_to_arrow(df):
+    import pyarrow as pa
+
+    # Nama kolom Arrow harus string (kolom boolean False/True dari tabel kota dikembalikan oleh klien)
+    table = pa.Table.from_pandas(df.rename(columns=str))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def frame_from_arrow(body):
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(body).read_all().to_pandas()
+
+
+def frame_to_json(df):
+    return df.rename(columns=str).to_json(orient="table", date_format="iso").encode()
+
+
+def frame_from_json(body):
+    return pd.read_json(io.BytesIO(body), orient="table")
+
+
+def _restore_columns(df):
+    return df.rename(columns={"False": False, "True": True})
+
+
+# ----- Server -----
+
+def _filter_state(params):
+    # Parameter filter: start, end (tanggal ISO), categories (bitmask hex, default semua kategori)
+    min_date, max_date, product_categories = dashboard_data.filter_options()
+    start = date.fromisoformat(params["start"]) if "start" in params else min_date.date()
+    end = date.fromisoformat(params["end"]) if "end" in params else max_date.date()
+    if "categories" in params:
+        mask = decode_mask(params["categories"], len(product_categories))
+    else:
+        mask = np.ones(len(product_categories), dtype=bool)
+    return start, end, mask
+
+
+def _granularity(params):
+    granularity = params.get("granularity", "month")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity harus salah satu dari {list(GRANULARITIES)}")
+    return granularity
+
+
+def _as_of(params):
+    if "as_of" in params:
+        return date.fromisoformat(params["as_of"])
+    return dashboard_data.load_latest_delivery(dashboard_data.version_of("load_latest_delivery"))
+
+
+_frames_cache = OrderedDict()
+_frames_lock = threading.Lock()
+
+
+def _frames(params):
+    # Semua frame grafik untuk satu state filter dihitung sekali, dipakai bersama oleh endpoint-endpoint filter
+    start, end, mask = _filter_state(params)
+    granularity = _granularity(params)
+    key = (start, end, encode_mask(mask), granularity, dashboard_data.version_of("load_segments"))
+    with _frames_lock:
+        if key in _frames_cache:
+            _frames_cache.move_to_end(key)
+            return _frames_cache[key]
+    frames = dashboard_data.filtered_frames(start, end, mask, granularity)
+    with _frames_lock:
+        _frames_cache[key] = frames
+        while len(_frames_cache) > 32:
+            _frames_cache.popitem(last=False)
+    return frames
+
+
+def _meta(params):
+    min_date, max_date, product_categories = dashboard_data.filter_options()
+    return {
+        "backend": dashboard_data.QUERY_BACKEND,
+        "min_date": min_date.isoformat(),
+        "max_date": max_date.isoformat(),
+        "categories": [str(category) for category in product_categories],
+        "latest_delivery": _as_of({}).isoformat(),
+        "granularities": list(GRANULARITIES),
+    }
+
+
+def _rfm(params):
+    return dashboard_data.load_rfm(_as_of(params), dashboard_data.version_of("load_rfm"))
+
+
+def _rfm_customer(params):
+    if "customer_id" not in params:
+        raise ValueError("Parameter customer_id wajib diisi")
+    lookup = dashboard_data.load_rfm_lookup(_as_of(params), dashboard_data.version_of("load_rfm_lookup"))
+    return lookup.explain(params["customer_id"])
+
+
+def _late_review_stats(params):
+    return dashboard_data.load_late_review_stats(_frames(params)["df_late_and_reviews"])
+
+
+def _complexity_groups(params):
+    k = int(params.get("k", DEFAULT_K))
+    if not 2 <= k <= 20:
+        raise ValueError("k harus di antara 2 dan 20")
+    return dashboard_data.load_complexity_groups(k, dashboard_data.version_of("load_complexity_groups"))
+
+
+def _cohorts(params):
+    metric = params.get("metric", "retention")
+    if metric not in METRICS:
+        raise ValueError(f"metric harus salah satu dari {list(METRICS)}")
+    return dashboard_data.load_cohorts(dashboard_data.version_of("load_cohorts"))[metric]
+
+
+FILTER_PARAMS = ("start", "end", "categories", "granularity")
+
+# Endpoint: (fungsi, parameter yang dipakai, node CACHE_GRAPH untuk versi data, hasil berupa frame?)
+ENDPOINTS = {
+    "meta": (_meta, (), "load_segments", False),
+    "delivery_status": (lambda params: _frames(params)["df_late"], FILTER_PARAMS, "load_segments", True),
+    "period_status": (lambda params: _frames(params)["df_period_status"], FILTER_PARAMS, "load_segments", True),
+    "top_cities": (lambda params: _frames(params)["df_top10_city_status"], FILTER_PARAMS, "load_segments", True),
+    "late_and_reviews": (lambda params: _frames(params)["df_late_and_reviews"], FILTER_PARAMS, "load_segments", True),
+    "late_review_stats": (_late_review_stats, FILTER_PARAMS, "load_segments", False),
+    "state_geo": (lambda params: _frames({})["df_state_grouped"], (), "load_state_grouped", True),
+    "delivery_by_state": (lambda params: _frames(params)["df_delivery_state"], FILTER_PARAMS, "load_segments", True),
+    "delivery_by_category": (
+        lambda params: _frames(params)["df_delivery_category"], FILTER_PARAMS, "load_segments", True
+    ),
+    # Perbandingan antar tahun hanya bergantung pada kategori (selalu seluruh riwayat)
+    "year_over_year": (lambda params: _frames(params)["df_year_over_year"], ("categories",), "load_status_index", True),
+    "rfm": (_rfm, ("as_of",), "load_rfm", True),
+    "rfm_customer": (_rfm_customer, ("as_of", "customer_id"), "load_rfm_lookup", False),
+    "complexity_groups": (_complexity_groups, ("k",), "load_complexity_groups", True),
+    "cohorts": (_cohorts, ("metric",), "load_cohorts", True),
+}
+
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+# Satu lock per ETag: request bersamaan untuk hasil yang sama menunggu satu perhitungan saja
+_etag_locks = {}
+
+
+def response_etag(endpoint, query, fmt):
+    # ETag ditentukan oleh endpoint, parameter, format, dan versi data (hasil deterministik per versi),
+    # sehingga request kondisional bisa dijawab 304 tanpa menghitung apa pun
+    _, names, node, is_frame = ENDPOINTS[endpoint]
+    params = {name: query[name] for name in names if query.get(name)}
+    fmt = fmt if is_frame else "json"
+    key = json.dumps([endpoint, sorted(params.items()), fmt, dashboard_data.version_of(node)], default=str)
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:24] + '"', params, fmt
+
+
+def render(endpoint, query, fmt):
+    # Mengembalikan (content type, body, etag) dari cache respons, atau menghitungnya sekali
+    etag, params, fmt = response_etag(endpoint, query, fmt)
+    function, _, _, is_frame = ENDPOINTS[endpoint]
+    with _responses_lock:
+        if etag in _responses:
+            _responses.move_to_end(etag)
+            return _responses[etag]
+        lock = _etag_locks.setdefault(etag, threading.Lock())
+
+    with lock:
+        with _responses_lock:
+            if etag in _responses:
+                return _responses[etag]
+        try:
+            result = function(params)
+            if not is_frame:
+                response = (JSON_TYPE, json.dumps(result, default=str).encode(), etag)
+            elif fmt == "arrow":
+                response = (ARROW_TYPE, frame_to_arrow(result), etag)
+            else:
+                response = (JSON_TYPE, frame_to_json(result), etag)
+        except BaseException:
+            with _responses_lock:
+                _etag_locks.pop(etag, None)
+            raise
+        # Respons disimpan sebelum lock per ETag dilepas (dalam satu critical section), sehingga permintaan
+        # berikutnya selalu menemukan respons atau lock yang sama dan tidak menghitung ulang
+        with _responses_lock:
+            _responses[etag] = response
+            while len(_responses) > CACHE_ENTRIES:
+                _responses.popitem(last=False)
+            _etag_locks.pop(etag, None)
+    return response
+
+
+class _AggregateHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 agar klien dashboard memakai ulang koneksi (keep-alive)
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, body=b"", content_type=JSON_TYPE, etag=None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            # Klien selalu memvalidasi ulang; jawaban 304 tidak membawa isi
+            self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint = url.path.strip("/")
+        query = dict(parse_qsl(url.query))
+        if endpoint not in ENDPOINTS:
+            self._send(404, json.dumps({"error": f"Endpoint tidak dikenal: {endpoint}",
+                                        "endpoints": sorted(ENDPOINTS)}).encode())
+            return
+
+        fmt = query.pop("format", "arrow" if ARROW_TYPE in self.headers.get("Accept", "") else "json")
+        if fmt not in ("arrow", "json"):
+            self._send(400, json.dumps({"error": "format harus arrow atau json"}).encode())
+            return
+        try:
+            etag = response_etag(endpoint, query, fmt)[0]
+            if etag in self.headers.get("If-None-Match", ""):
+                self._send(304, etag=etag)
+                return
+            content_type, body, etag = render(endpoint, query, fmt)
+        except ValueError as exc:
+            self._send(400, json.dumps({"error": str(exc)}).encode())
+            return
+        except Exception as exc:
+            logger.exception("Gagal menghitung %s", self.path)
+            self._send(500, json.dumps({"error": repr(exc)}).encode())
+            return
+        self._send(200, body, content_type, etag)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def serve(host="127.0.0.1", port=API_PORT):
+    server = ThreadingHTTPServer((host, port), _AggregateHandler)
+    server.daemon_threads = True
+    return server
+
+
+# ----- Klien (mode klien app_dinamyc.py) -----
+
+class AggregateClient:
+    def __init__(self, base_url, max_entries=128):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.max_entries = max_entries
+        # Respons terakhir per URL beserta ETag-nya, untuk request kondisional (If-None-Match)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, endpoint, frame=True, **params):
+        params = {name: value for name, value in params.items() if value is not None}
+        url = self.base_url + endpoint + ("?" + urlencode(sorted(params.items())) if params else "")
+        with self._lock:
+            cached = self._cache.get(url)
+        headers = {"Accept": ARROW_TYPE if frame else JSON_TYPE}
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+
+        response = fetch.session().get(url, headers=headers, timeout=fetch.TIMEOUT)
+        if response.status_code == 304 and cached is not None:
+            value = cached[1]
+        else:
+            if response.status_code >= 400:
+                try:
+                    message = response.json()["error"]
+                except (ValueError, KeyError):
+                    message = response.text
+                raise RuntimeError(f"Layanan agregat {endpoint}: {response.status_code} {message}")
+            if not frame:
+                value = response.json()
+            elif response.headers.get("Content-Type") == ARROW_TYPE:
+                value = _restore_columns(frame_from_arrow(response.content))
+            else:
+                value = _restore_columns(frame_from_json(response.content))
+            with self._lock:
+                self._cache[url] = (response.headers.get("ETag"), value)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        # Salinan, karena dashboard mengubah frame (misalnya label status) setelah diterima
+        return value.copy() if frame else value
+
+    def _filter_params(self, start_date, end_date, category_mask, granularity=None):
+        return {
+            "start": start_date.isoformat(), "end": end_date.isoformat(),
+            "categories": encode_mask(category_mask), "granularity": granularity,
+        }
+
+    def filter_options(self):
+        meta = self._get("meta", frame=False)
+        return (
+            pd.Timestamp(meta["min_date"]), pd.Timestamp(meta["max_date"]),
+            pd.Index(meta["categories"], dtype=object)
+        )
+
+    def latest_delivery(self):
+        return date.fromisoformat(self._get("meta", frame=False)["latest_delivery"])
+
+    def filtered_frames(self, start_date, end_date, category_mask, granularity):
+        params = self._filter_params(start_date, end_date, category_mask, granularity)
+        return {
+            'df_late': self._get("delivery_status", **params),
+            'df_period_status': self._get("period_status", **params),
+            'df_top10_city_status': self._get("top_cities", **params),
+            'df_late_and_reviews': self._get("late_and_reviews", **params),
+            'df_state_grouped': self._get("state_geo"),
+            'df_delivery_state': self._get("delivery_by_state", **params),
+            'df_delivery_category': self._get("delivery_by_category", **params),
+            'df_year_over_year': self._get("year_over_year", categories=params["categories"]),
+        }
+
+    def late_review_stats(self, start_date, end_date, category_mask, granularity=None):
+        params = self._filter_params(start_date, end_date, category_mask, granularity)
+        return self._get("late_review_stats", frame=False, **params)
+
+    def rfm(self, as_of):
+        return self._get("rfm", as_of=as_of.isoformat())
+
+    def rfm_customer(self, as_of, customer_id):
+        return self._get("rfm_customer", frame=False, as_of=as_of.isoformat(), customer_id=customer_id)
+
+    def complexity_groups(self, k):
+        return self._get("complexity_groups", k=k)
+
+    def cohorts(self, metric):
+        return self._get("cohorts", metric=metric)
+
+
+_client = None
+
+
+def client():
+    # Klien bersama per proses jika AGGREGATE_API_URL diisi, None jika dashboard menghitung agregat sendiri
+    global _client
+    if API_URL and _client is None:
+        _client = AggregateClient(API_URL)
+    return _client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Layanan HTTP agregat dashboard (JSON/Arrow, dengan ETag)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = serve(args.host, args.port)
+    logger.info("Layanan agregat di http://%s:%d/ (endpoint: %s)", args.host, server.server_port, ", ".join(ENDPOINTS))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
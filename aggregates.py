@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+from calendar_dim import GRANULARITIES, calendar_dimension, status_by_period
+from category_filter import category_row_mask
+
+
+def city_day_partials(df):
+    # Agregat parsial per (kategori, hari, kota): cukup dijumlahkan untuk seleksi apa pun
+    partial = pd.DataFrame({
+        'category_code': df['product_category_name_english'].cat.codes.to_numpy(),
+        'order_day': df['order_purchase_timestamp'].dt.normalize(),
+        'customer_city': df['customer_city'],
+        'on_time_orders': (df['delivered_late'] == False) & df['order_id'].notna(),
+        'late_orders': (df['delivered_late'] == True) & df['order_id'].notna(),
+        'review_sum': df['calculated_review_score'].fillna(0),
+        'review_count': df['calculated_review_score'].notna(),
+    })
+    return partial.groupby(
+        ['category_code', 'order_day', 'customer_city'], sort=False, observed=True
+    ).agg(
+        on_time_orders=('on_time_orders', 'sum'),
+        late_orders=('late_orders', 'sum'),
+        review_sum=('review_sum', 'sum'),
+        review_count=('review_count', 'sum'),
+    ).reset_index()
+
+
+def combine_city_partials(parts):
+    # Agregat parsial dari beberapa batch/segmen digabung dengan menjumlahkan kunci yang sama
+    return pd.concat(parts, ignore_index=True).groupby(
+        ['category_code', 'order_day', 'customer_city'], sort=False, observed=True
+    ).sum().reset_index()
+
+
+def _select_partials(partials, start_date, end_date, category_mask):
+    return partials[
+        (partials['order_day'] >= pd.Timestamp(start_date)) &
+        (partials['order_day'] <= pd.Timestamp(end_date)) &
+        category_row_mask(category_mask, partials['category_code'].to_numpy())
+    ]
+
+
+def late_and_reviews_from_partials(partials, start_date, end_date, category_mask):
+    selected = _select_partials(partials, start_date, end_date, category_mask)
+    totals = selected.groupby('customer_city')[['late_orders', 'review_sum', 'review_count']].sum()
+
+    # Kota tanpa pesanan terlambat atau tanpa review tidak ditampilkan (sama seperti dropna sebelumnya)
+    totals = totals[(totals['late_orders'] > 0) & (totals['review_count'] > 0)]
+    return pd.DataFrame({
+        'late_orders': totals['late_orders'],
+        'avg_review_score': totals['review_sum'] / totals['review_count'],
+    })
+
+
+def daily_status_counts(df, days):
+    # Jumlah pesanan per (hari, kategori, status) untuk rentang hari days; bisa dijumlahkan antar batch
+    order_day = df['order_purchase_timestamp'].dt.normalize()
+    n_categories = len(df['product_category_name_english'].cat.categories)
+
+    day_pos = ((order_day - days[0]) // pd.Timedelta(days=1)).to_numpy()
+    codes = df['product_category_name_english'].cat.codes.to_numpy()
+    status = df['delivered_late'].map({False: 0, True: 1})
+    valid = (codes >= 0) & status.notna().to_numpy() & df['order_id'].notna().to_numpy()
+
+    # Status 0 = tepat waktu, 1 = terlambat
+    flat = (day_pos[valid].astype(np.int64) * n_categories + codes[valid]) * 2 + status[valid].astype(int).to_numpy()
+    return np.bincount(flat, minlength=len(days) * n_categories * 2).reshape(len(days), n_categories, 2)
+
+
+def status_index_from_counts(days, counts):
+    n_categories = counts.shape[1]
+    cumulative = np.zeros((len(days) + 1, n_categories, 2), dtype=np.int64)
+    np.cumsum(counts, axis=0, out=cumulative[1:])
+    return {'days': days, 'cumulative': cumulative, 'calendar': calendar_dimension(days)}
+
+
+def _date_bounds(index, start_date, end_date):
+    days = index['days']
+    lo = days.searchsorted(pd.Timestamp(start_date), side='left')
+    hi = days.searchsorted(pd.Timestamp(end_date), side='right')
+    return lo, max(lo, hi)
+
+
+def status_totals(index, start_date, end_date, category_mask):
+    lo, hi = _date_bounds(index, start_date, end_date)
+    cumulative = index['cumulative']
+    return (cumulative[hi] - cumulative[lo])[category_mask].sum(axis=0)
+
+
+def delivery_status_counts(index, start_date, end_date, category_mask):
+    # Setara dengan filtered_df.groupby('delivered_late')['order_id'].count()
+    totals = status_totals(index, start_date, end_date, category_mask)
+    df_late = pd.DataFrame({'delivered_late': [False, True], 'order_id': totals})
+    return df_late[df_late['order_id'] > 0].reset_index(drop=True)
+
+
+def period_status_counts(index, start_date, end_date, category_mask, granularity='month'):
+    # Jumlah per periode (bulan/minggu/kuartal): selisih prefix sum di setiap batas periode,
+    # batas periode diambil dari kunci integer dimensi kalender
+    lo, hi = _date_bounds(index, start_date, end_date)
+    period_keys = index['calendar'][GRANULARITIES[granularity][0]].to_numpy()[lo:hi]
+    starts = np.flatnonzero(np.r_[True, period_keys[1:] != period_keys[:-1]]) + lo if hi > lo else np.array([], dtype=int)
+    bounds = np.concatenate([starts, [hi]])
+
+    per_period = np.diff(index['cumulative'][bounds], axis=0)[:, category_mask, :].sum(axis=1)
+    return status_by_period(per_period, period_keys[starts - lo], granularity)
+
+
+def top_city_status(partials, start_date, end_date, category_mask, n=10):
+    # Hitung jumlah pengiriman per kota dan status dari agregat parsial per (kategori, hari, kota)
+    totals = _select_partials(partials, start_date, end_date, category_mask).groupby(
+        'customer_city', observed=True
+    )[['on_time_orders', 'late_orders']].sum()
+    df_city_status = totals[totals.sum(axis=1) > 0].set_axis(
+        pd.Index([False, True], name='delivered_late'), axis=1
+    )
+
+    # Ambil n kota teratas berdasarkan total pengiriman
+    top_cities = df_city_status.sum(axis=1).nlargest(n).index
+    return df_city_status.loc[top_cities]
+
+
+def state_partials(df):
+    # Agregat parsial per state yang bisa digabung antar batch: pasangan unik (state, hash customer_id)
+    # untuk nunique, serta jumlah dan cacah koordinat untuk rata-rata
+    customers = df['customer_id'].notna() & df['customer_state'].notna()
+    pairs = pd.DataFrame({
+        'customer_state': df['customer_state'][customers].astype(object).to_numpy(),
+        'customer_hash': pd.util.hash_array(df['customer_id'][customers].astype(object).to_numpy()),
+    }).drop_duplicates()
+    sums = df.groupby('customer_state', observed=True).agg(
+        lat_sum=('geolocation_lat_cons', 'sum'),
+        lat_count=('geolocation_lat_cons', 'count'),
+        lng_sum=('geolocation_lng_cons', 'sum'),
+        lng_count=('geolocation_lng_cons', 'count'),
+    )
+    sums.index = sums.index.astype(object)
+    return pairs, sums
+
+
+def combine_state_partials(parts):
+    pairs = pd.concat([pairs for pairs, _ in parts], ignore_index=True).drop_duplicates()
+    sums = pd.concat([sums for _, sums in parts]).groupby(level=0).sum()
+    return pairs, sums
+
+
+def state_counts_from_partials(partials):
+    # Setara dengan state_customer_counts atas seluruh data
+    pairs, sums = partials
+    counts = pairs.groupby('customer_state').size().reindex(sums.index, fill_value=0)
+    return pd.DataFrame({
+        'customer_state': sums.index.to_numpy(),
+        'customer_count': counts.to_numpy(),
+        'geolocation_lat_cons': (sums['lat_sum'] / sums['lat_count'].where(sums['lat_count'] > 0)).to_numpy(),
+        'geolocation_lng_cons': (sums['lng_sum'] / sums['lng_count'].where(sums['lng_count'] > 0)).to_numpy(),
+    })
@@ -1,20 +1,24 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 import plotly.express as px
 import matplotlib.pyplot as plt
 import squarify
-from datetime import datetime
-import geopandas as gpd
-from shapely.geometry import Point
+from dashboard_data import load_late_review_stats, load_static, load_world, prefetch_static
+from memtrack import record_rerun
+from profiling import finish_rerun, start_rerun
 
 st.set_page_config(layout="wide")
 
+profiler = start_rerun(__file__)
+
 st.title("Delivery Time Dashboard")
 st.text("Dashboard for analyzing late delivery and its impact for customer review")
 st.text("By: Joko Eliyanto")
 
+# Semua artefak diunduh bersamaan sekali di awal, grafik di bawah membaca dari cache
+prefetch_static()
 
-df_late = pd.read_csv('https://raw.githubusercontent.com/jokoeliyanto/dicoding_analisis_data/refs/heads/main/df_late.csv')
+df_late = load_static('df_late.csv')
 
 fig_pie = px.pie(
     df_late,
@@ -30,7 +34,7 @@ fig_pie = px.pie(
 )
 
 
-df_monthly_status = pd.read_csv('https://raw.githubusercontent.com/jokoeliyanto/dicoding_analisis_data/refs/heads/main/df_monthly_status.csv')
+df_monthly_status = load_static('df_monthly_status.csv')
 
 fig_bar = px.bar(
     df_monthly_status,
@@ -48,7 +52,7 @@ fig_bar = px.bar(
 fig_bar.update_layout(barmode='stack', xaxis_tickangle=-45)
 
 
-df_top10_city_status_long = pd.read_csv('https://raw.githubusercontent.com/jokoeliyanto/dicoding_analisis_data/refs/heads/main/df_top10_city_status_long.csv')
+df_top10_city_status_long = load_static('df_top10_city_status_long.csv')
 fig_city = px.bar(
     df_top10_city_status_long,
     x='order_count',
@@ -69,7 +73,7 @@ fig_city.update_layout(
     legend_title='Delivery Status'
 )
 
-df_late_and_reviews = pd.read_csv('https://raw.githubusercontent.com/jokoeliyanto/dicoding_analisis_data/refs/heads/main/df_late_and_reviews.csv')
+df_late_and_reviews = load_static('df_late_and_reviews.csv')
 
 fig_scatter = px.scatter(
     df_late_and_reviews,
@@ -82,6 +86,17 @@ fig_scatter = px.scatter(
     opacity=0.7
 )
 
+late_review_stats = load_late_review_stats(df_late_and_reviews)
+if late_review_stats:
+    trend_x = np.array([df_late_and_reviews['late_orders'].min(), df_late_and_reviews['late_orders'].max()])
+    fig_scatter.add_scatter(
+        x=trend_x,
+        y=late_review_stats['intercept'] + late_review_stats['slope'] * trend_x,
+        mode='lines',
+        name='Linear trend',
+        line={'color': 'firebrick'}
+    )
+
 
 col1, col2 = st.columns(2)
 
@@ -95,7 +110,17 @@ st.plotly_chart(fig_bar, use_container_width=True)
 
 st.plotly_chart(fig_scatter, use_container_width=True)
 
-rfm = pd.read_csv('https://raw.githubusercontent.com/jokoeliyanto/dicoding_analisis_data/refs/heads/main/rfm.csv')
+if late_review_stats:
+    st.caption(
+        f"Pearson r = {late_review_stats['pearson_r']:.3f} "
+        f"(CI {late_review_stats['confidence']:.0%}: {late_review_stats['pearson_r_ci'][0]:.3f} s.d. {late_review_stats['pearson_r_ci'][1]:.3f}), "
+        f"Spearman rho = {late_review_stats['spearman_rho']:.3f}, "
+        f"slope = {late_review_stats['slope']:.4f} poin review per pesanan terlambat "
+        f"(CI: {late_review_stats['slope_ci'][0]:.4f} s.d. {late_review_stats['slope_ci'][1]:.4f}), "
+        f"n = {late_review_stats['n']} kota, {late_review_stats['n_resamples']} resample bootstrap"
+    )
+
+rfm = load_static('rfm.csv')
 
 segment_counts = rfm['Segment'].value_counts()
 labels = segment_counts.index.tolist()
@@ -119,6 +144,7 @@ with col1:
     )
     ax.axis('off')  
     st.pyplot(fig)  
+    plt.close(fig)
 
 with col2:
     segment_summary = rfm.groupby('Segment')[['Recency', 'Frequency', 'Monetary']].mean().reset_index()
@@ -188,14 +214,9 @@ with col2:
 
 st.markdown("#### Geospatial Analysis")
 
-@st.cache_data
-def load_world():
-    url = "https://raw.githubusercontent.com/nvkelso/natural-earth-vector/master/geojson/ne_110m_admin_0_countries.geojson"
-    return gpd.read_file(url)
-
 world = load_world()
 
-df_state_grouped = pd.read_csv('https://raw.githubusercontent.com/jokoeliyanto/dicoding_analisis_data/refs/heads/main/df_state_grouped.csv')
+df_state_grouped = load_static('df_state_grouped.csv')
 
 # Plot
 fig = px.scatter_geo(
@@ -225,7 +246,7 @@ st.plotly_chart(fig, use_container_width=True)
 
 
 st.markdown("#### Clustering")
-grouped = pd.read_csv('https://raw.githubusercontent.com/jokoeliyanto/dicoding_analisis_data/refs/heads/main/grouped.csv')
+grouped = load_static('grouped.csv')
 
 fig = px.bar(
     grouped.melt(id_vars='complexity_group', value_vars=['shipping_late_rate', 'delivered_late_rate']),
@@ -265,4 +286,7 @@ st.markdown(
     </div>
     """,
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+finish_rerun(profiler)
+record_rerun(__file__)
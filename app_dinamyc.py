@@ -1,33 +1,48 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import matplotlib.pyplot as plt
 import squarify
-from datetime import datetime
-import geopandas as gpd
-from shapely.geometry import Point
+from aggregate_api import client
+from category_filter import category_selector
+from calendar_dim import GRANULARITIES
+from dashboard_data import (
+    QUERY_BACKEND, filter_options, progressive_frames, load_latest_delivery, load_sample, load_rfm, load_rfm_lookup,
+    load_late_review_stats, load_cohorts, load_complexity_groups, load_world, version_of
+)
+from clustering import DEFAULT_K
+from cohorts import METRICS
+from delivery_times import ACCURACY as DELIVERY_ACCURACY, METRICS as DELIVERY_METRICS
+from memory import REPORTS, total_bytes
+from memtrack import (
+    HISTORY, admin_enabled, cache_table, detect_leaks, figure_table, record_rerun, rss_bytes, session_table
+)
+from profiling import finish_rerun, start_rerun
 
 # Atur tampilan jadi wide
 st.set_page_config(layout="wide")
 
+# Profil rerun ini jika diminta (PROFILE_RERUNS=1 atau ?profile=1)
+profiler = start_rerun(__file__)
+
 # Judul aplikasi
 st.title("Delivery Time Dashboard")
 st.text("Dashboard for analyzing late delivery and its impact for customer review")
 st.text("By: Joko Eliyanto")
 
 
-@st.cache_data
-def load_data():
-    df = pd.read_csv("https://raw.githubusercontent.com/jokoeliyanto/dicoding_analisis_data/refs/heads/main/cleaned_and_joined_data_2017.csv", parse_dates=["order_purchase_timestamp"])
-    df["order_purchase_timestamp"] = pd.to_datetime(df["order_purchase_timestamp"])
-    return df
+# Mode klien (AGGREGATE_API_URL diisi): agregat diambil dari layanan agregat bersama (aggregate_api.py),
+# sehingga proses dashboard tidak memuat data maupun menghitung agregat sendiri
+api = client()
 
-df = load_data()
+# Backend "pandas" (default), "duckdb" (SQL in-process atas Parquet lokal),
+# atau "polars" (seluruh pipeline sebagai satu query plan lazy), lihat QUERY_BACKEND
+min_date, max_date, product_categories = api.filter_options() if api else filter_options()
 
 # Sidebar filter tanggal
 st.sidebar.header("Filter Tanggal")
-min_date = df["order_purchase_timestamp"].min()
-max_date = df["order_purchase_timestamp"].max()
 
 start_date, end_date = st.sidebar.date_input(
     "Pilih rentang tanggal:",
@@ -36,27 +51,90 @@ start_date, end_date = st.sidebar.date_input(
     max_value=max_date.date()
 )
 
-# Sidebar: Pilih kategori produk dengan checkbox satu per satu
-st.sidebar.header("Filter Kategori Produk (Checkbox)")
+# Granularitas grafik status pengiriman (dikelompokkan lewat kunci integer dimensi kalender)
+granularity = st.sidebar.selectbox(
+    "Granularitas waktu:",
+    list(GRANULARITIES),
+    format_func=lambda g: {'month': 'Bulanan', 'week': 'Mingguan', 'quarter': 'Kuartalan'}[g]
+)
+
+# Sidebar: Pilih kategori produk (bitmask atas kode kategori)
+st.sidebar.header("Filter Kategori Produk")
 with st.sidebar.expander("Pilih kategori produk:"):
-    product_categories = sorted(df["product_category_name_english"].dropna().unique())
-    selected_categories = []
-    for category in product_categories:
-        if st.checkbox(category, value=True):
-            selected_categories.append(category)
-
-# Filter data berdasarkan tanggal dan kategori
-filtered_df = df[
-    (df["order_purchase_timestamp"].dt.date >= start_date) &
-    (df["order_purchase_timestamp"].dt.date <= end_date) &
-    (df["product_category_name_english"].isin(selected_categories))
-]
+    category_mask = category_selector(product_categories)
+
+# Sidebar: Tanggal acuan (as-of) snapshot RFM, default tanggal pengiriman terakhir di dataset
+st.sidebar.header("Snapshot RFM")
+latest_delivery = api.latest_delivery() if api else load_latest_delivery(version_of("load_latest_delivery"))
+rfm_as_of = st.sidebar.date_input(
+    "Tanggal acuan RFM:",
+    latest_delivery,
+    min_value=min_date.date(),
+    max_value=latest_delivery
+)
+
+# Sidebar: Cari skor RFM satu pelanggan lewat indeks customer_id
+st.sidebar.header("Cari Pelanggan (RFM)")
+customer_query = st.sidebar.text_input("Masukkan customer_id:").strip()
+if customer_query:
+    if api:
+        customer = api.rfm_customer(rfm_as_of, customer_query)
+    else:
+        customer = load_rfm_lookup(rfm_as_of, version_of("load_rfm_lookup")).explain(customer_query)
+    if customer is None:
+        st.sidebar.warning("customer_id tidak ditemukan")
+    else:
+        st.sidebar.markdown(
+            f"**Segment: {customer['Segment']}** (skor {customer['RFM_Score']})  \n"
+            f"Aturan segmen: {customer['Segment_reason']}  \n"
+            f"R = {customer['R_rank']}: {customer['R_rank_reason']}  \n"
+            f"F = {customer['F_rank']}: {customer['F_rank_reason']}  \n"
+            f"M = {customer['M_rank']}: {customer['M_rank_reason']}"
+        )
+
+# Frame grafik pengiriman untuk state filter saat ini; untuk rentang besar sebagian grafik
+# ditampilkan dulu sebagai perkiraan dari sampel, lalu diganti hasil eksak dari background (refinement)
+if api:
+    frames, refinement = api.filtered_frames(start_date, end_date, category_mask, granularity), None
+else:
+    frames, refinement = progressive_frames(start_date, end_date, category_mask, granularity)
+df_late = frames['df_late']
+df_period_status = frames['df_period_status']
+df_top10_city_status = frames['df_top10_city_status']
+df_late_and_reviews = frames['df_late_and_reviews']
+df_state_grouped = frames['df_state_grouped']
+df_year_over_year = frames['df_year_over_year']
+df_delivery_state = frames['df_delivery_state']
+df_delivery_category = frames['df_delivery_category']
+
+# Sidebar: Tahun yang dibandingkan di grafik antar tahun (seluruh riwayat dataset, kategori terpilih)
+st.sidebar.header("Perbandingan Tahun")
+available_years = df_year_over_year['year'].unique().tolist()
+compared_years = st.sidebar.multiselect("Bandingkan tahun:", available_years, default=available_years)
+
+if refinement is not None:
+    sample = load_sample(version_of("load_sample"))
+    st.info(
+        f"Perkiraan dari sampel bertingkat (kategori x bulan) berisi {len(sample['sample']):,} dari "
+        f"{sample['rows']:,} pesanan untuk grafik kota dan review; garis galat = margin of error 95%. "
+        "Hasil eksak sedang dihitung dan akan menggantikan perkiraan secara otomatis."
+    )
+
+    @st.fragment(run_every=1)
+    def swap_in_exact():
+        # Jalankan ulang seluruh app begitu hasil eksak selesai dihitung
+        if refinement.done():
+            st.rerun()
+
+    swap_in_exact()
+
+# Snapshot RFM pada tanggal acuan yang dipilih
+rfm = api.rfm(rfm_as_of) if api else load_rfm(rfm_as_of, version_of("load_rfm"))
 
 #----- Pie Chart (Plotly) Distribusi Status Pengiriman -----
 # st.subheader("Distribusi Status Pengiriman")
 
-# Hitung distribusi pengiriman
-df_late = filtered_df.groupby(['delivered_late']).agg({"order_id": "count"}).reset_index()
+# Urutkan distribusi pengiriman
 df_late = df_late.sort_values(by="order_id", ascending=True)
 df_late['delivered_late'] = df_late['delivered_late'].map({
     False: 'On-time Delivery',
@@ -77,30 +155,25 @@ fig_pie = px.pie(
     hole=0.3  # untuk tampilkan sebagai donut chart, hapus kalau mau pie biasa
 )
 
-# ----- Stacked Bar Chart Bulanan (Plotly) -----
-# st.subheader("Status Pengiriman Bulanan")
-
-# Pastikan kolom order_month bertipe period
-filtered_df['order_month'] = filtered_df['order_purchase_timestamp'].dt.to_period('M').astype(str)
-
-# Hitung jumlah pesanan per bulan berdasarkan status pengiriman
-df_monthly_status = filtered_df.groupby(['order_month', 'delivered_late'])['order_id'].count().reset_index()
+# ----- Stacked Bar Chart per Periode (Plotly) -----
+# st.subheader("Status Pengiriman per Periode")
 
 # Ganti label boolean jadi string
-df_monthly_status['delivered_late'] = df_monthly_status['delivered_late'].map({
+df_period_status['delivered_late'] = df_period_status['delivered_late'].map({
     False: 'On-time Delivery',
     True: 'Late Deliveries'
 })
 
 
 # Buat stacked bar chart dengan Plotly
+period_label = GRANULARITIES[granularity][1]
 fig_bar = px.bar(
-    df_monthly_status,
-    x='order_month',
+    df_period_status,
+    x='order_period',
     y='order_id',
     color='delivered_late',
-    title='Monthly Delivery Status: On-time vs Late Deliveries',
-    labels={'order_id': 'Number of Orders', 'order_month': 'Month'},
+    title=f"{ {'month': 'Monthly', 'week': 'Weekly', 'quarter': 'Quarterly'}[granularity]} Delivery Status: On-time vs Late Deliveries",
+    labels={'order_id': 'Number of Orders', 'order_period': period_label},
     color_discrete_map={
         'On-time Delivery': '#66b3ff',
         'Late Deliveries': '#ff9999'
@@ -112,13 +185,6 @@ fig_bar.update_layout(barmode='stack', xaxis_tickangle=-45)
 # ----- Horizontal Stacked Bar Chart: Top 10 Cities by Delivery Status -----
 # st.subheader("Top 10 Kota dengan Status Pengiriman Terbanyak")
 
-# Hitung jumlah pengiriman per kota dan status
-df_city_status = filtered_df.groupby(['customer_city', 'delivered_late'])['order_id'].count().unstack(fill_value=0)
-
-# Ambil 10 kota teratas berdasarkan total pengiriman
-top_10_cities = df_city_status.sum(axis=1).nlargest(10).index
-df_top10_city_status = df_city_status.loc[top_10_cities]
-
 # Ubah dari wide ke long format untuk plotly
 df_top10_city_status_long = df_top10_city_status.reset_index().melt(
     id_vars='customer_city',
@@ -127,6 +193,14 @@ df_top10_city_status_long = df_top10_city_status.reset_index().melt(
     value_name='order_count'
 )
 
+# Margin of error per kota dan status (hanya untuk hasil perkiraan)
+if 'df_top10_city_status_moe' in frames:
+    df_top10_city_status_long['order_count_moe'] = frames['df_top10_city_status_moe'].reset_index().melt(
+        id_vars='customer_city',
+        value_vars=[False, True],
+        value_name='order_count_moe'
+    )['order_count_moe']
+
 # Ganti nama status pengiriman
 df_top10_city_status_long['delivered_late'] = df_top10_city_status_long['delivered_late'].map({
     False: 'On-time Delivery',
@@ -140,7 +214,8 @@ fig_city = px.bar(
     y='customer_city',
     color='delivered_late',
     orientation='h',
-    title='Top 10 Cities by Delivery Status: On-time vs Late Deliveries',
+    error_x='order_count_moe' if 'order_count_moe' in df_top10_city_status_long else None,
+    title='Top 10 Cities by Delivery Status: On-time vs Late Deliveries' + (' (estimated)' if refinement is not None else ''),
     labels={'order_count': 'Number of Orders', 'customer_city': 'City'},
     color_discrete_map={
         'On-time Delivery': '#66b3ff',
@@ -155,31 +230,33 @@ fig_city.update_layout(
     legend_title='Delivery Status'
 )
 
-# Menghitung jumlah pesanan terlambat per kota
-df_late_deliveries = df[df['delivered_late'] == True]
-late_orders_per_city = df_late_deliveries.groupby('customer_city')['order_id'].count()
-
-# Menghitung rata-rata review score per kota
-avg_review_per_city = df.groupby('customer_city')['calculated_review_score'].mean()
-
-# Menggabungkan kedua informasi menjadi satu DataFrame
-df_late_and_reviews = pd.DataFrame({
-    'late_orders': late_orders_per_city,
-    'avg_review_score': avg_review_per_city
-}).dropna()  # Menghapus NaN jika ada kota yang tidak memiliki pesanan terlambat atau review
-
 # Membuat scatter plot menggunakan Plotly
 fig_scatter = px.scatter(
     df_late_and_reviews,
     x='late_orders',
     y='avg_review_score',
-    title='Relationship Between Late Orders and Average Review Score',
+    title='Relationship Between Late Orders and Average Review Score' + (' (estimated)' if refinement is not None else ''),
     labels={'late_orders': 'Number of Late Orders', 'avg_review_score': 'Average Review Score'},
     color='avg_review_score',  # Memberikan warna berdasarkan rating review
     color_continuous_scale='Blues',
     opacity=0.7
 )
 
+# Korelasi, garis tren, dan selang kepercayaan bootstrap antar kota
+if api:
+    late_review_stats = api.late_review_stats(start_date, end_date, category_mask)
+else:
+    late_review_stats = load_late_review_stats(df_late_and_reviews)
+if late_review_stats:
+    trend_x = np.array([df_late_and_reviews['late_orders'].min(), df_late_and_reviews['late_orders'].max()])
+    fig_scatter.add_scatter(
+        x=trend_x,
+        y=late_review_stats['intercept'] + late_review_stats['slope'] * trend_x,
+        mode='lines',
+        name='Linear trend',
+        line={'color': 'firebrick'}
+    )
+
 
 # Layout dengan dua kolom: Pie chart di kolom kiri dan Bar chart di kolom kanan
 col1, col2 = st.columns(2)
@@ -198,78 +275,37 @@ st.plotly_chart(fig_bar, use_container_width=True)
 # Menampilkan scatter plot
 st.plotly_chart(fig_scatter, use_container_width=True)
 
-# Pastikan kolom tanggal dalam format datetime
-df['order_delivered_customer_date'] = pd.to_datetime(df['order_delivered_customer_date'])
-
-# Tentukan tanggal referensi (misalnya, hari ini)
-reference_date = datetime.today()
-
-# 1. Recency: Menghitung selisih antara tanggal pengiriman terakhir dengan tanggal referensi
-recency = df.groupby('customer_id')['order_delivered_customer_date'].max()
-recency = (reference_date - recency).dt.days  # Hitung selisih dalam hari
-
-# 2. Frequency: Menghitung jumlah pesanan per pelanggan
-frequency = df.groupby('customer_id')['order_id'].count()
-
-# 3. Monetary: Menghitung total pembayaran per pelanggan
-monetary = df.groupby('customer_id')['payment_value_sum'].sum()
-
-# Gabungkan ketiga metrik menjadi satu DataFrame
-rfm = pd.DataFrame({
-    'Recency': recency,
-    'Frequency': frequency,
-    'Monetary': monetary
-})
-
-# Mengisi nilai kosong dengan 0 sebelum melanjutkan ke proses penghitungan skor
-rfm = rfm.fillna(0)
+if late_review_stats:
+    st.caption(
+        f"Pearson r = {late_review_stats['pearson_r']:.3f} "
+        f"(CI {late_review_stats['confidence']:.0%}: {late_review_stats['pearson_r_ci'][0]:.3f} s.d. {late_review_stats['pearson_r_ci'][1]:.3f}), "
+        f"Spearman rho = {late_review_stats['spearman_rho']:.3f}, "
+        f"slope = {late_review_stats['slope']:.4f} poin review per pesanan terlambat "
+        f"(CI: {late_review_stats['slope_ci'][0]:.4f} s.d. {late_review_stats['slope_ci'][1]:.4f}), "
+        f"n = {late_review_stats['n']} kota, {late_review_stats['n_resamples']} resample bootstrap"
+    )
 
-# Cek apakah kolom 'Frequency' memiliki cukup variasi
-if len(rfm['Frequency'].unique()) > 1:
-    # Skor berdasarkan kuantil untuk Frequency jika ada variasi
-    rfm['F_rank'] = pd.qcut(rfm['Frequency'], 5, labels=False) + 1
-else:
-    # Jika tidak ada variasi, beri skor tetap (misalnya 3)
-    rfm['F_rank'] = 3
-
-# Skor untuk Recency dan Monetary tetap menggunakan qcut
-rfm['R_rank'] = pd.qcut(rfm['Recency'], 5, labels=False) + 1
-rfm['M_rank'] = pd.qcut(rfm['Monetary'], 5, labels=False) + 1
-
-# Pastikan nilai pada kolom R_rank, F_rank, dan M_rank berupa integer
-rfm['R_rank'] = rfm['R_rank'].astype(int)
-rfm['F_rank'] = rfm['F_rank'].astype(int)
-rfm['M_rank'] = rfm['M_rank'].astype(int)
-
-# Gabungkan skor RFM menjadi satu kolom
-rfm['RFM_Score'] = rfm['R_rank'].astype(str) + rfm['F_rank'].astype(str) + rfm['M_rank'].astype(str)
-
-def assign_rfm_segment(score):
-    if score == '555':
-        return 'Best Customers'
-    elif score == '111':
-        return 'Lost'
-    elif score[0] == '1':
-        return 'New Customers'
-    elif score[1] == '5':
-        return 'Loyal Customers'
-    elif score[1] == '1':
-        return 'About to Sleep'
-    elif score[2] == '5':
-        return 'Big Spenders'
-    elif score[2] == '1':
-        return 'Low Value'
-    elif score[0] in '45' and score[1] in '45':
-        return 'Champions'
-    elif score[0] in '34' and score[1] in '34':
-        return 'Potential Loyalists'
-    elif score[0] in '23' and score[1] in '12':
-        return 'At Risk'
-    else:
-        return 'Other'
+# ----- Line Chart: Perbandingan antar tahun per bulan -----
+yoy_metric = st.radio(
+    "Metrik antar tahun:",
+    ['orders', 'late_rate'],
+    format_func=lambda m: {'orders': 'Jumlah pesanan', 'late_rate': 'Persentase terlambat'}[m],
+    horizontal=True
+)
+fig_yoy = px.line(
+    df_year_over_year[df_year_over_year['year'].isin(compared_years)].astype({'year': str}),
+    x='month',
+    y=yoy_metric,
+    color='year',
+    markers=True,
+    title='Year-over-Year: ' + {'orders': 'Orders per Month', 'late_rate': 'Late Delivery Rate per Month (%)'}[yoy_metric],
+    labels={'month': 'Month', 'orders': 'Number of Orders', 'late_rate': 'Late Deliveries (%)', 'year': 'Year'}
+)
+fig_yoy.update_xaxes(tickmode='array', tickvals=list(range(1, 13)),
+                     ticktext=['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
 
-# Terapkan fungsi ke kolom RFM_Score
-rfm['Segment'] = rfm['RFM_Score'].astype(str).apply(assign_rfm_segment)
+# Menampilkan perbandingan antar tahun
+st.plotly_chart(fig_yoy, use_container_width=True)
 
 # Hitung jumlah customer per segment
 segment_counts = rfm['Segment'].value_counts()
@@ -300,6 +336,9 @@ with col1:
     # ax.set_title("Treemap Segmentasi Pelanggan Berdasarkan Jumlah", fontsize=16)
     ax.axis('off')  # Sembunyikan axis
     st.pyplot(fig)  # Kirimkan fig ke st.pyplot()
+    # Script runner menutup semua figure setelah rerun; ditutup di sini agar buffer kanvas dibebaskan
+    # segera setelah gambar dikirim, bukan di akhir rerun
+    plt.close(fig)
 
 # Menampilkan DataFrame berdasarkan segmen di kolom kedua
 with col2:
@@ -380,23 +419,39 @@ with col1:
 with col2:
     st.plotly_chart(fig_scatter_segment, use_container_width=True)
 
-st.markdown("#### Geospatial Analysis")
-# --- Load data negara dari GeoJSON online ---
-@st.cache_data
-def load_world():
-    url = "https://raw.githubusercontent.com/nvkelso/natural-earth-vector/master/geojson/ne_110m_admin_0_countries.geojson"
-    return gpd.read_file(url)
+st.markdown("#### Cohort Retention")
 
-world = load_world()
+# Kohort bulan pembelian pertama x bulan sejak pembelian pertama, dihitung sekali per versi dataset
+cohort_metric = st.radio(
+    "Metrik kohort:",
+    list(METRICS),
+    format_func=lambda m: {'retention': 'Retensi (%)', 'customers': 'Pelanggan aktif', 'revenue': 'Pendapatan'}[m],
+    horizontal=True
+)
+if api:
+    cohort = api.cohorts(cohort_metric)
+else:
+    cohort = load_cohorts(version_of("load_cohorts"))[cohort_metric]
 
-# Agregasi per state
-df_state_grouped = df.groupby('customer_state').agg({
-    'customer_id': 'nunique',
-    'geolocation_lat_cons': 'mean',
-    'geolocation_lng_cons': 'mean'
-}).reset_index()
+fig_cohort = px.imshow(
+    cohort,
+    text_auto='.1f' if cohort_metric == 'retention' else '.3s',
+    aspect='auto',
+    color_continuous_scale='Blues',
+    labels={'x': 'Months Since First Purchase', 'y': 'First Purchase Month', 'color': METRICS[cohort_metric]},
+    title=f"Monthly Cohorts: {METRICS[cohort_metric]}"
+)
+fig_cohort.update_xaxes(side='top', type='category')
+st.plotly_chart(fig_cohort, use_container_width=True)
+if cohort.attrs.get('customer_key') == 'customer_id':
+    st.caption(
+        "Dataset tidak memiliki customer_unique_id, sehingga kohort memakai customer_id "
+        "(satu per pesanan di data Olist): retensi setelah bulan ke-0 akan mendekati nol."
+    )
 
-df_state_grouped.rename(columns={'customer_id': 'customer_count'}, inplace=True)
+st.markdown("#### Geospatial Analysis")
+# --- Load data negara dari GeoJSON online ---
+world = load_world()
 
 # Plot
 fig = px.scatter_geo(
@@ -424,51 +479,71 @@ fig.update_layout(
 # Tampilkan di Streamlit
 st.plotly_chart(fig, use_container_width=True)
 
-
-# Ensure all required columns are present
-cols_needed = ['product_category_name_english', 'product_weight_g', 'product_length_cm', 
-               'product_height_cm', 'product_width_cm', 'shipping_late', 'delivered_late']
-df_clean = df[cols_needed].dropna()
-
-# Calculate product volume
-df_clean['product_volume_cm3'] = (
-    df_clean['product_length_cm'] * 
-    df_clean['product_height_cm'] * 
-    df_clean['product_width_cm']
+# ----- Persentil waktu pengiriman per state dan kategori (mengikuti filter tanggal dan kategori) -----
+st.markdown("#### Delivery Time Distribution")
+delivery_metric = st.radio(
+    "Metrik waktu pengiriman:",
+    list(DELIVERY_METRICS),
+    format_func=lambda m: {'duration': 'Lama pengiriman', 'delay': 'Selisih terhadap estimasi'}[m],
+    horizontal=True
+)
+state_delivery = df_delivery_state[df_delivery_state['metric'] == delivery_metric].sort_values('p50')
+category_delivery = df_delivery_category[df_delivery_category['metric'] == delivery_metric]
+
+# Box per state dari persentil: kotak p25-p75, garis tengah p50, whisker p10-p90, titik p99
+fig_delivery_state = go.Figure([
+    go.Box(
+        x=state_delivery['customer_state'],
+        q1=state_delivery['p25'], median=state_delivery['p50'], q3=state_delivery['p75'],
+        lowerfence=state_delivery['p10'], upperfence=state_delivery['p90'],
+        name='p10 / p25 / p50 / p75 / p90'
+    ),
+    go.Scatter(
+        x=state_delivery['customer_state'], y=state_delivery['p99'], mode='markers',
+        marker=dict(symbol='diamond'), name='p99'
+    ),
+])
+fig_delivery_state.update_layout(
+    title='Delivery Time Percentiles by State',
+    xaxis_title='Customer State',
+    yaxis_title=DELIVERY_METRICS[delivery_metric]
 )
 
-# Calculate medians
-weight_median = df_clean['product_weight_g'].median()
-volume_median = df_clean['product_volume_cm3'].median()
-
-# Define product complexity group
-def categorize_complexity(row):
-    weight = row['product_weight_g']
-    volume = row['product_volume_cm3']
-    if weight <= weight_median and volume <= volume_median:
-        return 'Light & Compact'
-    elif weight <= weight_median and volume > volume_median:
-        return 'Bulky but Light'
-    elif weight > weight_median and volume <= volume_median:
-        return 'Heavy & Compact'
-    else:
-        return 'Heavy & Bulky'
-
-df_clean['complexity_group'] = df_clean.apply(categorize_complexity, axis=1)
+# p50/p90/p99 untuk 15 kategori dengan pengiriman terbanyak
+fig_delivery_category = px.bar(
+    category_delivery.nlargest(15, 'orders').sort_values('p50').melt(
+        id_vars='product_category_name_english', value_vars=['p50', 'p90', 'p99'], var_name='percentile'
+    ),
+    x='value',
+    y='product_category_name_english',
+    color='percentile',
+    barmode='group',
+    orientation='h',
+    title='Delivery Time Percentiles by Product Category (Top 15)',
+    labels={'value': DELIVERY_METRICS[delivery_metric], 'product_category_name_english': 'Product Category',
+            'percentile': 'Percentile'}
+)
 
-# Aggregate delivery delay metrics by group
-grouped = df_clean.groupby('complexity_group').agg(
-    total_orders=('shipping_late', 'count'),
-    shipping_late_rate=('shipping_late', 'mean'),
-    delivered_late_rate=('delivered_late', 'mean')
-).reset_index()
+col1, col2 = st.columns(2)
+with col1:
+    st.plotly_chart(fig_delivery_state, use_container_width=True)
+with col2:
+    st.plotly_chart(fig_delivery_category, use_container_width=True)
+st.caption(
+    f"Persentil dari sketsa histogram per hari (galat relatif maksimal {DELIVERY_ACCURACY:.0%}); "
+    "hanya pesanan yang sudah diterima pelanggan. Nilai negatif pada selisih estimasi = tiba lebih cepat."
+)
 
-# Round percentage values
-grouped['shipping_late_rate'] = (grouped['shipping_late_rate'] * 100).round(2)
-grouped['delivered_late_rate'] = (grouped['delivered_late_rate'] * 100).round(2)
 
 st.markdown("#### Clustering")
 
+# Cluster produk (mini-batch k-means atas berat, volume, dan dimensi produk), di-cache per k
+n_clusters = st.slider("Jumlah cluster (k):", min_value=2, max_value=8, value=DEFAULT_K)
+if api:
+    grouped = api.complexity_groups(n_clusters)
+else:
+    grouped = load_complexity_groups(n_clusters, version_of("load_complexity_groups"))
+
 fig = px.bar(
     grouped.melt(id_vars='complexity_group', value_vars=['shipping_late_rate', 'delivered_late_rate']),
     x='complexity_group',
@@ -477,12 +552,39 @@ fig = px.bar(
     barmode='group',
     text='value',
     labels={'value': 'Late Delivery Rate (%)', 'variable': 'Delay Type'},
-    title='Shipping & Delivery Delay by Product Complexity'
+    title='Shipping & Delivery Delay by Product Cluster'
 )
-fig.update_layout(xaxis_title='Product Complexity', yaxis_title='Late Delivery Rate (%)')
+fig.update_layout(xaxis_title='Product Cluster (center weight, volume)', yaxis_title='Late Delivery Rate (%)')
 
 st.plotly_chart(fig, use_container_width=True)
 
+# Laporan memori per kolom (sebelum dan sesudah optimasi dtype)
+with st.sidebar.expander("Laporan memori"):
+    st.caption(f"Total data dimuat: {total_bytes() / 2**20:.1f} MB")
+    for name, report in REPORTS.items():
+        st.markdown(f"**{name}**")
+        st.dataframe(report, use_container_width=True)
+
+# Akuntansi memori server (cache, sesi, figure) dan deteksi kebocoran: MEMTRACK_ADMIN=1 (dan MEMTRACK=1 untuk riwayat)
+if admin_enabled():
+    with st.sidebar.expander("Memori server (admin)"):
+        st.caption(f"RSS proses: {rss_bytes() / 2**20:.1f} MB, {len(HISTORY)} catatan riwayat")
+        leaks = detect_leaks(HISTORY)
+        if leaks['leak'].any():
+            st.warning("Kemungkinan kebocoran: " + ", ".join(leaks.loc[leaks['leak'], 'metric']))
+        st.dataframe(leaks, use_container_width=True)
+        if HISTORY:
+            history = pd.DataFrame(list(HISTORY)).set_index('rerun')
+            metrics = ['rss', 'cache_data', 'cache_resource', 'session_state', 'media_files']
+            st.line_chart(history[metrics] / 2**20)
+        caches = cache_table()
+        st.markdown("**Cache**")
+        st.dataframe(caches, use_container_width=True)
+        st.markdown("**Sesi**")
+        st.dataframe(session_table(caches), use_container_width=True)
+        st.markdown("**Figure matplotlib**")
+        st.dataframe(figure_table(), use_container_width=True)
+
 st.markdown("---")
 st.markdown(
     """
@@ -507,4 +609,22 @@ st.markdown(
     </div>
     """,
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+finish_rerun(
+    profiler,
+    backend="api" if api else QUERY_BACKEND,
+    start_date=start_date,
+    end_date=end_date,
+    granularity=granularity,
+    categories=int(category_mask.sum()),
+    rfm_as_of=rfm_as_of,
+    n_clusters=n_clusters,
+    customer_query=bool(customer_query),
+    approximate=refinement is not None,
+    cohort_metric=cohort_metric,
+    compared_years=len(compared_years),
+    yoy_metric=yoy_metric,
+    delivery_metric=delivery_metric
+)
+record_rerun(__file__)
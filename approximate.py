@@ -0,0 +1,149 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from category_filter import category_row_mask
+
+# Mode perkiraan: jika rentang filter mencakup minimal MIN_ROWS pesanan, grafik yang memerlukan scan data
+# ditampilkan dulu dari sampel bertingkat (kategori x bulan), lalu diganti hasil eksak dari background.
+# Ambang bawaan ditujukan untuk dataset berjuta pesanan: dataset Olist (~100 ribu pesanan) selalu dihitung
+# eksak karena agregat parsialnya sudah cukup cepat. Turunkan APPROX_MIN_ROWS (misalnya 50000) untuk
+# mencoba mode ini pada dataset kecil; APPROX_MIN_ROWS=0 mematikannya.
+MIN_ROWS = int(os.environ.get("APPROX_MIN_ROWS", "1000000"))
+SAMPLE_FRACTION = float(os.environ.get("APPROX_SAMPLE_FRACTION", "0.05"))
+# Stratum kecil diambil minimal sebanyak ini (atau seluruhnya), agar galat per stratum bisa diestimasi
+MIN_PER_STRATUM = int(os.environ.get("APPROX_MIN_PER_STRATUM", "20"))
+WORKERS = int(os.environ.get("APPROX_WORKERS", "2"))
+# Kuantil normal untuk margin of error 95%
+Z = 1.96
+
+
+def stratum_keys(month, codes, n_categories):
+    # Kunci stratum global (bulan pembelian x kategori), sama untuk baris di batch mana pun
+    return month * (n_categories + 1) + codes + 1
+
+
+def frame_strata(df):
+    category = df['product_category_name_english']
+    timestamp = df['order_purchase_timestamp']
+    month = (timestamp.dt.year * 12 + timestamp.dt.month).fillna(0).to_numpy().astype(np.int64)
+    return stratum_keys(month, category.cat.codes.to_numpy().astype(np.int64), len(category.cat.categories))
+
+
+def sample_sizes(population, fraction=SAMPLE_FRACTION, min_per_stratum=MIN_PER_STRATUM):
+    return np.minimum(population, np.maximum(min_per_stratum, np.ceil(fraction * population))).astype(np.int64)
+
+
+def _smallest_keys(candidates, sampled):
+    stratum = candidates['stratum'].to_numpy()
+    order = np.lexsort((candidates['sample_key'].to_numpy(), stratum))
+    sorted_strata = stratum[order]
+    starts = np.flatnonzero(np.r_[True, sorted_strata[1:] != sorted_strata[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return candidates.iloc[np.sort(order[rank < sampled[sorted_strata]])].reset_index(drop=True)
+
+
+def keep_sample(kept, df, strata, sampled):
+    # Sampel acak tanpa pengembalian per stratum yang dibangun per batch: setiap pesanan mendapat kunci acak
+    # deterministik (hash order_id), dan per stratum hanya sampled[h] kunci terkecil yang disimpan, sehingga
+    # hasilnya sama berapa pun ukuran batch. strata: kunci stratum terurut; sampled: ukuran sampel per stratum
+    batch = _smallest_keys(df.assign(
+        stratum=np.searchsorted(strata, frame_strata(df)),
+        sample_key=pd.util.hash_array(df['order_id'].to_numpy(dtype=object)),
+    ), sampled)
+    if kept is None:
+        return batch
+    return _smallest_keys(pd.concat([kept, batch], ignore_index=True), sampled)
+
+
+def finish_sample(kept, population, sampled):
+    # Sampel dengan kolom 'stratum' (indeks ke population/sampled) dan 'weight' = N_h / n_h
+    sample = kept.drop(columns='sample_key')
+    sample['weight'] = (population / sampled)[sample['stratum'].to_numpy()]
+    return {'sample': sample, 'population': population, 'sampled': sampled, 'rows': int(population.sum())}
+
+
+def estimate_totals(sample, groups, in_domain):
+    # Estimasi total per kelompok (jumlah bobot) dan margin of error 95%.
+    # Varians total domain untuk SRS tanpa pengembalian per stratum:
+    #   sum_h N_h^2 (1 - n_h/N_h) p_h (1 - p_h) / (n_h - 1), dengan p_h = proporsi sampel stratum h di domain
+    frame = sample['sample']
+    counts = pd.DataFrame({
+        'group': groups[in_domain], 'stratum': frame['stratum'].to_numpy()[in_domain]
+    }).value_counts()
+    strata = counts.index.get_level_values('stratum').to_numpy()
+    N = sample['population'][strata].astype(np.float64)
+    n = sample['sampled'][strata].astype(np.float64)
+    m = counts.to_numpy(dtype=np.float64)
+
+    p = m / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = np.where(n > 1, N ** 2 * (1 - n / N) * p * (1 - p) / (n - 1), 0.0)
+    parts = pd.DataFrame({'total': N / n * m, 'variance': variance}, index=counts.index.get_level_values('group'))
+    totals = parts.groupby(level=0).sum()
+    return totals['total'], Z * np.sqrt(totals['variance'])
+
+
+def estimate_frames(sample, start_date, end_date, category_mask, n=10):
+    # Perkiraan frame kota teratas (dengan margin of error) dan keterlambatan vs review per kota,
+    # dengan kolom yang sama seperti top_city_status dan late_and_reviews_from_partials
+    frame = sample['sample']
+    selected = (
+        (frame['order_purchase_timestamp'].dt.date >= start_date).to_numpy() &
+        (frame['order_purchase_timestamp'].dt.date <= end_date).to_numpy() &
+        category_row_mask(category_mask, frame['product_category_name_english'].cat.codes.to_numpy())
+    )
+    city = frame['customer_city'].astype(object).to_numpy()
+    late = frame['delivered_late'].map({False: False, True: True})
+
+    # Jumlah pengiriman per kota dan status (hanya baris dengan order_id dan status)
+    counted = selected & frame['order_id'].notna().to_numpy() & late.notna().to_numpy() & pd.notna(city)
+    groups = pd.MultiIndex.from_arrays([city, late.to_numpy()], names=['customer_city', 'delivered_late'])
+    total, moe = estimate_totals(sample, groups.to_flat_index().to_numpy(), counted)
+    total.index = pd.MultiIndex.from_tuples(total.index, names=groups.names)
+    moe.index = total.index
+    city_status = total.unstack(fill_value=0).reindex(columns=[False, True], fill_value=0)
+    city_moe = moe.unstack(fill_value=0).reindex(columns=[False, True], fill_value=0)
+    top_cities = city_status.sum(axis=1).nlargest(n).index
+
+    # Pesanan terlambat per kota (total domain) dan rata-rata review berbobot (estimator rasio)
+    late_orders, _ = estimate_totals(sample, city, counted & (late == True).to_numpy())
+    review = frame['calculated_review_score'].to_numpy(dtype=np.float64)
+    reviewed = selected & ~np.isnan(review) & pd.notna(city)
+    weight = frame['weight'].to_numpy()
+    review_totals = pd.DataFrame({
+        'review_sum': weight[reviewed] * review[reviewed], 'review_weight': weight[reviewed]
+    }, index=pd.Index(city[reviewed], name='customer_city')).groupby(level=0).sum()
+    late_and_reviews = pd.DataFrame({'late_orders': late_orders}).join(review_totals, how='inner')
+    late_and_reviews = late_and_reviews[late_and_reviews['late_orders'] > 0]
+
+    return {
+        'df_top10_city_status': city_status.loc[top_cities],
+        'df_top10_city_status_moe': city_moe.loc[top_cities],
+        'df_late_and_reviews': pd.DataFrame({
+            'late_orders': late_and_reviews['late_orders'],
+            'avg_review_score': late_and_reviews['review_sum'] / late_and_reviews['review_weight'],
+        }).rename_axis('customer_city'),
+    }
+
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="exact-refine")
+_jobs = OrderedDict()
+_lock = threading.Lock()
+
+
+def refine(key, compute):
+    # Hasil eksak dihitung sekali per state filter di background dan dipakai bersama oleh semua sesi;
+    # job yang gagal dijadwalkan ulang pada permintaan berikutnya
+    with _lock:
+        job = _jobs.get(key)
+        if job is None or (job.done() and job.exception() is not None):
+            job = _jobs[key] = _executor.submit(compute)
+        _jobs.move_to_end(key)
+        for old in [old for old, old_job in _jobs.items() if old_job.done()][:max(0, len(_jobs) - 32)]:
+            del _jobs[old]
+    return job
@@ -0,0 +1,84 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Jumlah resample bootstrap dan proses paralel (1 = tanpa proses tambahan)
+N_RESAMPLES = int(os.environ.get("BOOTSTRAP_RESAMPLES", "2000"))
+PROCESSES = int(os.environ.get("BOOTSTRAP_PROCESSES", "1"))
+# Batas elemen matriks resample per batch, agar memori tetap kecil untuk jumlah kota yang besar
+MAX_BATCH_CELLS = 2_000_000
+
+
+def _fit(x, y):
+    # Korelasi Pearson dan regresi linear y = intercept + slope * x, per baris (axis terakhir)
+    x_centered = x - x.mean(axis=-1, keepdims=True)
+    y_centered = y - y.mean(axis=-1, keepdims=True)
+    sxy = (x_centered * y_centered).sum(axis=-1)
+    sxx = (x_centered ** 2).sum(axis=-1)
+    syy = (y_centered ** 2).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = sxy / sxx
+        r = sxy / np.sqrt(sxx * syy)
+    return r, slope
+
+
+def _resample_stats(x, y, n_resamples, seed):
+    # Semua resample dalam satu batch diambil sebagai satu matriks indeks (n_resamples x n)
+    rng = np.random.default_rng(seed)
+    batch = max(1, MAX_BATCH_CELLS // len(x))
+    r, slope = [], []
+    for start in range(0, n_resamples, batch):
+        index = rng.integers(0, len(x), size=(min(batch, n_resamples - start), len(x)))
+        batch_r, batch_slope = _fit(x[index], y[index])
+        r.append(batch_r)
+        slope.append(batch_slope)
+    return np.concatenate(r), np.concatenate(slope)
+
+
+def _rank(values):
+    # Rank rata-rata untuk nilai kembar (seperti scipy.stats.rankdata)
+    order = np.argsort(values, kind='mergesort')
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(1, len(values) + 1)
+    _, inverse = np.unique(values, return_inverse=True)
+    return (np.bincount(inverse, weights=ranks) / np.bincount(inverse))[inverse]
+
+
+def relationship_stats(x, y, n_resamples=N_RESAMPLES, confidence=0.95, seed=0, processes=PROCESSES):
+    # Besar efek hubungan x dan y beserta selang kepercayaan bootstrap (persentil)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+    # Tanpa variasi di salah satu sisi (sxx = 0 atau syy = 0) korelasi dan garis tren tidak terdefinisi
+    if len(x) < 3 or np.ptp(x) == 0 or np.ptp(y) == 0:
+        return None
+
+    r, slope = _fit(x, y)
+    intercept = y.mean() - slope * x.mean()
+    spearman = _fit(_rank(x), _rank(y))[0]
+
+    # Resample dibagi per proses, masing-masing dengan seed turunan agar hasil tetap deterministik
+    seeds = np.random.SeedSequence(seed).spawn(processes)
+    counts = [len(part) for part in np.array_split(np.arange(n_resamples), processes)]
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            parts = list(pool.map(_resample_stats, [x] * processes, [y] * processes, counts, seeds))
+    else:
+        parts = [_resample_stats(x, y, counts[0], seeds[0])]
+    boot_r = np.concatenate([part[0] for part in parts])
+    boot_slope = np.concatenate([part[1] for part in parts])
+
+    tail = (1 - confidence) / 2 * 100
+    return {
+        'n': len(x),
+        'pearson_r': float(r),
+        'pearson_r_ci': tuple(np.nanpercentile(boot_r, [tail, 100 - tail]).tolist()),
+        'spearman_rho': float(spearman),
+        'slope': float(slope),
+        'slope_ci': tuple(np.nanpercentile(boot_slope, [tail, 100 - tail]).tolist()),
+        'intercept': float(intercept),
+        'confidence': confidence,
+        'n_resamples': n_resamples,
+    }
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import struct
+import time
+
+import pandas as pd
+
+from memory import optimize_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+# Satu file berisi semua artefak agregat untuk dashboard statis (app.py), contoh:
+#   python bundle.py --data-dir . --out artifacts.bundle
+# lalu aktifkan di dashboard dengan DATA_BUNDLE=artifacts.bundle (tanpa itu app.py membaca CSV satu per satu).
+# Format: MAGIC, panjang manifest (uint64), manifest JSON, lalu setiap tabel sebagai Arrow IPC
+# pada offset yang disejajarkan 64 byte, sehingga tabel bisa dibaca langsung dari memory map.
+
+MAGIC = b"DASHBNDL"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def _arrow():
+    if pa is None:
+        raise ImportError("Bundle artefak membutuhkan paket pyarrow (pip install pyarrow)")
+    return pa
+
+
+def _pad(length):
+    return -length % ALIGNMENT
+
+
+def write_bundle(tables, path, sources=None):
+    # tables: {nama artefak: DataFrame}; sources: {nama artefak: versi sumber} untuk manifest
+    pa = _arrow()
+    blobs = {}
+    for name, df in tables.items():
+        sink = pa.BufferOutputStream()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        blobs[name] = (sink.getvalue(), table.num_rows)
+
+    # Offset tabel dihitung relatif terhadap awal area data, setelah header
+    entries, offset = {}, 0
+    for name, (blob, rows) in blobs.items():
+        entries[name] = {"offset": offset, "length": blob.size, "rows": rows,
+                         "source_version": (sources or {}).get(name)}
+        offset += blob.size + _pad(blob.size)
+    manifest = json.dumps({"format": FORMAT_VERSION, "created": time.time(), "tables": entries}).encode()
+    header_length = len(MAGIC) + 8 + len(manifest)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(MAGIC + struct.pack("<Q", len(manifest)) + manifest + b"\0" * _pad(header_length))
+        for blob, _ in blobs.values():
+            out.write(blob)
+            out.write(b"\0" * _pad(blob.size))
+    os.replace(tmp_path, path)
+
+
+class Bundle:
+    # Bundle dibuka sekali lewat memory map; tabel hanya didekode saat diminta
+    def __init__(self, path):
+        pa = _arrow()
+        self.path = path
+        # Seluruh file sebagai satu buffer zero-copy; slice per tabel aman dipakai antar thread
+        self.buffer = pa.memory_map(path).read_buffer()
+        if self.buffer.slice(0, len(MAGIC)).to_pybytes() != MAGIC:
+            raise ValueError(f"{path} bukan bundle artefak dashboard")
+        (manifest_length,) = struct.unpack("<Q", self.buffer.slice(len(MAGIC), 8).to_pybytes())
+        header_length = len(MAGIC) + 8 + manifest_length
+        self.manifest = json.loads(self.buffer.slice(len(MAGIC) + 8, manifest_length).to_pybytes())
+        if self.manifest["format"] != FORMAT_VERSION:
+            raise ValueError(f"Format bundle {self.manifest['format']} tidak didukung")
+        self.data_start = header_length + _pad(header_length)
+
+    def names(self):
+        return list(self.manifest["tables"])
+
+    def __contains__(self, name):
+        return name in self.manifest["tables"]
+
+    def table_bytes(self, name):
+        # Ukuran tabel Arrow di bundle, perkiraan memori sebelum tabel didekode
+        return self.manifest["tables"][name]["length"]
+
+    def read(self, name):
+        entry = self.manifest["tables"][name]
+        table = self.buffer.slice(self.data_start + entry["offset"], entry["length"])
+        return pa.ipc.open_file(table).read_all().to_pandas()
+
+
+def main():
+    from dashboard_data import STATIC_ARTIFACTS
+
+    parser = argparse.ArgumentParser(description="Gabungkan artefak CSV app.py menjadi satu file bundle")
+    parser.add_argument("--data-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--out", default="artifacts.bundle")
+    args = parser.parse_args()
+
+    tables, sources = {}, {}
+    for name in STATIC_ARTIFACTS:
+        path = os.path.join(args.data_dir, name)
+        stat = os.stat(path)
+        # Dtype ringkas (sama seperti saat dimuat dashboard) agar bundle juga kecil di disk
+        tables[name] = optimize_frame(name, pd.read_csv(path))
+        sources[name] = f"{stat.st_mtime_ns}-{stat.st_size}"
+    write_bundle(tables, args.out, sources)
+    print(f"{args.out}: {len(tables)} tabel, {os.path.getsize(args.out) / 2**20:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
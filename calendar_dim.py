@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+# Granularitas waktu yang bisa dipilih: kolom kunci integer di dimensi kalender dan label sumbu
+GRANULARITIES = {
+    'month': ('month_key', 'Month'),
+    'week': ('iso_week_key', 'ISO Week'),
+    'quarter': ('quarter_key', 'Quarter'),
+}
+
+
+def calendar_dimension(days):
+    # Satu baris per hari dengan kunci integer: hari (YYYYMMDD), bulan (YYYYMM),
+    # minggu ISO (tahun ISO * 100 + minggu), kuartal (YYYYQ), dan hari dalam minggu (0 = Senin)
+    days = pd.DatetimeIndex(days)
+    iso = days.isocalendar()
+    return pd.DataFrame({
+        'day_key': (days.year * 10000 + days.month * 100 + days.day).to_numpy(dtype=np.int32),
+        'month_key': (days.year * 100 + days.month).to_numpy(dtype=np.int32),
+        'iso_week_key': (iso['year'] * 100 + iso['week']).to_numpy(dtype=np.int32),
+        'quarter_key': (days.year * 10 + days.quarter).to_numpy(dtype=np.int32),
+        'weekday': days.weekday.to_numpy(dtype=np.int8),
+    }, index=days)
+
+
+def period_labels(keys, granularity):
+    keys = np.asarray(keys)
+    if granularity == 'month':
+        return [f"{key // 100}-{key % 100:02d}" for key in keys]
+    if granularity == 'week':
+        return [f"{key // 100}-W{key % 100:02d}" for key in keys]
+    return [f"{key // 10}-Q{key % 10}" for key in keys]
+
+
+def status_by_period(per_day, period_keys, granularity):
+    # per_day: jumlah pesanan (hari x [tepat waktu, terlambat]) berurutan menurut tanggal;
+    # hari dengan kunci periode yang sama selalu berdampingan, jadi cukup dijumlahkan per potongan
+    if len(per_day):
+        starts = np.flatnonzero(np.r_[True, period_keys[1:] != period_keys[:-1]])
+        per_period = np.add.reduceat(per_day, starts, axis=0)
+        keys = period_keys[starts]
+    else:
+        per_period = np.zeros((0, 2), dtype=np.int64)
+        keys = np.zeros(0, dtype=np.int32)
+
+    df_period_status = pd.DataFrame({
+        'period_key': np.repeat(keys, 2),
+        'order_period': np.repeat(period_labels(keys, granularity), 2),
+        'delivered_late': np.tile([False, True], len(keys)),
+        'order_id': per_period.reshape(-1),
+    })
+    return df_period_status[df_period_status['order_id'] > 0].reset_index(drop=True)
+
+
+def rollup_daily_status(daily, granularity):
+    # daily: kolom order_day, delivered_late, order_id (agregat harian dari backend SQL/Polars)
+    counts = daily.pivot_table(
+        index='order_day', columns='delivered_late', values='order_id', aggfunc='sum', fill_value=0
+    ).reindex(columns=[False, True], fill_value=0).sort_index()
+    period_keys = calendar_dimension(counts.index)[GRANULARITIES[granularity][0]].to_numpy()
+    return status_by_period(counts.to_numpy(), period_keys, granularity)
+
+
+def year_over_year(df_monthly_status):
+    # Perbandingan antar tahun dari status per bulan (period_key YYYYMM): satu baris per (tahun, bulan)
+    # dengan jumlah pesanan, pesanan terlambat, dan persentase keterlambatan
+    keys = df_monthly_status['period_key'].to_numpy()
+    counts = pd.DataFrame({
+        'period_key': keys,
+        'late_orders': np.where(df_monthly_status['delivered_late'].to_numpy(dtype=bool), df_monthly_status['order_id'], 0),
+        'orders': df_monthly_status['order_id'].to_numpy(),
+    }).groupby('period_key').sum()
+    period_key = counts.index.to_numpy()
+    return pd.DataFrame({
+        'year': period_key // 100,
+        'month': period_key % 100,
+        'orders': counts['orders'].to_numpy(),
+        'late_orders': counts['late_orders'].to_numpy(),
+        'late_rate': 100 * counts['late_orders'].to_numpy() / counts['orders'].to_numpy(),
+    })
@@ -0,0 +1,67 @@
+import numpy as np
+import streamlit as st
+
+
+def category_row_mask(mask, codes):
+    # Slot tambahan bernilai False di akhir supaya kode -1 (kategori kosong) tidak ikut terpilih
+    lookup = np.append(mask, False)
+    return lookup[codes]
+
+
+def encode_mask(mask):
+    # Bitmask kategori sebagai string hex ringkas (8 kategori per byte), misalnya untuk parameter URL
+    return np.packbits(np.asarray(mask, dtype=bool)).tobytes().hex()
+
+
+def decode_mask(text, n_categories):
+    packed = np.frombuffer(bytes.fromhex(text), dtype=np.uint8)
+    if len(packed) != (n_categories + 7) // 8:
+        raise ValueError(f"Bitmask kategori harus {(n_categories + 7) // 8} byte")
+    return np.unpackbits(packed, count=n_categories).astype(bool)
+
+
+def category_selector(categories, key="category_mask"):
+    categories = np.asarray(categories, dtype=object)
+
+    # Bitmask kategori disimpan di session_state, satu boolean per kategori
+    if key not in st.session_state or len(st.session_state[key]) != len(categories):
+        st.session_state[key] = np.ones(len(categories), dtype=bool)
+    mask = st.session_state[key]
+
+    search = st.text_input("Cari kategori:", key=f"{key}_search").strip().lower()
+    if search:
+        visible = np.flatnonzero([search in c.lower() for c in categories])
+    else:
+        visible = np.arange(len(categories))
+
+    def set_visible(value):
+        st.session_state[key][visible] = value
+
+    col_all, col_none = st.columns(2)
+    col_all.button("Pilih semua", on_click=set_visible, args=(True,), key=f"{key}_all")
+    col_none.button("Kosongkan", on_click=set_visible, args=(False,), key=f"{key}_none")
+
+    # Multiselect dengan key tetap (ID widget tidak berubah saat opsi atau pilihan berubah); bitmask tetap
+    # sumber kebenaran: nilainya diisi ke session_state sebelum widget dibuat hanya jika berbeda (pertama kali,
+    # atau setelah tombol/pencarian), dan perubahan dari pengguna ditulis balik ke bitmask lewat on_change
+    chosen_key = f"{key}_chosen"
+    chosen = categories[visible][mask[visible]].tolist()
+    if st.session_state.get(chosen_key) != chosen:
+        st.session_state[chosen_key] = chosen
+
+    def apply_chosen(visible):
+        st.session_state[key][visible] = np.isin(categories[visible], st.session_state[chosen_key])
+
+    st.multiselect(
+        "Kategori terpilih:",
+        options=categories[visible].tolist(),
+        key=chosen_key,
+        on_change=apply_chosen,
+        args=(visible,),
+    )
+
+    st.caption(
+        f"{int(mask.sum())} dari {len(categories)} kategori dipilih "
+        "(pesanan multi-kategori mengikuti kategori item pertamanya)"
+    )
+    return mask
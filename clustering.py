@@ -0,0 +1,140 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Jumlah cluster default untuk bagian "Clustering" di dashboard
+DEFAULT_K = int(os.environ.get("CLUSTER_K", "4"))
+
+# Fitur dimensi produk; volume dihitung dari panjang x tinggi x lebar
+FEATURES = ['product_weight_g', 'product_volume_cm3', 'product_length_cm', 'product_height_cm', 'product_width_cm']
+OUTCOMES = ['shipping_late', 'delivered_late']
+
+
+def product_features(df):
+    # Baris lengkap (tanpa nilai kosong) berisi fitur produk dan status keterlambatan
+    columns = ['product_category_name_english', 'product_weight_g', 'product_length_cm',
+               'product_height_cm', 'product_width_cm', *OUTCOMES]
+    clean = df[columns].dropna()
+    clean['product_volume_cm3'] = (
+        clean['product_length_cm'] * clean['product_height_cm'] * clean['product_width_cm']
+    )
+    return clean[[*FEATURES, *OUTCOMES]].reset_index(drop=True)
+
+
+class Scaler:
+    # log1p (dimensi produk sangat miring ke kanan) lalu standardisasi per kolom
+    def __init__(self, X):
+        logged = np.log1p(np.clip(X, 0, None))
+        self.mean = logged.mean(axis=0)
+        self.std = logged.std(axis=0)
+        self.std[self.std == 0] = 1.0
+
+    def transform(self, X):
+        return (np.log1p(np.clip(X, 0, None)) - self.mean) / self.std
+
+    def inverse_transform(self, Z):
+        return np.expm1(Z * self.std + self.mean)
+
+
+def _squared_distances(X, centers):
+    # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2 untuk semua pasangan sekaligus
+    distances = (X ** 2).sum(axis=1)[:, None] - 2 * X @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+    return np.maximum(distances, 0)
+
+
+class MiniBatchKMeans:
+    def __init__(self, k=DEFAULT_K, batch_size=2048, max_iter=200, tol=1e-4, n_init=3, seed=0):
+        self.k = k
+        self.n_init = n_init
+        self.batch_size = batch_size
+        self.max_iter = max_iter
+        self.tol = tol
+        self.rng = np.random.default_rng(seed)
+        self.centers = None
+        self.counts = None
+
+    def _kmeans_plus_plus(self, sample):
+        centers = [sample[self.rng.integers(len(sample))]]
+        closest = _squared_distances(sample, centers[0][None, :])[:, 0]
+        for _ in range(1, self.k):
+            total = closest.sum()
+            index = self.rng.choice(len(sample), p=closest / total) if total > 0 else self.rng.integers(len(sample))
+            centers.append(sample[index])
+            closest = np.minimum(closest, _squared_distances(sample, sample[index][None, :])[:, 0])
+        return np.array(centers, dtype=np.float64), closest.sum()
+
+    def _init_centers(self, X):
+        # k-means++ pada sampel data, diulang n_init kali dan dipilih yang inersianya terkecil
+        sample = X[self.rng.choice(len(X), size=min(len(X), 20 * self.batch_size), replace=False)]
+        candidates = [self._kmeans_plus_plus(sample) for _ in range(self.n_init)]
+        self.centers = min(candidates, key=lambda candidate: candidate[1])[0]
+        self.counts = np.zeros(self.k)
+
+    def partial_fit(self, batch):
+        # Satu langkah mini-batch: setiap center bergeser ke rata-rata titik barunya
+        # dengan laju belajar 1 / jumlah titik yang pernah masuk ke center tersebut
+        if self.centers is None:
+            self._init_centers(batch)
+        labels = _squared_distances(batch, self.centers).argmin(axis=1)
+        batch_counts = np.bincount(labels, minlength=self.k)
+        sums = np.zeros_like(self.centers)
+        np.add.at(sums, labels, batch)
+
+        previous = self.centers.copy()
+        self.counts += batch_counts
+        moved = batch_counts > 0
+        self.centers[moved] += (sums[moved] - batch_counts[moved, None] * self.centers[moved]) / self.counts[moved, None]
+        return np.sqrt(((self.centers - previous) ** 2).sum(axis=1)).max()
+
+    def fit(self, X):
+        # Iterasi mini-batch acak atas data di memori, berhenti saat center sudah stabil
+        if self.centers is None:
+            self._init_centers(X)
+        for _ in range(self.max_iter):
+            batch = X[self.rng.integers(0, len(X), size=min(self.batch_size, len(X)))]
+            if self.partial_fit(batch) < self.tol:
+                break
+        return self
+
+    def predict(self, X, chunk_size=65536):
+        return np.concatenate([
+            _squared_distances(X[start:start + chunk_size], self.centers).argmin(axis=1)
+            for start in range(0, len(X), chunk_size)
+        ]) if len(X) else np.zeros(0, dtype=np.int64)
+
+
+def fit_product_clusters(features, k=DEFAULT_K, seed=0):
+    # Cluster produk berdasarkan fitur dimensi; label diurutkan dari center teringan
+    X = features[FEATURES].to_numpy(dtype=np.float64)
+    scaler = Scaler(X)
+    Z = scaler.transform(X)
+    model = MiniBatchKMeans(k=k, seed=seed).fit(Z)
+    labels = model.predict(Z)
+
+    centers = pd.DataFrame(scaler.inverse_transform(model.centers), columns=FEATURES)
+    order = centers['product_weight_g'].argsort().to_numpy()
+    rank = np.empty(k, dtype=np.int64)
+    rank[order] = np.arange(k)
+    centers = centers.iloc[order].reset_index(drop=True)
+    centers['complexity_group'] = [
+        f"C{i + 1}: {row.product_weight_g / 1000:.2f} kg, {row.product_volume_cm3 / 1000:.1f} L"
+        for i, row in enumerate(centers.itertuples())
+    ]
+    return rank[labels], centers
+
+
+def cluster_groups(features, labels, centers):
+    # Tingkat keterlambatan per cluster, dengan kolom yang sama seperti pengelompokan median sebelumnya
+    grouped = features[OUTCOMES].astype(float).groupby(labels).agg(
+        total_orders=('shipping_late', 'count'),
+        shipping_late_rate=('shipping_late', 'mean'),
+        delivered_late_rate=('delivered_late', 'mean')
+    )
+    grouped.insert(0, 'complexity_group', centers['complexity_group'].to_numpy()[grouped.index])
+    grouped = grouped.reset_index(drop=True)
+
+    # Round percentage values
+    grouped['shipping_late_rate'] = (grouped['shipping_late_rate'] * 100).round(2)
+    grouped['delivered_late_rate'] = (grouped['delivered_late_rate'] * 100).round(2)
+    return grouped
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+from calendar_dim import period_labels
+
+# Identitas pelanggan untuk kohort: customer_unique_id (satu per orang) jika ada di dataset,
+# jika tidak customer_id (di dataset Olist satu customer_id per pesanan, jadi pelanggan jarang "kembali")
+CUSTOMER_KEYS = ['customer_unique_id', 'customer_id']
+COHORT_COLUMNS = ['order_id', *CUSTOMER_KEYS, 'order_purchase_timestamp', 'payment_value_sum']
+METRICS = {
+    'retention': 'Retained Customers (%)',
+    'customers': 'Active Customers',
+    'revenue': 'Revenue',
+}
+
+
+def month_index(timestamps):
+    # Kunci bulan integer berurutan (bulan sejak 1970-01) langsung dari datetime64, tanpa ekstraksi tahun/bulan
+    return np.asarray(timestamps, dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+
+
+def cohort_matrix(customers, purchase_timestamps, revenue):
+    # Matriks kohort (bulan pembelian pertama x bulan sejak pembelian pertama): jumlah pelanggan aktif
+    # dan pendapatan, diakumulasi dengan bincount atas kunci integer tanpa loop per pelanggan
+    customers = pd.Series(customers).to_numpy()
+    timestamps = pd.to_datetime(pd.Series(purchase_timestamps)).to_numpy()
+    revenue = np.nan_to_num(np.asarray(revenue, dtype=np.float64))
+    valid = pd.notna(customers) & pd.notna(timestamps)
+    codes, _ = pd.factorize(customers[valid])
+    month = month_index(timestamps[valid])
+    revenue = revenue[valid]
+    if not len(month):
+        empty = pd.DataFrame(dtype=np.float64)
+        return {'customers': empty, 'revenue': empty, 'retention': empty}
+
+    base = month.min()
+    month -= base
+    n_months = int(month.max()) + 1
+
+    # Bulan pembelian pertama setiap pelanggan
+    first = np.full(codes.max() + 1, n_months, dtype=np.int64)
+    np.minimum.at(first, codes, month)
+
+    # Pendapatan: setiap pesanan masuk ke sel (kohort, umur) pelanggannya
+    cohort = first[codes]
+    revenue_matrix = np.bincount(
+        cohort * n_months + (month - cohort), weights=revenue, minlength=n_months * n_months
+    ).reshape(n_months, n_months)
+
+    # Pelanggan aktif: pasangan unik (pelanggan, bulan), dihitung sekali per sel
+    # (pd.unique berbasis hash, tanpa mengurutkan jutaan kunci seperti np.unique)
+    active = pd.unique(codes.astype(np.int64) * n_months + month)
+    active_customer, active_month = np.divmod(active, n_months)
+    active_cohort = first[active_customer]
+    customer_matrix = np.bincount(
+        active_cohort * n_months + (active_month - active_cohort), minlength=n_months * n_months
+    ).reshape(n_months, n_months).astype(np.float64)
+
+    # Sel di luar rentang data (kohort terbaru belum punya umur panjang) dikosongkan, bukan 0
+    ages = np.arange(n_months)
+    observed = ages[None, :] < (n_months - ages)[:, None]
+    customer_matrix[~observed] = np.nan
+    revenue_matrix[~observed] = np.nan
+
+    # Label kohort YYYY-MM dari kunci bulan (bulan sejak 1970-01)
+    keys = [(1970 + (base + i) // 12) * 100 + (base + i) % 12 + 1 for i in range(n_months)]
+    index = pd.Index(period_labels(keys, 'month'), name='cohort')
+    columns = pd.Index(ages, name='months_since_first_purchase')
+    customer_frame = pd.DataFrame(customer_matrix, index=index, columns=columns)
+    revenue_frame = pd.DataFrame(revenue_matrix, index=index, columns=columns)
+
+    # Kohort tanpa pelanggan (bulan tanpa pembelian pertama) dibuang
+    populated = customer_frame[0] > 0
+    customer_frame = customer_frame[populated]
+    revenue_frame = revenue_frame[populated]
+    return {
+        'customers': customer_frame,
+        'revenue': revenue_frame,
+        'retention': customer_frame.div(customer_frame[0], axis=0) * 100,
+    }
+
+
+def cohort_tables(orders):
+    # orders: satu baris per pesanan dengan kolom COHORT_COLUMNS yang tersedia
+    customer_key = next(key for key in CUSTOMER_KEYS if key in orders.columns)
+    tables = cohort_matrix(orders[customer_key], orders['order_purchase_timestamp'], orders['payment_value_sum'])
+    for table in tables.values():
+        table.attrs['customer_key'] = customer_key
+    return tables
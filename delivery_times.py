@@ -0,0 +1,145 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from category_filter import category_row_mask
+
+# Persentil waktu pengiriman dari sketsa histogram logaritmik (gaya DDSketch): setiap durasi dipetakan ke
+# bucket bertanda dengan lebar relatif tetap, sehingga nilai persentil yang dikembalikan berjarak paling jauh
+# ACCURACY (relatif) dari persentil eksak. Sketsa cukup dijumlahkan untuk digabung, jadi disimpan per hari
+# dan dijumlahkan sesuai filter tanggal dan kategori.
+ACCURACY = float(os.environ.get("DELIVERY_SKETCH_ACCURACY", "0.01"))
+GAMMA = (1 + ACCURACY) / (1 - ACCURACY)
+# Durasi di bawah MIN_DAYS (1 jam) masuk bucket nol; di atas MAX_DAYS dipotong ke bucket terakhir
+MIN_DAYS = 1 / 24
+MAX_DAYS = 1000.0
+KEY_LIMIT = math.ceil(math.log(MAX_DAYS / MIN_DAYS) / math.log(GAMMA)) + 1
+N_KEYS = 2 * KEY_LIMIT + 1
+
+METRICS = {
+    'duration': 'Delivery Time (days)',
+    'delay': 'Delay vs Estimate (days)',
+}
+QUANTILES = {'p10': 0.10, 'p25': 0.25, 'p50': 0.50, 'p75': 0.75, 'p90': 0.90, 'p99': 0.99}
+DELIVERY_COLUMNS = [
+    'order_id', 'order_purchase_timestamp', 'order_delivered_customer_date', 'order_estimated_delivery_date',
+    'customer_state', 'product_category_name_english',
+]
+
+
+def sketch_keys(days):
+    # Kunci bucket bertanda: 0 untuk |x| < MIN_DAYS, +/-(j + 1) untuk MIN_DAYS * GAMMA^(j-1) < |x| <= MIN_DAYS * GAMMA^j
+    days = np.asarray(days, dtype=np.float64)
+    magnitude = np.minimum(np.abs(days), MAX_DAYS)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        j = np.ceil(np.log(magnitude / MIN_DAYS) / np.log(GAMMA))
+        keys = np.where(magnitude < MIN_DAYS, 0, np.sign(days) * (j + 1))
+    return np.nan_to_num(keys).astype(np.int32)
+
+
+def bucket_values(keys):
+    # Nilai wakil tiap bucket (rata-rata harmonik batasnya), galat relatif paling besar ACCURACY
+    keys = np.asarray(keys)
+    magnitude = MIN_DAYS * 2 * GAMMA ** (np.abs(keys) - 1.0) / (GAMMA + 1)
+    return np.where(keys == 0, 0.0, np.sign(keys) * magnitude)
+
+
+def _days_between(later, earlier):
+    return ((later - earlier) / pd.Timedelta(days=1)).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def delivery_partials(df):
+    # Sketsa parsial per (kategori, hari pembelian, state, metrik, bucket): jumlah pesanan terkirim.
+    # Metrik 0 = durasi pengiriman (diterima - dibeli), 1 = selisih terhadap estimasi (diterima - estimasi)
+    delivered = df['order_delivered_customer_date']
+    frames = []
+    for metric, days in enumerate([
+        _days_between(delivered, df['order_purchase_timestamp']),
+        _days_between(delivered, df['order_estimated_delivery_date']),
+    ]):
+        valid = ~np.isnan(days) & df['order_id'].notna().to_numpy()
+        frames.append(pd.DataFrame({
+            'category_code': df['product_category_name_english'].cat.codes.to_numpy()[valid],
+            'order_day': df['order_purchase_timestamp'].dt.normalize().to_numpy()[valid],
+            'customer_state': df['customer_state'].astype(object).to_numpy()[valid],
+            'metric': np.int8(metric),
+            'key': sketch_keys(days[valid]),
+        }))
+    return pd.concat(frames, ignore_index=True).value_counts(dropna=False).rename('orders').reset_index()
+
+
+def combine_delivery_partials(parts):
+    return pd.concat(parts, ignore_index=True).groupby(
+        ['category_code', 'order_day', 'customer_state', 'metric', 'key'], sort=False, dropna=False
+    )['orders'].sum().reset_index()
+
+
+def delivery_index(partials):
+    # Sketsa parsial sebagai array NumPy terurut per hari: filter tanggal = dua searchsorted,
+    # filter kategori = indeks boolean, tanpa groupby pandas per rerun
+    partials = partials.sort_values('order_day', kind='stable')
+    state_codes, states = pd.factorize(partials['customer_state'], sort=True)
+    return {
+        'order_day': partials['order_day'].to_numpy(dtype='datetime64[ns]'),
+        'category_code': partials['category_code'].to_numpy(),
+        'state_code': state_codes.astype(np.int16),
+        'states': pd.Index(states, dtype=object),
+        'metric': partials['metric'].to_numpy(),
+        'key': partials['key'].to_numpy(),
+        'orders': partials['orders'].to_numpy(dtype=np.int32),
+    }
+
+
+def histogram_percentiles(group_codes, groups, metric, keys, orders, name):
+    # Kernel per kelompok terurut: histogram padat (kelompok x metrik x bucket) lewat bincount, jumlah kumulatif
+    # per baris histogram, lalu bucket pertama yang jumlah kumulatifnya melewati peringkat persentil
+    # (peringkat floor(q * (n - 1)), seperti np.percentile method='lower')
+    n_metrics = len(METRICS)
+    flat = (np.asarray(group_codes, dtype=np.int64) * n_metrics + metric) * N_KEYS + (np.asarray(keys) + KEY_LIMIT)
+    histogram = np.bincount(flat, weights=orders, minlength=len(groups) * n_metrics * N_KEYS)
+    cumulative = np.cumsum(histogram.reshape(-1, N_KEYS), axis=1)
+    totals = cumulative[:, -1]
+    observed = totals > 0
+
+    result = pd.DataFrame({
+        name: np.repeat(np.asarray(groups, dtype=object), n_metrics)[observed],
+        'metric': np.tile(list(METRICS), len(groups))[observed],
+        'orders': totals[observed].astype(np.int64),
+    })
+    cumulative = cumulative[observed]
+    for label, q in QUANTILES.items():
+        rank = np.floor(q * (result['orders'].to_numpy() - 1))
+        position = (cumulative <= rank[:, None]).sum(axis=1)
+        result[label] = bucket_values(position - KEY_LIMIT)
+    return result
+
+
+def delivery_percentiles(index, start_date, end_date, category_mask, by, categories=None):
+    # Persentil per customer_state (by='customer_state') atau per kategori produk
+    # (by='product_category_name_english', categories = kamus kategori urutan bitmask)
+    days = index['order_day']
+    lo = days.searchsorted(np.datetime64(pd.Timestamp(start_date)), side='left')
+    hi = days.searchsorted(np.datetime64(pd.Timestamp(end_date)), side='right')
+    codes = index['category_code'][lo:hi]
+    selected = category_row_mask(category_mask, codes)
+    if by == 'customer_state':
+        group_codes, groups = index['state_code'][lo:hi], index['states']
+        selected &= group_codes >= 0
+    else:
+        group_codes, groups = codes, categories
+    return histogram_percentiles(
+        group_codes[selected], groups, index['metric'][lo:hi][selected], index['key'][lo:hi][selected],
+        index['orders'][lo:hi][selected], by
+    )
+
+
+def percentiles_from_histogram(histogram, by):
+    # Histogram (kelompok, metric, key, orders) dari backend SQL/Polars ke frame persentil yang sama
+    histogram = histogram.dropna(subset=['group'])
+    group_codes, groups = pd.factorize(histogram['group'], sort=True)
+    return histogram_percentiles(
+        group_codes, pd.Index(groups, dtype=object), histogram['metric'].to_numpy(dtype=np.int64),
+        histogram['key'].to_numpy(dtype=np.int64), histogram['orders'].to_numpy(dtype=np.float64), by
+    )
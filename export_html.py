@@ -0,0 +1,247 @@
+import argparse
+import base64
+import html
+import json
+import os
+import re
+from contextlib import contextmanager
+from datetime import date
+from unittest import mock
+
+# Ekspor dashboard ke satu file HTML statis (tanpa Python per penonton), contoh:
+#   python export_html.py app.py -o report.html
+#   python export_html.py app_dinamyc.py --start 2017-01-01 --end 2017-06-30 --granularity week -o juni.html
+# Script dijalankan sekali secara headless (streamlit.testing), lalu setiap elemen yang tampil diubah ke HTML:
+# grafik Plotly sebagai JSON yang di-render plotly.js, gambar matplotlib (treemap) sebagai PNG base64.
+
+TIMEOUT = int(os.environ.get("EXPORT_TIMEOUT", "600"))
+
+PAGE = """<!DOCTYPE html>
+<html lang="id">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+{plotly_js}
+<style>
+body {{ font-family: "Source Sans Pro", sans-serif; color: #31333f; margin: 0 auto; max-width: 1400px; padding: 2rem 3rem; }}
+h1 {{ font-size: 2.75rem; }}
+.row {{ display: flex; gap: 1rem; }}
+.col {{ flex: 1 1 0; min-width: 0; }}
+.chart {{ width: 100%; height: 450px; }}
+.caption {{ color: rgba(49, 51, 63, 0.6); font-size: 0.875rem; }}
+.filters {{ background: #f0f2f6; border-radius: 0.5rem; padding: 0.75rem 1rem; font-size: 0.9rem; }}
+img {{ max-width: 100%; }}
+table {{ border-collapse: collapse; width: 100%; font-size: 0.875rem; }}
+th, td {{ border: 1px solid #e6e9ef; padding: 0.25rem 0.5rem; text-align: right; }}
+th:first-child, td:first-child {{ text-align: left; }}
+</style>
+</head>
+<body>
+{filters}
+{body}
+<script>
+document.querySelectorAll(".chart").forEach(function (div) {{
+  var spec = JSON.parse(div.nextElementSibling.textContent);
+  Plotly.newPlot(div, spec.data, spec.layout, spec.config);
+}});
+</script>
+</body>
+</html>
+"""
+
+
+@contextmanager
+def capture_media():
+    # Isi file media (PNG dari st.pyplot) disalin saat disimpan, karena storage AppTest dibuang setelah run
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    media = {}
+    original = MemoryMediaFileStorage.load_and_get_id
+
+    def load_and_get_id(self, path_or_data, mimetype, kind, filename=None):
+        file_id = original(self, path_or_data, mimetype, kind, filename)
+        media[file_id] = (self.get_file(file_id).content, mimetype)
+        return file_id
+
+    with mock.patch.object(MemoryMediaFileStorage, "load_and_get_id", load_and_get_id):
+        yield media
+
+
+def _widget(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"Widget '{label}' tidak ditemukan")
+
+
+def apply_filters(at, filters):
+    # State filter app_dinamyc.py diatur lewat widget sidebar yang sama dengan yang dipakai pengguna
+    if "start" in filters or "end" in filters:
+        widget = _widget(at.sidebar.date_input, "Pilih rentang tanggal:")
+        start, end = widget.value
+        widget.set_value((filters.get("start", start), filters.get("end", end)))
+    if "granularity" in filters:
+        _widget(at.sidebar.selectbox, "Granularitas waktu:").set_value(filters["granularity"])
+    if "categories" in filters:
+        widget = _widget(at.sidebar.multiselect, "Kategori terpilih:")
+        unknown = sorted(set(filters["categories"]) - set(widget.options))
+        if unknown:
+            raise ValueError(f"Kategori tidak dikenal: {', '.join(unknown)}")
+        widget.set_value(filters["categories"])
+    if "years" in filters:
+        widget = _widget(at.sidebar.multiselect, "Bandingkan tahun:")
+        unknown = sorted(set(map(str, filters["years"])) - set(widget.options))
+        if unknown:
+            raise ValueError(f"Tahun tidak ada di dataset: {', '.join(unknown)}")
+        widget.set_value(filters["years"])
+    if "rfm_as_of" in filters:
+        _widget(at.sidebar.date_input, "Tanggal acuan RFM:").set_value(filters["rfm_as_of"])
+    if "k" in filters:
+        _widget(at.slider, "Jumlah cluster (k):").set_value(filters["k"])
+
+
+def run_app(script, filters=None):
+    from streamlit.testing.v1 import AppTest
+
+    with capture_media() as media:
+        at = AppTest.from_file(script, default_timeout=TIMEOUT).run()
+        if filters and not at.exception:
+            apply_filters(at, filters)
+            at.run()
+    if at.exception:
+        raise RuntimeError(f"{script} gagal dijalankan: {at.exception[0].value}")
+    return at, media
+
+
+def _inline(text):
+    text = html.escape(text)
+    text = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", text)
+    return text.replace("  \n", "<br>\n")
+
+
+def markdown_html(body, allow_html=False):
+    # Subset Markdown yang dipakai dashboard: heading, garis pemisah, teks tebal, dan HTML mentah
+    if allow_html and body.lstrip().startswith("<"):
+        return body
+    parts = []
+    for block in re.split(r"\n\s*\n", body.strip()):
+        heading = re.match(r"^(#{1,6})\s+(.*)$", block)
+        if heading:
+            level = len(heading.group(1))
+            parts.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+        elif re.fullmatch(r"-{3,}|\*{3,}", block.strip()):
+            parts.append("<hr>")
+        else:
+            parts.append(f"<p>{_inline(block)}</p>")
+    return "\n".join(parts)
+
+
+def _plotly(proto, index):
+    spec = json.loads(proto.spec)
+    spec["config"] = {**json.loads(proto.config or "{}"), "responsive": True, "displaylogo": False}
+    # "</" di-escape agar JSON tidak menutup tag <script> lebih awal
+    payload = json.dumps(spec).replace("</", "<\\/")
+    return f'<div class="chart" id="chart-{index}"></div>\n<script type="application/json">{payload}</script>'
+
+
+def _image(proto, media):
+    tags = []
+    for image in proto.imgs:
+        file_id = os.path.splitext(os.path.basename(image.url))[0]
+        if file_id in media:
+            content, mimetype = media[file_id]
+            tags.append(f'<img src="data:{mimetype};base64,{base64.b64encode(content).decode()}" alt="{html.escape(image.caption)}">')
+    return "\n".join(tags)
+
+
+def render_node(node, media, counter):
+    kind = getattr(node, "type", None)
+    children = getattr(node, "children", None)
+    if children is not None:
+        inner = "\n".join(render_node(child, media, counter) for child in children.values())
+        if kind == "flex_container":
+            return f'<div class="row">\n{inner}\n</div>'
+        if kind == "column":
+            return f'<div class="col">\n{inner}\n</div>'
+        return inner
+
+    if kind == "title":
+        return f"<h1>{html.escape(node.value)}</h1>"
+    if kind in ("header", "subheader"):
+        tag = node.proto.tag or ("h2" if kind == "header" else "h3")
+        divider = "<hr>" if node.proto.divider else ""
+        return f"<{tag}>{html.escape(node.value)}</{tag}>{divider}"
+    if kind == "text":
+        return f"<p>{html.escape(node.value)}</p>"
+    if kind == "caption":
+        return f'<p class="caption">{_inline(node.value)}</p>'
+    if kind == "markdown":
+        return markdown_html(node.proto.body, node.proto.allow_html)
+    if kind == "plotly_chart":
+        counter[0] += 1
+        return _plotly(node.proto, counter[0])
+    if kind == "image":
+        return _image(node.proto, media)
+    if kind == "dataframe":
+        return node.value.to_html(index=False, float_format=lambda value: f"{value:,.1f}", border=0)
+    # Elemen lain (widget, status) tidak punya padanan statis
+    return ""
+
+
+def export(script, output, filters=None, cdn=False):
+    at, media = run_app(script, filters)
+    counter = [0]
+    body = render_node(at.main, media, counter)
+    title = at.title[0].value if len(at.title) else os.path.basename(script)
+
+    from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+    if cdn:
+        plotly_js = f'<script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>'
+    else:
+        plotly_js = f"<script>{get_plotlyjs()}</script>"
+
+    filter_note = ""
+    if filters:
+        described = ", ".join(
+            f"{name}: {', '.join(map(str, value)) if isinstance(value, (list, tuple)) else value}"
+            for name, value in filters.items()
+        )
+        filter_note = f'<div class="filters">Snapshot filter &mdash; {html.escape(described)}</div>'
+
+    page = PAGE.format(title=html.escape(title), plotly_js=plotly_js, filters=filter_note, body=body)
+    with open(output, "w", encoding="utf-8") as out:
+        out.write(page)
+    return counter[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ekspor dashboard Streamlit ke satu file HTML statis")
+    parser.add_argument("script", nargs="?", default="app.py")
+    parser.add_argument("-o", "--output", default="report.html")
+    parser.add_argument("--cdn", action="store_true", help="muat plotly.js dari CDN alih-alih disisipkan (file lebih kecil)")
+    # State filter untuk app_dinamyc.py; yang tidak diisi memakai default dashboard
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--end", type=date.fromisoformat)
+    parser.add_argument("--granularity", choices=["month", "week", "quarter"])
+    parser.add_argument("--categories", type=lambda text: [c.strip() for c in text.split(",") if c.strip()],
+                        help="daftar kategori dipisah koma")
+    parser.add_argument("--years", type=lambda text: [int(y) for y in text.split(",") if y.strip()],
+                        help="tahun yang dibandingkan di grafik antar tahun, dipisah koma")
+    parser.add_argument("--rfm-as-of", dest="rfm_as_of", type=date.fromisoformat)
+    parser.add_argument("--k", type=int)
+    args = parser.parse_args()
+
+    filters = {
+        name: getattr(args, name)
+        for name in ("start", "end", "granularity", "categories", "years", "rfm_as_of", "k")
+        if getattr(args, name) is not None
+    }
+    charts = export(args.script, args.output, filters, args.cdn)
+    size = os.path.getsize(args.output) / 2**20
+    print(f"{args.output}: {charts} grafik, {size:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
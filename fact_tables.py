@@ -0,0 +1,20 @@
+# Tabel fakta level pesanan: satu baris per order_id, hanya kolom yang dipakai grafik pengiriman dan RFM
+ORDER_COLUMNS = [
+    'order_id', 'customer_id', 'order_purchase_timestamp', 'order_delivered_customer_date',
+    'order_estimated_delivery_date', 'customer_city', 'customer_state', 'geolocation_lat_cons', 'geolocation_lng_cons',
+    'calculated_review_score', 'payment_value_sum', 'product_category_name_english',
+    'delivered_late', 'shipping_late',
+]
+
+# Tabel level item untuk analisis produk (clustering)
+ITEM_COLUMNS = [
+    'order_id', 'product_category_name_english', 'product_weight_g', 'product_length_cm',
+    'product_height_cm', 'product_width_cm', 'shipping_late', 'delivered_late',
+]
+
+DATE_COLUMNS = ['order_purchase_timestamp', 'order_delivered_customer_date', 'order_estimated_delivery_date']
+
+
+def item_facts(df):
+    return df[ITEM_COLUMNS].reset_index(drop=True)
+
@@ -0,0 +1,175 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+import parquet_cache
+
+# Jumlah unduhan bersamaan (dan ukuran pool koneksi keep-alive per host)
+WORKERS = int(os.environ.get("FETCH_WORKERS", "8"))
+TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "30"))
+
+_session = None
+_lock = threading.Lock()
+
+
+def session():
+    # Satu Session per proses: pool koneksi keep-alive (urllib3) dipakai bersama oleh semua thread,
+    # sehingga koneksi ke host yang sama dipakai ulang antar unduhan dan antar rerun
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=WORKERS, pool_maxsize=WORKERS)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+    return _session
+
+
+def is_remote(location):
+    return location.startswith(("http://", "https://"))
+
+
+def remote_version(url):
+    response = session().head(url, timeout=TIMEOUT)
+    response.raise_for_status()
+    return response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+
+def _cache_paths(url):
+    key = hashlib.sha1(url.encode()).hexdigest()[:16]
+    base = os.path.join(parquet_cache.CACHE_DIR, "http", f"{key}.{os.path.basename(url)}")
+    return base, base + ".json"
+
+
+class _TeeReader:
+    # Isi respons dialirkan ke parser sambil disalin ke cache disk, tanpa menampung seluruh file di memori.
+    # Setiap unduhan menulis ke file sementara sendiri (unduhan bersamaan atas URL yang sama tidak saling
+    # menimpa); metadata validator baru ditulis setelah salinan lengkap dipindahkan ke tempatnya
+    def __init__(self, response, path, meta_path, meta):
+        self.response = response
+        self.path = path
+        self.meta_path = meta_path
+        self.meta = meta
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        self.out = os.fdopen(fd, "wb")
+        self.complete = False
+
+    def read(self, size=-1):
+        chunk = self.response.raw.read(None if size is None or size < 0 else size, decode_content=True)
+        self.out.write(chunk)
+        if not chunk or size is None or size < 0:
+            self.complete = True
+        return chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if not self.complete and exc[0] is None:
+            # Parser berhenti sebelum akhir stream: baca sisanya agar file cache utuh
+            while self.read(2**16):
+                pass
+        self.out.close()
+        self.response.close()
+        if exc[0] is None:
+            os.replace(self.tmp_path, self.path)
+            _write_meta(self.meta_path, self.meta)
+        else:
+            os.remove(self.tmp_path)
+
+
+def _write_meta(meta_path, meta):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(meta_path), suffix=".tmp")
+    with os.fdopen(fd, "w") as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(tmp_path, meta_path)
+
+
+def open_remote(url):
+    # GET bersyarat (If-None-Match / If-Modified-Since) terhadap salinan cache terakhir:
+    # 304 berarti file tidak berubah dan dibaca dari disk, 200 dialirkan langsung ke pemanggil
+    path, meta_path = _cache_paths(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    headers = {}
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as meta_file:
+            meta = json.load(meta_file)
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = session().get(url, headers=headers, stream=True, timeout=TIMEOUT)
+    if response.status_code == 304:
+        response.close()
+        return open(path, "rb")
+    response.raise_for_status()
+
+    meta = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    return _TeeReader(response, path, meta_path, meta)
+
+
+def read_csv(location, **kwargs):
+    if not is_remote(location):
+        return pd.read_csv(location, **kwargs)
+    with open_remote(location) as stream:
+        return pd.read_csv(stream, **kwargs)
+
+
+def download(url, path):
+    with open_remote(url) as stream, open(path, "wb") as out:
+        shutil.copyfileobj(stream, out)
+
+
+def read_csvs(locations, workers=WORKERS):
+    # Semua artefak diunduh dan diparse bersamaan
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(locations, pool.map(read_csv, locations)))
+
+
+def main():
+    # Bandingkan unduhan berurutan vs bersamaan vs revalidasi terhadap server data lokal, contoh:
+    #   python fetch.py --latency 0.2
+    from dashboard_data import STATIC_ARTIFACTS
+    from loadtest import serve_data
+
+    parser = argparse.ArgumentParser(description="Benchmark lapisan fetch artefak remote")
+    parser.add_argument("--data-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--latency", type=float, default=0.1, help="Latensi buatan server data (detik)")
+    args = parser.parse_args()
+
+    server, base_url = serve_data(args.data_dir, args.latency)
+    locations = [base_url + name for name in STATIC_ARTIFACTS]
+    for location in locations:
+        for path in _cache_paths(location):
+            if os.path.exists(path):
+                os.remove(path)
+    try:
+        started = time.perf_counter()
+        for location in locations:
+            pd.read_csv(location)
+        print(f"{'berurutan, tanpa pool':>28}: {time.perf_counter() - started:.3f} s")
+
+        started = time.perf_counter()
+        read_csvs(locations)
+        print(f"{'bersamaan, unduhan penuh':>28}: {time.perf_counter() - started:.3f} s")
+
+        started = time.perf_counter()
+        read_csvs(locations)
+        print(f"{'bersamaan, revalidasi (304)':>28}: {time.perf_counter() - started:.3f} s")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
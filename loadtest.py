@@ -0,0 +1,257 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.sync.client import connect
+
+# Uji beban beberapa sesi bersamaan terhadap server Streamlit lokal, contoh:
+#   python loadtest.py app_dinamyc.py --data-dir data/ --sessions 20 --interactions 10
+# Semua CSV dilayani oleh server HTTP lokal pengganti URL GitHub, sehingga bisa dijalankan offline.
+
+EMPTY_WORLD = {"type": "FeatureCollection", "features": []}
+
+
+class _DataHandler(SimpleHTTPRequestHandler):
+    # HTTP/1.1 agar klien bisa memakai ulang koneksi (keep-alive)
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        super().do_GET()
+
+    def do_HEAD(self):
+        time.sleep(self.latency)
+        super().do_HEAD()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_data(data_dir, latency=0.0):
+    # Server HTTP pengganti untuk semua artefak CSV (opsional dengan latensi buatan)
+    handler = type("DataHandler", (_DataHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=data_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/"
+
+
+def start_streamlit(app, port, env):
+    command = [
+        sys.executable, "-m", "streamlit", "run", app,
+        "--server.headless", "true",
+        "--server.port", str(port),
+        "--server.enableXsrfProtection", "false",
+        "--server.fileWatcherType", "none",
+        "--browser.gatherUsageStats", "false",
+    ]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Server Streamlit tidak merespons /_stcore/health")
+
+
+def rss_bytes(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.samples.append(rss_bytes(self.pid))
+            self.stopped.wait(self.interval)
+
+
+class Session:
+    # Klien websocket minimal yang meniru satu tab browser
+    def __init__(self, ws):
+        self.ws = ws
+        self.widgets = {}
+        self.widget_states = {}
+        self.errors = 0
+
+    def rerun(self, timeout=300):
+        back = BackMsg()
+        back.rerun_script.query_string = ""
+        back.rerun_script.widget_states.widgets.extend(self.widget_states.values())
+
+        started = time.perf_counter()
+        self.ws.send(back.SerializeToString())
+        widgets = {}
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(self.ws.recv(timeout=timeout))
+            kind = msg.WhichOneof("type")
+            if kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                if element.WhichOneof("type") == "exception":
+                    self.errors += 1
+                widget = getattr(element, element.WhichOneof("type"))
+                if getattr(widget, "id", ""):
+                    widgets[widget.id] = (element.WhichOneof("type"), widget)
+            elif kind == "script_finished":
+                if msg.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                break
+        elapsed = time.perf_counter() - started
+
+        # Id widget bisa berubah antar rerun; buang state widget yang sudah tidak ada
+        self.widgets = widgets
+        self.widget_states = {k: v for k, v in self.widget_states.items() if k in widgets}
+        return elapsed
+
+    def find(self, kind):
+        return [(wid, widget) for wid, (k, widget) in self.widgets.items() if k == kind]
+
+    def set_date_range(self, rng):
+        for wid, widget in self.find("date_input")[:1]:
+            low = date.fromisoformat(widget.min.replace("/", "-"))
+            high = date.fromisoformat(widget.max.replace("/", "-"))
+            span = (high - low).days
+            start = low + timedelta(days=rng.randrange(span + 1))
+            end = start + timedelta(days=rng.randrange((high - start).days + 1))
+            state = WidgetState(id=wid)
+            state.string_array_value.data.extend([start.isoformat(), end.isoformat()])
+            self.widget_states[wid] = state
+            return True
+        return False
+
+    def toggle_category(self, rng):
+        for wid, widget in self.find("multiselect")[:1]:
+            current = self.widget_states.get(wid)
+            selected = list(current.string_array_value.data) if current else [widget.options[i] for i in widget.default]
+            if not widget.options:
+                return False
+            option = rng.choice(list(widget.options))
+            selected = [o for o in selected if o != option] if option in selected else selected + [option]
+            state = WidgetState(id=wid)
+            state.string_array_value.data.extend(selected)
+            self.widget_states[wid] = state
+            return True
+        return False
+
+
+def run_session(port, interactions, seed, think_time):
+    rng = random.Random(seed)
+    latencies = []
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    with connect(url, subprotocols=["streamlit"], max_size=None, open_timeout=30) as ws:
+        session = Session(ws)
+        latencies.append(session.rerun())
+        for _ in range(interactions):
+            action = rng.choice([session.set_date_range, session.toggle_category])
+            action(rng)
+            latencies.append(session.rerun())
+            time.sleep(think_time)
+    return latencies, session.errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test untuk app.py / app_dinamyc.py")
+    parser.add_argument("app", nargs="?", default="app_dinamyc.py")
+    parser.add_argument("--data-dir", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Folder berisi semua artefak CSV (termasuk data gabungan untuk app_dinamyc.py)")
+    parser.add_argument("--sessions", type=int, default=10, help="Jumlah sesi bersamaan")
+    parser.add_argument("--interactions", type=int, default=5, help="Jumlah interaksi per sesi")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Jeda antar interaksi (detik)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latensi buatan server data (detik)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Simpan laporan ke file JSON")
+    args = parser.parse_args()
+
+    data_server, base_url = serve_data(args.data_dir, args.latency)
+    world_file = tempfile.NamedTemporaryFile("w", suffix=".geojson", delete=False)
+    json.dump(EMPTY_WORLD, world_file)
+    world_file.close()
+
+    env = dict(os.environ, DATA_BASE_URL=base_url, WORLD_GEOJSON_URL=world_file.name)
+    port = free_port()
+    server = start_streamlit(args.app, port, env)
+    sampler = RssSampler(server.pid)
+    sampler.start()
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            results = list(pool.map(
+                lambda i: run_session(port, args.interactions, args.seed + i, args.think_time),
+                range(args.sessions),
+            ))
+        wall = time.perf_counter() - started
+    finally:
+        sampler.stopped.set()
+        sampler.join()
+        server.terminate()
+        server.wait()
+        data_server.shutdown()
+        os.unlink(world_file.name)
+
+    first = np.array([latencies[0] for latencies, _ in results])
+    reruns = np.concatenate([latencies[1:] for latencies, _ in results]) if args.interactions else np.array([])
+    everything = np.concatenate([first, reruns])
+    p50, p95, p99 = np.percentile(everything, [50, 95, 99])
+
+    report = {
+        "app": args.app,
+        "sessions": args.sessions,
+        "reruns": int(everything.size),
+        "wall_seconds": round(wall, 3),
+        "throughput_reruns_per_s": round(everything.size / wall, 2),
+        "latency_p50_ms": round(p50 * 1000, 1),
+        "latency_p95_ms": round(p95 * 1000, 1),
+        "latency_p99_ms": round(p99 * 1000, 1),
+        "first_run_p50_ms": round(float(np.median(first)) * 1000, 1),
+        "interaction_p50_ms": round(float(np.median(reruns)) * 1000, 1) if reruns.size else None,
+        "script_errors": sum(errors for _, errors in results),
+        "rss_start_mb": round(sampler.samples[0] / 2**20, 1),
+        "rss_peak_mb": round(max(sampler.samples) / 2**20, 1),
+        "rss_end_mb": round(sampler.samples[-1] / 2**20, 1),
+    }
+    for key, value in report.items():
+        print(f"{key:>26}: {value}")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
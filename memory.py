@@ -0,0 +1,98 @@
+import logging
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Batas memori total untuk frame yang dimuat (MB); 0 berarti tanpa batas
+BUDGET_MB = float(os.environ.get("MEMORY_BUDGET_MB", "0"))
+# "warn" hanya memberi peringatan, "enforce" menolak memuat data yang melebihi batas
+BUDGET_MODE = os.environ.get("MEMORY_BUDGET_MODE", "warn")
+
+# Laporan memori per kolom untuk setiap frame yang sudah dioptimasi, per proses
+REPORTS = {}
+
+
+class MemoryBudgetExceeded(MemoryError):
+    pass
+
+
+def _downcast_column(series, float_tolerance, max_category_ratio):
+    if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        downcast = 'unsigned' if len(series) and series.min() >= 0 else 'integer'
+        return pd.to_numeric(series, downcast=downcast)
+    if pd.api.types.is_float_dtype(series):
+        # float32 hanya dipakai jika selisihnya masih dalam toleransi
+        as_float32 = series.astype(np.float32)
+        if np.allclose(as_float32.to_numpy(dtype=np.float64), series.to_numpy(), rtol=0, atol=float_tolerance, equal_nan=True):
+            return as_float32
+        return series
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        # String berkardinalitas rendah (misalnya Segment, customer_state) menjadi categorical
+        if len(series) and series.nunique(dropna=True) / len(series) <= max_category_ratio:
+            return series.astype('category')
+    return series
+
+
+def optimize_frame(name, df, float_tolerance=1e-3, max_category_ratio=0.5):
+    # Mengembalikan frame baru dengan dtype ringkas; frame pemanggil tidak diubah (salinan dangkal,
+    # kolom yang tidak diturunkan tipenya tetap berbagi data)
+    df = df.copy(deep=False)
+    before = df.memory_usage(deep=True)
+    dtypes_before = df.dtypes
+
+    for column in df.columns:
+        df[column] = _downcast_column(df[column], float_tolerance, max_category_ratio)
+
+    after = df.memory_usage(deep=True)
+    report = pd.DataFrame({
+        'dtype_before': dtypes_before.astype(str),
+        'dtype_after': df.dtypes.astype(str),
+        'bytes_before': before,
+        'bytes_after': after,
+    }).reindex(before.index).rename_axis('column')
+    report.loc['Index', ['dtype_before', 'dtype_after']] = str(df.index.dtype)
+    report['saved_pct'] = (100 * (1 - report['bytes_after'] / report['bytes_before'])).round(1)
+
+    REPORTS[name] = report
+    logger.info("%s: %.1f MB -> %.1f MB", name, before.sum() / 2**20, after.sum() / 2**20)
+    check_budget()
+    return df
+
+
+def total_bytes():
+    # Salinan daftar laporan: frame lain bisa sedang dioptimasi di thread prefetch
+    return int(sum(report['bytes_after'].sum() for report in list(REPORTS.values())))
+
+
+def _over_budget(used_mb, message, budget_mb, mode):
+    budget_mb = BUDGET_MB if budget_mb is None else budget_mb
+    mode = BUDGET_MODE if mode is None else mode
+    if not budget_mb or used_mb <= budget_mb:
+        return
+    message = f"{message}, melebihi batas {budget_mb:.1f} MB"
+    if mode == "enforce":
+        raise MemoryBudgetExceeded(message)
+    warnings.warn(message, ResourceWarning)
+
+
+def check_budget(budget_mb=None, mode=None):
+    used_mb = total_bytes() / 2**20
+    _over_budget(used_mb, f"Data yang dimuat memakai {used_mb:.1f} MB", budget_mb, mode)
+
+
+def check_estimate(name, estimated_bytes, budget_mb=None, mode=None):
+    # Dicek sebelum frame dibuat: frame lain yang sudah dimuat ditambah perkiraan ukuran frame ini
+    # (menggantikan versi lamanya jika sudah pernah dimuat), sehingga mode "enforce" menolak sebelum memori terpakai
+    previous = REPORTS.get(name)
+    loaded = total_bytes() - (int(previous['bytes_after'].sum()) if previous is not None else 0)
+    used_mb = (loaded + estimated_bytes) / 2**20
+    _over_budget(
+        used_mb, f"Memuat {name} (perkiraan {estimated_bytes / 2**20:.1f} MB) akan memakai {used_mb:.1f} MB",
+        budget_mb, mode,
+    )
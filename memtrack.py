@@ -0,0 +1,250 @@
+import json
+import os
+import sys
+import threading
+import time
+import types
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from memory import total_bytes
+
+# Akuntansi memori server dashboard: RSS proses, isi cache Streamlit (cache_data/cache_resource, termasuk
+# cache per sesi), session_state dan file media per sesi, serta figure matplotlib yang masih terbuka.
+# Totalnya dicatat per rerun agar pertumbuhan yang terus naik (kebocoran) bisa dideteksi.
+# Opt-in seperti profiler: MEMTRACK=1 (soak.py menyalakannya untuk server yang diuji)
+ENABLED = os.environ.get("MEMTRACK", "0") == "1"
+# Akuntansi lengkap (menelusuri isi cache dan sesi) hanya dilakukan setiap sekian rerun per proses
+EVERY = int(os.environ.get("MEMTRACK_EVERY", "10"))
+HISTORY_SIZE = int(os.environ.get("MEMTRACK_HISTORY", "2000"))
+# Jika diisi, setiap catatan juga ditambahkan ke file JSONL ini (dibaca soak.py dari luar proses server)
+LOG_PATH = os.environ.get("MEMTRACK_LOG", "")
+# Tampilan admin di sidebar hanya lewat konfigurasi server (bukan parameter URL yang bisa diisi siapa saja)
+ADMIN = os.environ.get("MEMTRACK_ADMIN") == "1"
+# Deret dianggap bocor jika naik lebih dari batas ini di sepanjang jendela catatan terakhir
+# dan median setiap blok jendela lebih tinggi dari blok sebelumnya
+LEAK_WINDOW = int(os.environ.get("MEMTRACK_LEAK_WINDOW", "50"))
+LEAK_MIN_MB = float(os.environ.get("MEMTRACK_LEAK_MIN_MB", "20"))
+LEAK_BLOCKS = 4
+LEAK_RISING_SHARE = 1.0
+
+# Deret yang diperiksa kebocorannya dan batas pertumbuhannya (byte, kecuali jumlah figure)
+LEAK_METRICS = {
+    'rss': LEAK_MIN_MB * 2**20,
+    'cache_data': LEAK_MIN_MB * 2**20,
+    'cache_resource': LEAK_MIN_MB * 2**20,
+    'session_state': LEAK_MIN_MB * 2**20,
+    'media_files': LEAK_MIN_MB * 2**20,
+    'figures': 1,
+}
+MAX_DEPTH = 8
+
+HISTORY = deque(maxlen=HISTORY_SIZE)
+_reruns = 0
+_lock = threading.Lock()
+
+
+def rss_bytes():
+    # RSS proses ini dari /proc (Linux); 0 jika tidak tersedia
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def sizeof(value, seen=None, depth=0):
+    # Perkiraan byte suatu objek: frame/array diukur dari buffernya, kontainer dan atribut objek
+    # ditelusuri sekali per objek (objek yang dipakai bersama tidak dihitung dua kali)
+    seen = set() if seen is None else seen
+    if id(value) in seen or depth > MAX_DEPTH:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (str, bytes, bytearray, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    if isinstance(value, (types.ModuleType, type, types.FunctionType, types.MethodType)):
+        return 0
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sizeof(k, seen, depth + 1) + sizeof(v, seen, depth + 1) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset, deque)):
+        return sys.getsizeof(value) + sum(sizeof(v, seen, depth + 1) for v in value)
+    # Tabel pyarrow (nbytes) dan frame polars (estimated_size)
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    estimated_size = getattr(value, 'estimated_size', None)
+    if callable(estimated_size):
+        try:
+            return int(estimated_size())
+        except Exception:
+            pass
+    attributes = getattr(value, '__dict__', None)
+    if isinstance(attributes, dict):
+        return sys.getsizeof(value) + sizeof(attributes, seen, depth + 1)
+    return sys.getsizeof(value)
+
+
+def _runtime():
+    from streamlit.runtime import Runtime
+
+    return Runtime.instance() if Runtime.exists() else None
+
+
+def cache_table():
+    # Satu baris per cache fungsi: jenis, nama fungsi, sesi pemilik (None = global), jumlah entri, byte.
+    # cache_data menyimpan hasil ter-pickle, jadi ukurannya panjang byte pickle; cache_resource menyimpan
+    # objek asli yang diukur dengan sizeof. Registry cache adalah internal Streamlit: jika strukturnya berubah
+    # di versi lain, tabel dikembalikan kosong alih-alih menggagalkan rerun
+    columns = ['kind', 'function', 'session', 'entries', 'bytes']
+    rows, seen = [], set()
+    try:
+        from streamlit.runtime.caching.cache_data_api import _data_caches
+        from streamlit.runtime.caching.cache_resource_api import _resource_caches
+
+        for kind, registry in (("cache_data", _data_caches), ("cache_resource", _resource_caches)):
+            with registry._caches_lock:
+                caches = [(session, cache) for session, by_key in registry._function_caches.items()
+                          for cache in by_key.values()]
+            for session, cache in caches:
+                if kind == "cache_data":
+                    stats = [stat for family in cache.get_stats().values() for stat in family]
+                    entries, size = len(stats), sum(stat.byte_length for stat in stats)
+                else:
+                    with cache._mem_cache_lock:
+                        values = [result.value for result in cache._mem_cache.values()]
+                    entries, size = len(values), sum(sizeof(value, seen) for value in values)
+                rows.append({'kind': kind, 'function': cache.display_name, 'session': session,
+                             'entries': entries, 'bytes': size})
+    except Exception:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame(rows, columns=columns)
+
+
+def session_table(caches=None):
+    # Satu baris per sesi aktif: ukuran session_state, file media (gambar st.pyplot dll.) yang dirujuk sesi,
+    # dan cache ber-scope sesi. Session manager dan media file manager juga internal Streamlit, jadi
+    # perubahan strukturnya menghasilkan tabel kosong
+    columns = ['session', 'session_state', 'media_files', 'session_caches']
+    caches = cache_table() if caches is None else caches
+    per_session_caches = caches.dropna(subset=['session']).groupby('session')['bytes'].sum()
+    rows = []
+    try:
+        runtime = _runtime()
+        # Runtime tiruan (AppTest) tidak punya session manager
+        sessions = getattr(runtime, '_session_mgr', None)
+        if sessions is None:
+            return pd.DataFrame(columns=columns)
+        media = runtime.media_file_mgr
+        files = getattr(media._storage, '_files_by_id', {}).copy()
+        for info in sessions.list_active_sessions():
+            session = info.session
+            file_ids = set(media._files_by_session_and_coord.get(session.id, {}).values())
+            rows.append({
+                'session': session.id,
+                'session_state': sizeof(session.session_state.filtered_state),
+                'media_files': sum(len(files[file_id].content) for file_id in file_ids if file_id in files),
+                'session_caches': int(per_session_caches.get(session.id, 0)),
+            })
+    except Exception:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame(rows, columns=columns)
+
+
+def figure_table():
+    # Figure matplotlib yang masih terdaftar di pyplot saat ini. Script runner Streamlit menutup semua figure
+    # setelah rerun selesai, jadi angka ini memantau figure yang hidup selama rerun (dan thread lain yang
+    # memakai pyplot di luar rerun). Ukuran = buffer RGBA kanvas
+    columns = ['figure', 'width_px', 'height_px', 'bytes']
+    if 'matplotlib.pyplot' not in sys.modules:
+        return pd.DataFrame(columns=columns)
+    plt = sys.modules['matplotlib.pyplot']
+    rows = []
+    for number in plt.get_fignums():
+        bbox = plt.figure(number).bbox
+        rows.append({'figure': number, 'width_px': int(bbox.width), 'height_px': int(bbox.height),
+                     'bytes': int(bbox.width) * int(bbox.height) * 4})
+    return pd.DataFrame(rows, columns=columns)
+
+
+def snapshot(script=None):
+    # Total memori per kategori saat ini, satu catatan riwayat
+    caches = cache_table()
+    sessions = session_table(caches)
+    figures = figure_table()
+    by_kind = caches.groupby('kind')['bytes'].sum()
+    return {
+        'time': time.time(),
+        'pid': os.getpid(),
+        'rerun': _reruns,
+        'script': os.path.basename(script) if script else None,
+        'rss': rss_bytes(),
+        'frames': total_bytes(),
+        'cache_data': int(by_kind.get('cache_data', 0)),
+        'cache_resource': int(by_kind.get('cache_resource', 0)),
+        'session_state': int(sessions['session_state'].sum()),
+        'media_files': int(sessions['media_files'].sum()),
+        'sessions': len(sessions),
+        'figures': len(figures),
+        'figure_bytes': int(figures['bytes'].sum()),
+    }
+
+
+def record_rerun(script=None):
+    # Dipanggil di akhir script; setiap EVERY rerun (dan rerun pertama) mencatat snapshot ke riwayat
+    global _reruns
+    if not ENABLED:
+        return None
+    with _lock:
+        _reruns += 1
+        if (_reruns - 1) % EVERY:
+            return None
+    record = snapshot(script)
+    with _lock:
+        HISTORY.append(record)
+        if LOG_PATH:
+            with open(LOG_PATH, "a") as out:
+                out.write(json.dumps(record) + "\n")
+    return record
+
+
+def detect_leaks(history, window=LEAK_WINDOW, thresholds=None):
+    # Per deret: kemiringan regresi linear (per rerun) atas jendela catatan terakhir dan pertumbuhan sepanjang
+    # jendela menurut garis itu. RSS berfluktuasi antar rerun, jadi konsistensi tren dinilai dari median
+    # LEAK_BLOCKS blok berurutan: bocor = tumbuh melewati batas dan median blok naik terus
+    thresholds = LEAK_METRICS if thresholds is None else thresholds
+    columns = ['metric', 'first', 'last', 'per_rerun', 'growth', 'rising_share', 'leak']
+    frame = pd.DataFrame(list(history))
+    if len(frame) < 2 * LEAK_BLOCKS:
+        return pd.DataFrame(columns=columns)
+    frame = frame.tail(window)
+    reruns = frame['rerun'].to_numpy(dtype=np.float64)
+    rows = []
+    for metric, threshold in thresholds.items():
+        values = frame[metric].to_numpy(dtype=np.float64)
+        slope = np.polyfit(reruns, values, 1)[0] if np.ptp(reruns) else 0.0
+        growth = slope * np.ptp(reruns)
+        medians = [np.median(block) for block in np.array_split(values, LEAK_BLOCKS)]
+        rising_share = float((np.diff(medians) > 0).mean())
+        rows.append({
+            'metric': metric, 'first': values[0], 'last': values[-1], 'per_rerun': slope, 'growth': growth,
+            'rising_share': rising_share,
+            'leak': bool(growth >= threshold and rising_share >= LEAK_RISING_SHARE),
+        })
+    return pd.DataFrame(rows, columns=columns)
+
+
+def admin_enabled():
+    return ADMIN
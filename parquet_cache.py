@@ -0,0 +1,73 @@
+import hashlib
+import os
+import tempfile
+
+import pandas as pd
+
+import fetch
+
+# Folder untuk salinan Parquet lokal dari dataset (dibuat sekali per versi data)
+CACHE_DIR = os.environ.get("DATA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dashboard_cache"))
+
+
+def local_copy(location, version):
+    # File lokal dipakai langsung; artefak remote diunduh sekali per versi ke CACHE_DIR
+    if not fetch.is_remote(location):
+        return location
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    key = hashlib.sha1(repr((location, version)).encode()).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, f"{key}.{os.path.basename(location)}")
+    if not os.path.exists(path):
+        fetch.download(location, path + ".tmp")
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def materialize_parquet(location, version, write_parquet, tag):
+    # Ubah CSV sumber menjadi Parquet lokal agar query mendapat predicate & projection pushdown;
+    # write_parquet(csv_path, parquet_path) dan tag (nama file) disediakan oleh masing-masing backend
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    key = hashlib.sha1(repr((location, version)).encode()).hexdigest()[:16]
+    parquet_path = os.path.join(CACHE_DIR, f"{os.path.basename(location)}.{tag}.{key}.parquet")
+    if os.path.exists(parquet_path):
+        return parquet_path
+
+    csv_path = location
+    if fetch.is_remote(location):
+        csv_path = parquet_path + ".csv"
+        fetch.download(location, csv_path)
+
+    tmp_path = parquet_path + ".tmp"
+    write_parquet(csv_path, tmp_path)
+    os.replace(tmp_path, parquet_path)
+    if csv_path != location:
+        os.remove(csv_path)
+    return parquet_path
+
+
+def cached_frame(name, version, build):
+    # Frame hasil hitungan mahal (misalnya snapshot RFM per tanggal acuan) disimpan sebagai Parquet
+    # per versi data, sehingga proses baru atau pergantian snapshot cukup membaca file yang sudah ada
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    key = hashlib.sha1(repr(version).encode()).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, f"{name}.{key}.parquet")
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+
+    df = build()
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+    return df
+
+
+def derived_parquet(source, tag, write_parquet):
+    # Parquet turunan dari Parquet lokal lain (misalnya salinan level pesanan), ditulis sekali di sebelahnya;
+    # nama file sumber sudah memuat versi data
+    path = f"{source[:-len('.parquet')]}.{tag}.parquet"
+    if os.path.exists(path):
+        return path
+    tmp_path = path + ".tmp"
+    write_parquet(source, tmp_path)
+    os.replace(tmp_path, path)
+    return path
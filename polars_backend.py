@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+
+from delivery_times import GAMMA, MAX_DAYS, MIN_DAYS
+from memory import BUDGET_MB
+import parquet_cache
+from rfm import snapshot_reference
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+
+def _polars():
+    if pl is None:
+        raise ImportError("QUERY_BACKEND=polars membutuhkan paket polars (pip install polars)")
+    return pl
+
+
+# Dengan batas memori (MEMORY_BUDGET_MB), query dijalankan engine streaming Polars per batch
+ENGINE = "streaming" if BUDGET_MB else "auto"
+
+
+def materialize_parquet(location, version):
+    def write_parquet(csv_path, parquet_path):
+        _polars().scan_csv(csv_path, try_parse_dates=True).sink_parquet(parquet_path)
+    return parquet_cache.materialize_parquet(location, version, write_parquet, "polars")
+
+
+def order_parquet(items):
+    # Salinan level pesanan dari Parquet level item: baris pertama per order_id (seperti segmen tahunan
+    # backend pandas), sehingga jumlah pesanan, pembayaran dan rata-rata review tidak terhitung per item
+    # Kategori pesanan multi-kategori = kategori item pertamanya, sama seperti segmen (lihat write_year_segments)
+    def write_parquet(source, parquet_path):
+        pl = _polars()
+        pl.scan_parquet(source).filter(pl.col('order_purchase_timestamp').is_not_null()).unique(
+            subset='order_id', keep='first', maintain_order=True
+        ).sink_parquet(parquet_path)
+    return parquet_cache.derived_parquet(items, "orders", write_parquet)
+
+
+def date_bounds(source):
+    pl = _polars()
+    bounds = pl.scan_parquet(source).select(
+        pl.col('order_purchase_timestamp').min().alias('min'),
+        pl.col('order_purchase_timestamp').max().alias('max'),
+    ).collect(engine=ENGINE)
+    return pd.Timestamp(bounds['min'][0]), pd.Timestamp(bounds['max'][0])
+
+
+def categories(source):
+    pl = _polars()
+    return pl.scan_parquet(source).select(
+        pl.col('product_category_name_english').drop_nulls().unique().sort()
+    ).collect(engine=ENGINE).to_series().to_numpy().astype(object)
+
+
+def latest_delivery(source):
+    pl = _polars()
+    latest = pl.scan_parquet(source).select(pl.col('order_delivered_customer_date').max()).collect(engine=ENGINE)
+    return pd.Timestamp(latest.item())
+
+
+def _plans(source, start_date, end_date, selected_categories):
+    pl = _polars()
+    data = pl.scan_parquet(source)
+
+    # Satu subplan filter dipakai bersama oleh semua grafik yang mengikuti filter sidebar
+    filtered = data.filter(
+        pl.col('order_purchase_timestamp').dt.date().is_between(start_date, end_date)
+        & pl.col('product_category_name_english').is_in(list(selected_categories))
+    )
+    with_status = filtered.filter(pl.col('delivered_late').is_not_null())
+
+    late = with_status.group_by('delivered_late').agg(
+        pl.col('order_id').count().alias('order_id')
+    ).sort('delivered_late')
+
+    daily = with_status.group_by(
+        pl.col('order_purchase_timestamp').dt.date().alias('order_day'), 'delivered_late'
+    ).agg(pl.col('order_id').count().alias('order_id')).sort('order_day', 'delivered_late')
+
+    top_cities = with_status.filter(pl.col('customer_city').is_not_null()).group_by('customer_city').agg(
+        pl.col('order_id').filter(~pl.col('delivered_late')).count().alias('on_time'),
+        pl.col('order_id').filter(pl.col('delivered_late')).count().alias('late'),
+    ).with_columns(
+        (pl.col('on_time') + pl.col('late')).alias('total')
+    ).sort(['total', 'customer_city'], descending=[True, False]).head(10)
+
+    late_and_reviews = filtered.filter(pl.col('customer_city').is_not_null()).group_by('customer_city').agg(
+        pl.col('order_id').filter(pl.col('delivered_late')).count().alias('late_orders'),
+        pl.col('calculated_review_score').mean().alias('avg_review_score'),
+        pl.col('calculated_review_score').count().alias('review_count'),
+    ).filter((pl.col('late_orders') > 0) & (pl.col('review_count') > 0)).sort('customer_city')
+
+    states = data.filter(pl.col('customer_state').is_not_null()).group_by('customer_state').agg(
+        pl.col('customer_id').drop_nulls().n_unique().alias('customer_count'),
+        pl.col('geolocation_lat_cons').mean(),
+        pl.col('geolocation_lng_cons').mean(),
+    ).sort('customer_state')
+
+    return {
+        'df_late': late, 'df_daily_status': daily, 'df_top10_city_status': top_cities,
+        'df_late_and_reviews': late_and_reviews, 'df_state_grouped': states,
+        'df_delivery_state': _delivery_histogram(filtered, 'customer_state'),
+        'df_delivery_category': _delivery_histogram(filtered, 'product_category_name_english'),
+    }
+
+
+def _sketch_key(days):
+    # Kunci bucket sketsa waktu pengiriman, sama dengan delivery_times.sketch_keys
+    magnitude = days.abs().clip(upper_bound=MAX_DAYS)
+    return pl.when(magnitude < MIN_DAYS).then(0).otherwise(
+        days.sign() * ((magnitude / MIN_DAYS).log() / np.log(GAMMA)).ceil() + days.sign()
+    ).cast(pl.Int32)
+
+
+def _delivery_histogram(filtered, by):
+    # Histogram sketsa (kelompok, metrik, bucket) untuk persentil durasi pengiriman (metrik 0)
+    # dan selisih terhadap estimasi (metrik 1)
+    delivered = filtered.filter(pl.col(by).is_not_null() & pl.col('order_id').is_not_null())
+    days = [
+        delivered.select(
+            pl.col(by).alias('group'), pl.lit(metric, dtype=pl.Int8).alias('metric'),
+            ((pl.col('order_delivered_customer_date') - pl.col(start)).dt.total_microseconds() / 86_400e6).alias('days'),
+        )
+        for metric, start in enumerate(['order_purchase_timestamp', 'order_estimated_delivery_date'])
+    ]
+    return pl.concat(days).filter(pl.col('days').is_not_null()).group_by(
+        'group', 'metric', _sketch_key(pl.col('days')).alias('key')
+    ).agg(pl.len().alias('orders')).sort('group', 'metric', 'key')
+
+
+def product_features(source):
+    pl = _polars()
+    return pl.scan_parquet(source).select(
+        'product_category_name_english', 'product_weight_g', 'product_length_cm',
+        'product_height_cm', 'product_width_cm', 'shipping_late', 'delivered_late'
+    ).drop_nulls().select(
+        'product_weight_g',
+        (pl.col('product_length_cm') * pl.col('product_height_cm') * pl.col('product_width_cm')).alias('product_volume_cm3'),
+        'product_length_cm', 'product_height_cm', 'product_width_cm', 'shipping_late', 'delivered_late',
+    ).collect(engine=ENGINE).to_pandas()
+
+
+def rfm_metrics(source, as_of):
+    pl = _polars()
+    reference = snapshot_reference(as_of).to_pydatetime()
+    delivered = pl.col('order_delivered_customer_date')
+    rfm = pl.scan_parquet(source).filter(
+        pl.col('customer_id').is_not_null() & (pl.col('order_purchase_timestamp') < reference)
+    ).group_by('customer_id').agg(
+        ((pl.lit(reference) - delivered.filter(delivered < reference).max()).dt.total_seconds() / 86400)
+        .floor().alias('Recency'),
+        pl.col('order_id').count().alias('Frequency'),
+        pl.col('payment_value_sum').sum().alias('Monetary'),
+    ).sort('customer_id').collect(engine=ENGINE)
+
+    rfm = rfm.to_pandas().set_index('customer_id')
+    rfm['Recency'] = rfm['Recency'].astype(np.float64)
+    return rfm
+
+
+def dashboard_frames(source, start_date, end_date, selected_categories):
+    # Seluruh pekerjaan data dashboard sebagai query plan lazy, dioptimasi dan dieksekusi sekaligus
+    # (subplan yang sama hanya dihitung sekali, eksekusi multi-core)
+    plans = _plans(source, start_date, end_date, selected_categories)
+    results = dict(zip(plans, _polars().collect_all(list(plans.values()), engine=ENGINE)))
+    results = {name: frame.to_pandas() for name, frame in results.items()}
+
+    results['df_late'] = results['df_late'][results['df_late']['order_id'] > 0].reset_index(drop=True)
+    results['df_top10_city_status'] = results['df_top10_city_status'].set_index('customer_city').rename(
+        columns={'on_time': False, 'late': True}
+    ).reindex(columns=[False, True])
+    results['df_late_and_reviews'] = results['df_late_and_reviews'].set_index('customer_city')[
+        ['late_orders', 'avg_review_score']
+    ]
+    return results
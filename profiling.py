@@ -0,0 +1,132 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import streamlit as st
+
+# Profil per rerun (opt-in): PROFILE_RERUNS=1 untuk semua rerun, atau ?profile=1 di URL untuk satu sesi.
+# Hasilnya file speedscope (https://www.speedscope.app) per rerun, ditandai dengan state filter.
+ENABLED = os.environ.get("PROFILE_RERUNS", "0") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "dashboard_profiles"))
+# Jeda minimum antar profil (detik) per proses, agar profiling tidak membebani server
+MIN_INTERVAL = float(os.environ.get("PROFILE_MIN_INTERVAL", "30"))
+SAMPLE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000
+# Batas cadangan: profil yang tidak pernah diselesaikan dihentikan setelah batas ini
+MAX_DURATION = 300
+
+_lock = threading.Lock()
+_last_started = float("-inf")
+_active = None
+
+
+class RerunProfiler(threading.Thread):
+    # Sampling profiler: thread terpisah mengambil stack thread script setiap SAMPLE_INTERVAL
+    def __init__(self, script):
+        super().__init__(daemon=True)
+        self.script = script
+        self.target = threading.get_ident()
+        self.stacks = {}
+        self.stopped = threading.Event()
+        self.started_at = time.time()
+        self.elapsed = 0.0
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        # Buang frame runner Streamlit di atas script app
+        for index, (_, filename, _) in enumerate(stack):
+            if filename == self.script:
+                return tuple(stack[index:])
+        return tuple(stack)
+
+    def run(self):
+        # Bobot sampel = waktu nyata sejak sampel sebelumnya (jeda bisa lebih panjang karena GIL)
+        started = last = time.perf_counter()
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.target)
+            now = time.perf_counter()
+            stack = self._stack(frame) if frame is not None else ()
+            if not stack or stack[0][1] != self.script:
+                # Frame script sudah tidak ada di thread runner: rerun berakhir tanpa finish_rerun
+                # (exception, st.stop, atau dihentikan rerun baru), jadi slot profil langsung dilepas
+                self.stopped.set()
+                _release(self)
+                break
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + (now - last) * 1000
+            last = now
+        self.elapsed = time.perf_counter() - started
+
+    def to_speedscope(self, name):
+        frames, frame_index, samples, weights = [], {}, [], []
+        for stack, milliseconds in self.stacks.items():
+            indices = []
+            for function, filename, line in stack:
+                key = (function, filename, line)
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append({"name": function, "file": filename, "line": line})
+                indices.append(frame_index[key])
+            samples.append(indices)
+            weights.append(round(milliseconds, 3))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "dashboard profiling.py",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled", "name": name, "unit": "milliseconds",
+                "startValue": 0, "endValue": sum(weights),
+                "samples": samples, "weights": weights,
+            }],
+        }
+
+
+def _release(profiler):
+    global _active
+    with _lock:
+        if _active is profiler:
+            _active = None
+
+
+def start_rerun(script):
+    # Dipanggil di awal script; mengembalikan profiler aktif atau None jika tidak diprofil
+    global _last_started, _active
+    if not (ENABLED or st.query_params.get("profile") == "1"):
+        return None
+    with _lock:
+        now = time.monotonic()
+        if _active is not None and now - _last_started > MAX_DURATION:
+            _active.stopped.set()
+            _active = None
+        if _active is not None or now - _last_started < MIN_INTERVAL:
+            return None
+        _last_started = now
+        _active = RerunProfiler(os.path.abspath(script))
+        profiler = _active
+    profiler.start()
+    return profiler
+
+
+def finish_rerun(profiler, **tags):
+    # Dipanggil di akhir script; menulis profil speedscope yang diberi tag state filter
+    if profiler is None:
+        return None
+    profiler.stopped.set()
+    profiler.join()
+    _release(profiler)
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    app = os.path.splitext(os.path.basename(profiler.script))[0]
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(profiler.started_at)) + f"{profiler.started_at % 1:.3f}"[1:]
+    name = f"{app} {stamp} " + json.dumps(tags, default=str, sort_keys=True)
+    path = os.path.join(PROFILE_DIR, f"{app}-{stamp}-{os.getpid()}.speedscope.json")
+    with open(path, "w") as out:
+        json.dump(profiler.to_speedscope(name), out)
+    return path
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+
+# Aturan segmen dievaluasi berurutan; aturan pertama yang cocok menentukan segmen
+SEGMENT_RULES = [
+    ('Best Customers', "skor = 555", lambda score: score == '555'),
+    ('Lost', "skor = 111", lambda score: score == '111'),
+    ('New Customers', "R = 1", lambda score: score[0] == '1'),
+    ('Loyal Customers', "F = 5", lambda score: score[1] == '5'),
+    ('About to Sleep', "F = 1", lambda score: score[1] == '1'),
+    ('Big Spenders', "M = 5", lambda score: score[2] == '5'),
+    ('Low Value', "M = 1", lambda score: score[2] == '1'),
+    ('Champions', "R di 4-5 dan F di 4-5", lambda score: score[0] in '45' and score[1] in '45'),
+    ('Potential Loyalists', "R di 3-4 dan F di 3-4", lambda score: score[0] in '34' and score[1] in '34'),
+    ('At Risk', "R di 2-3 dan F di 1-2", lambda score: score[0] in '23' and score[1] in '12'),
+]
+
+
+def explain_rfm_segment(score):
+    for segment, rule, matches in SEGMENT_RULES:
+        if matches(score):
+            return segment, rule
+    return 'Other', "tidak ada aturan yang cocok"
+
+
+def assign_rfm_segment(score):
+    return explain_rfm_segment(score)[0]
+
+
+def latest_delivery(df):
+    # Tanggal acuan default: tanggal pengiriman terakhir di dataset
+    return pd.Timestamp(df['order_delivered_customer_date'].max())
+
+
+def snapshot_reference(as_of):
+    # Snapshot per tanggal acuan mencakup seluruh hari as_of
+    return pd.Timestamp(as_of).normalize() + pd.Timedelta(days=1)
+
+
+def rfm_partials(df, reference):
+    # Agregat parsial per pelanggan yang bisa digabung antar batch: pengiriman terakhir, jumlah pesanan,
+    # dan total pembayaran, hanya untuk pesanan dan pengiriman sebelum tanggal acuan
+    df = df[df['order_purchase_timestamp'] < reference]
+    delivered = df['order_delivered_customer_date'].where(df['order_delivered_customer_date'] < reference)
+    return pd.DataFrame({
+        'last_delivery': delivered.groupby(df['customer_id']).max(),
+        'orders': df.groupby('customer_id')['order_id'].count(),
+        'payment': df.groupby('customer_id')['payment_value_sum'].sum(),
+    })
+
+
+def combine_rfm_partials(parts):
+    return pd.concat(parts).groupby(level=0).agg({'last_delivery': 'max', 'orders': 'sum', 'payment': 'sum'})
+
+
+def rfm_from_partials(partials, reference):
+    return pd.DataFrame({
+        # 1. Recency: Menghitung selisih antara tanggal pengiriman terakhir dengan tanggal acuan (dalam hari)
+        'Recency': (reference - partials['last_delivery']).dt.days,
+        # 2. Frequency: Menghitung jumlah pesanan per pelanggan
+        'Frequency': partials['orders'],
+        # 3. Monetary: Menghitung total pembayaran per pelanggan
+        'Monetary': partials['payment'],
+    }).rename_axis('customer_id')
+
+
+def rfm_metrics(df, as_of):
+    # Hanya pesanan dan pengiriman yang sudah terjadi pada tanggal acuan yang dihitung
+    reference = snapshot_reference(as_of)
+    return rfm_from_partials(rfm_partials(df, reference), reference)
+
+
+def quantile_scores(values):
+    # Skor 1..5 per kuantil beserta batas kuantilnya. Jika batas kuantil nilai tidak unik (banyak nilai sama,
+    # misalnya snapshot di awal data), kuantil dihitung atas peringkat sehingga kelompoknya tetap berukuran
+    # sama; batasnya lalu nilai terkecil dan nilai terbesar tiap kelompok
+    try:
+        ranks, bins = pd.qcut(values, 5, labels=False, retbins=True)
+        return ranks + 1, bins
+    except ValueError:
+        pass
+    ranks = pd.qcut(values.rank(method='first'), min(5, len(values)), labels=False)
+    return ranks + 1, np.r_[values.min(), values.groupby(ranks).max().to_numpy()]
+
+
+def score_rfm(rfm):
+    # Pelanggan tanpa pengiriman sebelum tanggal acuan dianggap paling lama (Recency terbesar), bukan paling baru;
+    # nilai kosong lainnya diisi 0 sebelum penghitungan skor
+    rfm = rfm.assign(Recency=rfm['Recency'].fillna(rfm['Recency'].max())).fillna(0)
+
+    # Batas kuantil tiap skor disimpan agar skor per pelanggan bisa dijelaskan
+    rank_bins = {}
+    if rfm.empty:
+        for rank in ['R_rank', 'F_rank', 'M_rank']:
+            rfm[rank] = pd.Series(dtype=int)
+
+    # Cek apakah kolom 'Frequency' memiliki cukup variasi
+    elif len(rfm['Frequency'].unique()) > 1:
+        # Skor berdasarkan kuantil untuk Frequency jika ada variasi
+        rfm['F_rank'], rank_bins['Frequency'] = quantile_scores(rfm['Frequency'])
+    else:
+        # Jika tidak ada variasi, beri skor tetap (misalnya 3)
+        rfm['F_rank'] = 3
+
+    if not rfm.empty:
+        rfm['R_rank'], rank_bins['Recency'] = quantile_scores(rfm['Recency'])
+        rfm['M_rank'], rank_bins['Monetary'] = quantile_scores(rfm['Monetary'])
+
+    # Pastikan nilai pada kolom R_rank, F_rank, dan M_rank berupa integer
+    rfm['R_rank'] = rfm['R_rank'].astype(int)
+    rfm['F_rank'] = rfm['F_rank'].astype(int)
+    rfm['M_rank'] = rfm['M_rank'].astype(int)
+
+    # Gabungkan skor RFM menjadi satu kolom
+    rfm['RFM_Score'] = rfm['R_rank'].astype(str) + rfm['F_rank'].astype(str) + rfm['M_rank'].astype(str)
+
+    # Terapkan fungsi ke kolom RFM_Score
+    rfm['Segment'] = rfm['RFM_Score'].astype(str).apply(assign_rfm_segment)
+    # Disimpan sebagai tuple float biasa: attrs dibandingkan dengan == oleh pandas saat operasi antar frame
+    # dan ditulis sebagai JSON ke metadata Parquet (parquet_cache.cached_frame), yang menolak skalar NumPy
+    rfm.attrs['rank_bins'] = {metric: tuple(float(edge) for edge in bins) for metric, bins in rank_bins.items()}
+    return rfm
+
+
+class RfmLookup:
+    # Indeks hash customer_id -> posisi baris, untuk pencarian per pelanggan tanpa memindai tabel
+    columns = ['Recency', 'Frequency', 'Monetary', 'R_rank', 'F_rank', 'M_rank', 'RFM_Score', 'Segment']
+
+    def __init__(self, rfm):
+        self.index = pd.Index(rfm.index.astype(str), name='customer_id')
+        if len(self.index):
+            self.index.get_loc(self.index[0])  # bangun hashtable sekarang, bukan saat pencarian pertama
+        self.values = {column: rfm[column].to_numpy() for column in self.columns}
+        self.rank_bins = rfm.attrs.get('rank_bins', {})
+
+    def __len__(self):
+        return len(self.index)
+
+    def lookup(self, customer_id):
+        try:
+            position = self.index.get_loc(customer_id)
+        except KeyError:
+            return None
+        return {column: values[position] for column, values in self.values.items()}
+
+    def explain(self, customer_id):
+        record = self.lookup(customer_id)
+        if record is None:
+            return None
+
+        # Rentang kuantil yang menghasilkan setiap skor
+        for metric, rank in [('Recency', 'R_rank'), ('Frequency', 'F_rank'), ('Monetary', 'M_rank')]:
+            bins = self.rank_bins.get(metric)
+            if bins is None:
+                record[f'{rank}_reason'] = f"{metric} tidak bervariasi, skor tetap {record[rank]}"
+            else:
+                low, high = bins[int(record[rank]) - 1], bins[int(record[rank])]
+                record[f'{rank}_reason'] = f"{metric} {record[metric]:g} berada di kuantil ({low:g}, {high:g}]"
+        record['Segment_reason'] = explain_rfm_segment(str(record['RFM_Score']))[1]
+        return record
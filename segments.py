@@ -0,0 +1,253 @@
+import hashlib
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from aggregates import (
+    city_day_partials, combine_city_partials, combine_state_partials, daily_status_counts,
+    state_counts_from_partials, state_partials, status_index_from_counts
+)
+import approximate
+from delivery_times import combine_delivery_partials, delivery_index, delivery_partials
+from cohorts import COHORT_COLUMNS
+from fact_tables import DATE_COLUMNS, ITEM_COLUMNS, ORDER_COLUMNS, item_facts
+from memory import BUDGET_MB
+import parquet_cache
+from rfm import combine_rfm_partials, rfm_from_partials, rfm_partials, snapshot_reference
+
+# Dataset multi-tahun disimpan sebagai satu file Parquet per tahun pembelian (ditulis sekali per versi data
+# dari CSV yang dibaca per chunk). Semua agregat dashboard dihitung dengan membaca segmen per batch, sehingga
+# memori puncak ditentukan ukuran batch dan ukuran agregat, bukan jumlah tahun di dataset. Tabel level item
+# (dimensi produk) ditulis di pass yang sama ke satu file Parquet di folder segmen.
+CSV_CHUNK_ROWS = int(os.environ.get("SEGMENT_CSV_CHUNK_ROWS", "200000"))
+# Batas atas baris per batch; jika MEMORY_BUDGET_MB diisi, satu batch dibatasi BATCH_BUDGET_SHARE dari batas itu
+BATCH_ROWS = int(os.environ.get("SEGMENT_BATCH_ROWS", "500000"))
+BATCH_BUDGET_SHARE = float(os.environ.get("SEGMENT_BATCH_BUDGET_SHARE", "0.25"))
+# Agregat parsial dari beberapa batch digabung setiap sekian batch agar daftar parsial tidak terus bertambah
+COMPACT_EVERY = 8
+
+CATEGORY = 'product_category_name_english'
+RFM_COLUMNS = ['order_id', 'customer_id', 'order_purchase_timestamp', 'order_delivered_customer_date', 'payment_value_sum']
+# Kolom pesanan yang ikut disimpan hanya jika ada di CSV (identitas pelanggan lintas pesanan untuk kohort)
+OPTIONAL_ORDER_COLUMNS = ['customer_unique_id']
+ITEMS_FILE = "items.parquet"
+
+
+def _schema(columns):
+    import pyarrow as pa
+
+    types = {
+        'order_purchase_timestamp': pa.timestamp('ns'),
+        'order_delivered_customer_date': pa.timestamp('ns'),
+        'order_estimated_delivery_date': pa.timestamp('ns'),
+        'geolocation_lat_cons': pa.float64(),
+        'geolocation_lng_cons': pa.float64(),
+        'calculated_review_score': pa.float64(),
+        'payment_value_sum': pa.float64(),
+        'delivered_late': pa.bool_(),
+        'shipping_late': pa.bool_(),
+        'product_weight_g': pa.float64(),
+        'product_length_cm': pa.float64(),
+        'product_height_cm': pa.float64(),
+        'product_width_cm': pa.float64(),
+    }
+    return pa.schema([(column, types.get(column, pa.string())) for column in columns])
+
+
+def write_year_segments(csv_path, directory):
+    # CSV level item dibaca per chunk; semua baris item ditulis ke tabel item, dan baris pertama setiap
+    # order_id (atribut pesanan berulang di setiap baris item) ditulis ke segmen tahun pembeliannya. Baris satu
+    # pesanan punya tanggal pembelian yang sama, jadi cukup mengingat hash order_id yang sudah ditulis per tahun.
+    # Kategori pesanan = kategori item pertamanya: pesanan multi-kategori hanya ikut filter kategori itu, dan
+    # tidak ikut jika hanya kategori item lainnya yang dipilih. Disengaja: prefix sum dan agregat parsial
+    # dikunci per kode kategori tunggal, sehingga setiap pesanan dihitung tepat sekali di setiap rentang filter.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    order_columns = ORDER_COLUMNS + [column for column in OPTIONAL_ORDER_COLUMNS if column in header]
+    schema, item_schema = _schema(order_columns), _schema(ITEM_COLUMNS)
+    usecols = list(dict.fromkeys(order_columns + ITEM_COLUMNS))
+    items = pq.ParquetWriter(os.path.join(directory, ITEMS_FILE), item_schema)
+    writers, seen = {}, {}
+    try:
+        for chunk in pd.read_csv(csv_path, usecols=usecols, parse_dates=DATE_COLUMNS, chunksize=CSV_CHUNK_ROWS):
+            items.write_table(pa.Table.from_pandas(item_facts(chunk), schema=item_schema, preserve_index=False))
+            chunk = chunk[order_columns]
+            for column in DATE_COLUMNS:
+                chunk[column] = pd.to_datetime(chunk[column], errors='coerce')
+            # Pesanan tanpa tanggal pembelian tidak bisa ditempatkan di segmen tahun mana pun
+            chunk = chunk[chunk['order_purchase_timestamp'].notna()]
+            hashes = pd.util.hash_array(chunk['order_id'].to_numpy(dtype=object))
+            first = ~pd.Series(hashes).duplicated().to_numpy()
+            years = chunk['order_purchase_timestamp'].dt.year.to_numpy()
+
+            for year in np.unique(years[first]):
+                rows = first & (years == year)
+                written = seen.get(year, np.zeros(0, dtype=np.uint64))
+                rows[rows] = ~np.isin(hashes[rows], written, assume_unique=True)
+                if not rows.any():
+                    continue
+                seen[year] = np.union1d(written, hashes[rows])
+                if year not in writers:
+                    writers[year] = pq.ParquetWriter(os.path.join(directory, f"year={year}.parquet"), schema)
+                writers[year].write_table(pa.Table.from_pandas(chunk[rows], schema=schema, preserve_index=False))
+    finally:
+        items.close()
+        for writer in writers.values():
+            writer.close()
+    return sorted(writers)
+
+
+def _segment_directory(location, version):
+    # Folder segmen, dibuat sekali per versi data (dan daftar kolom segmen) di parquet_cache.CACHE_DIR
+    columns = (ORDER_COLUMNS, OPTIONAL_ORDER_COLUMNS, ITEM_COLUMNS)
+    key = hashlib.sha1(repr((location, version, columns)).encode()).hexdigest()[:16]
+    directory = os.path.join(parquet_cache.CACHE_DIR, f"{os.path.basename(location)}.segments.{key}")
+    if not os.path.isdir(directory):
+        os.makedirs(parquet_cache.CACHE_DIR, exist_ok=True)
+        tmp_directory = directory + ".tmp"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        write_year_segments(parquet_cache.local_copy(location, version), tmp_directory)
+        os.replace(tmp_directory, directory)
+    return directory
+
+
+def year_segments(location, version):
+    # {tahun: path Parquet} segmen level pesanan
+    directory = _segment_directory(location, version)
+    return {
+        int(name[len("year="):-len(".parquet")]): os.path.join(directory, name)
+        for name in sorted(os.listdir(directory)) if name.startswith("year=")
+    }
+
+
+def item_segment(location, version):
+    # Path Parquet tabel level item
+    return os.path.join(_segment_directory(location, version), ITEMS_FILE)
+
+
+def _bytes_per_row(path, columns=None):
+    # Perkiraan byte per baris dari sampel kecil segmen setelah dikonversi ke pandas (None jika kosong)
+    import pyarrow.parquet as pq
+
+    probe = next(pq.ParquetFile(path).iter_batches(batch_size=10_000, columns=columns), None)
+    if probe is None or not probe.num_rows:
+        return None
+    return probe.to_pandas().memory_usage(deep=True).sum() / probe.num_rows
+
+
+def rows_per_batch(path, columns):
+    if not BUDGET_MB:
+        return BATCH_ROWS
+    bytes_per_row = _bytes_per_row(path, columns)
+    if bytes_per_row is None:
+        return BATCH_ROWS
+    return int(min(BATCH_ROWS, max(1_000, BUDGET_MB * 2**20 * BATCH_BUDGET_SHARE / bytes_per_row)))
+
+
+def estimated_bytes(path, columns=None):
+    # Perkiraan memori pandas satu file Parquet utuh (sebelum optimize_frame), dari sampel dan metadata jumlah baris
+    import pyarrow.parquet as pq
+
+    bytes_per_row = _bytes_per_row(path, columns)
+    return 0 if bytes_per_row is None else int(bytes_per_row * pq.ParquetFile(path).metadata.num_rows)
+
+
+def iter_batches(paths, columns, categories=None):
+    # Frame pandas per batch dari segmen-segmen; kategori produk memakai kamus global (urutan bitmask)
+    import pyarrow.parquet as pq
+
+    if not paths:
+        return
+    batch_rows = rows_per_batch(paths[0], columns)
+    dtype = pd.CategoricalDtype(categories=categories) if categories is not None else None
+    for path in paths:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=columns):
+            if not batch.num_rows:
+                continue
+            df = batch.to_pandas()
+            if dtype is not None and CATEGORY in df:
+                df[CATEGORY] = df[CATEGORY].astype(dtype)
+            yield df
+
+
+def _compact(parts, combine):
+    return [combine(parts)] if len(parts) >= COMPACT_EVERY else parts
+
+
+def scan(segments):
+    # Pass ringan (tiga kolom): kamus kategori global, rentang tanggal pembelian, pengiriman terakhir,
+    # dan jumlah pesanan per stratum (bulan x kategori) untuk sampel mode perkiraan
+    first, last, latest, strata = [], [], [], []
+    columns = ['order_purchase_timestamp', 'order_delivered_customer_date', CATEGORY]
+    for df in iter_batches(list(segments.values()), columns):
+        first.append(df['order_purchase_timestamp'].min())
+        last.append(df['order_purchase_timestamp'].max())
+        latest.append(df['order_delivered_customer_date'].max())
+        timestamp = df['order_purchase_timestamp']
+        strata.append(pd.DataFrame({
+            'month': timestamp.dt.year * 12 + timestamp.dt.month, 'category': df[CATEGORY]
+        }).value_counts(dropna=False))
+
+    population = pd.concat(strata).groupby(level=['month', 'category'], dropna=False).sum()
+    month = population.index.get_level_values('month').to_numpy().astype(np.int64)
+    category = population.index.get_level_values('category')
+    categories = pd.Index(sorted(category.dropna().unique()), dtype=object)
+    keys = approximate.stratum_keys(month, categories.get_indexer(category).astype(np.int64), len(categories))
+    order = np.argsort(keys)
+    return {
+        'years': list(segments),
+        'categories': categories,
+        'min_date': min(first),
+        'max_date': max(last),
+        'latest_delivery': pd.Timestamp(pd.Series(latest, dtype='datetime64[ns]').max()),
+        'strata': keys[order],
+        'strata_population': population.to_numpy()[order],
+    }
+
+
+def order_aggregates(segments, summary):
+    # Satu pass atas semua segmen: prefix sum status harian, agregat parsial per (kategori, hari, kota),
+    # agregat per state, sketsa waktu pengiriman per hari, dan sampel bertingkat untuk mode perkiraan
+    days = pd.date_range(summary['min_date'].normalize(), summary['max_date'].normalize(), freq='D')
+    counts = np.zeros((len(days), len(summary['categories']), 2), dtype=np.int64)
+    sampled = approximate.sample_sizes(summary['strata_population'])
+    cities, states, deliveries, sample = [], [], [], None
+    for df in iter_batches(list(segments.values()), ORDER_COLUMNS, summary['categories']):
+        counts += daily_status_counts(df, days)
+        cities = _compact(cities + [city_day_partials(df)], combine_city_partials)
+        states = _compact(states + [state_partials(df)], combine_state_partials)
+        deliveries = _compact(deliveries + [delivery_partials(df)], combine_delivery_partials)
+        sample = approximate.keep_sample(sample, df, summary['strata'], sampled)
+    return {
+        'status_index': status_index_from_counts(days, counts),
+        'city_partials': combine_city_partials(cities),
+        'state_grouped': state_counts_from_partials(combine_state_partials(states)),
+        'delivery_index': delivery_index(combine_delivery_partials(deliveries)),
+        'sample': approximate.finish_sample(sample, summary['strata_population'], sampled),
+    }
+
+
+def rfm_metrics(segments, as_of):
+    # Metrik RFM per tanggal acuan; segmen tahun setelah tanggal acuan tidak dibaca sama sekali
+    reference = snapshot_reference(as_of)
+    paths = [path for year, path in segments.items() if year <= reference.year]
+    parts = []
+    for df in iter_batches(paths, RFM_COLUMNS):
+        parts = _compact(parts + [rfm_partials(df, reference)], combine_rfm_partials)
+    return rfm_from_partials(combine_rfm_partials(parts), reference)
+
+
+def cohort_orders(segments):
+    # Kolom kohort dari segmen (sudah satu baris per order_id); customer_unique_id hanya jika ada di dataset
+    import pyarrow.parquet as pq
+
+    paths = list(segments.values())
+    names = pq.ParquetFile(paths[0]).schema_arrow.names if paths else COHORT_COLUMNS
+    columns = [column for column in COHORT_COLUMNS if column in names]
+    frames = list(iter_batches(paths, columns))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
@@ -0,0 +1,15 @@
+import sys
+
+from streamlit.web import cli as stcli
+
+import warmup
+
+# Jalankan server Streamlit dengan warm-up cache di background, contoh:
+#   python serve.py app_dinamyc.py --server.port 8501
+# Status kesiapan tersedia di http://127.0.0.1:8502/ready (200 jika cache sudah hangat atau semua percobaan
+# warm-up gagal tetapi server tetap melayani ("degraded"), 503 selama warm-up dan percobaan ulangnya berjalan)
+if __name__ == "__main__":
+    script = sys.argv[1] if len(sys.argv) > 1 else "app_dinamyc.py"
+    warmup.start(script)
+    sys.argv = ["streamlit", "run", script, *sys.argv[2:]]
+    sys.exit(stcli.main())
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from loadtest import EMPTY_WORLD, RssSampler, free_port, run_session, serve_data, start_streamlit
+from memtrack import LEAK_METRICS, detect_leaks
+
+# Soak test kebocoran memori: ribuan rerun terhadap server Streamlit lokal dengan data lokal, contoh:
+#   python soak.py app_dinamyc.py --data-dir data/ --reruns 5000 --sessions 2
+# Sesi dibuka dan ditutup berulang (setiap --interactions rerun) agar kebocoran per sesi ikut terlihat.
+# Server mencatat akuntansi memori (memtrack) ke file JSONL; setelah pemanasan, deret yang terus naik
+# dilaporkan sebagai kebocoran dan proses keluar dengan kode 1.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test kebocoran memori untuk app.py / app_dinamyc.py")
+    parser.add_argument("app", nargs="?", default="app_dinamyc.py")
+    parser.add_argument("--data-dir", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Folder berisi semua artefak CSV (termasuk data gabungan untuk app_dinamyc.py)")
+    parser.add_argument("--reruns", type=int, default=2000, help="Total rerun di semua sesi")
+    parser.add_argument("--sessions", type=int, default=2, help="Jumlah sesi bersamaan")
+    parser.add_argument("--interactions", type=int, default=50, help="Interaksi per sesi sebelum sesi ditutup")
+    parser.add_argument("--every", type=int, default=10, help="Akuntansi memori server setiap sekian rerun")
+    parser.add_argument("--warmup", type=float, default=0.1, help="Porsi awal rerun yang diabaikan (cache terisi)")
+    parser.add_argument("--leak-min-mb", type=float, default=None, help="Batas pertumbuhan yang dianggap bocor")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Simpan laporan ke file JSON")
+    args = parser.parse_args()
+
+    data_server, base_url = serve_data(args.data_dir)
+    world_file = tempfile.NamedTemporaryFile("w", suffix=".geojson", delete=False)
+    json.dump(EMPTY_WORLD, world_file)
+    world_file.close()
+    log_file = tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False)
+    log_file.close()
+
+    env = dict(os.environ, DATA_BASE_URL=base_url, WORLD_GEOJSON_URL=world_file.name,
+               MEMTRACK="1", MEMTRACK_EVERY=str(args.every), MEMTRACK_LOG=log_file.name)
+    port = free_port()
+    server = start_streamlit(args.app, port, env)
+    sampler = RssSampler(server.pid, interval=1.0)
+    sampler.start()
+
+    done = [0, 0]
+    lock = threading.Lock()
+
+    def worker(index):
+        # Setiap putaran membuka sesi baru; berhenti setelah total rerun tercapai
+        round_ = 0
+        while True:
+            with lock:
+                if done[0] >= args.reruns:
+                    return
+            latencies, errors = run_session(port, args.interactions, args.seed + index * 100_003 + round_, 0.0)
+            round_ += 1
+            with lock:
+                done[0] += len(latencies)
+                done[1] += errors
+                print(f"\r{done[0]}/{args.reruns} rerun", end="", file=sys.stderr, flush=True)
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            list(pool.map(worker, range(args.sessions)))
+        wall = time.perf_counter() - started
+        print(file=sys.stderr)
+    finally:
+        sampler.stopped.set()
+        sampler.join()
+        server.terminate()
+        server.wait()
+        data_server.shutdown()
+        os.unlink(world_file.name)
+
+    with open(log_file.name) as log:
+        records = [json.loads(line) for line in log if line.strip()]
+    os.unlink(log_file.name)
+    measured = [record for record in records if record['rerun'] > args.warmup * done[0]]
+
+    thresholds = dict(LEAK_METRICS)
+    if args.leak_min_mb is not None:
+        thresholds.update({metric: args.leak_min_mb * 2**20 for metric in thresholds if metric != 'figures'})
+    leaks = detect_leaks(measured, window=len(measured), thresholds=thresholds)
+
+    report = {
+        "app": args.app,
+        "reruns": done[0],
+        "script_errors": done[1],
+        "wall_seconds": round(wall, 1),
+        "records": len(records),
+        "records_after_warmup": len(measured),
+        "rss_start_mb": round(sampler.samples[0] / 2**20, 1),
+        "rss_peak_mb": round(max(sampler.samples) / 2**20, 1),
+        "rss_end_mb": round(sampler.samples[-1] / 2**20, 1),
+        "leaks": leaks.loc[leaks['leak'], 'metric'].tolist() if len(leaks) else [],
+    }
+    for key, value in report.items():
+        print(f"{key:>22}: {value}")
+    if len(leaks):
+        scaled = leaks.copy()
+        in_bytes = scaled['metric'] != 'figures'
+        for column in ['first', 'last', 'per_rerun', 'growth']:
+            scaled[column] = scaled[column].astype(float)
+            scaled.loc[in_bytes, column] = scaled.loc[in_bytes, column] / 2**20
+        print("\n(MB, kecuali figures)")
+        print(scaled.round(3).to_string(index=False))
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(dict(report, series=leaks.to_dict(orient="records")), out, indent=2, default=float)
+    sys.exit(1 if report["leaks"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from delivery_times import GAMMA, MAX_DAYS, MIN_DAYS
+from memory import BUDGET_MB
+import parquet_cache
+from rfm import snapshot_reference
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+THREADS = int(os.environ.get("DUCKDB_THREADS", os.cpu_count() or 1))
+# Baris per row group saat CSV diubah ke Parquet; row group ditahan di memori sampai ditulis,
+# jadi dengan batas memori (MEMORY_BUDGET_MB) dipakai row group yang lebih kecil
+ROW_GROUP_SIZE = int(os.environ.get("DUCKDB_ROW_GROUP_SIZE", "20000" if BUDGET_MB else "122880"))
+
+_connection = None
+_lock = threading.Lock()
+
+
+def _cursor():
+    # Satu koneksi DuckDB in-process per proses; tiap query memakai cursor sendiri (aman antar thread)
+    global _connection
+    if duckdb is None:
+        raise ImportError("QUERY_BACKEND=duckdb membutuhkan paket duckdb (pip install duckdb)")
+    with _lock:
+        if _connection is None:
+            config = {"threads": THREADS}
+            if BUDGET_MB:
+                # Query yang melebihi batas memori di-spill ke disk oleh DuckDB; urutan baris hasil COPY/scan
+                # tidak perlu dipertahankan (query yang butuh urutan memakai ORDER BY)
+                config["memory_limit"] = f"{int(BUDGET_MB)}MB"
+                config["temp_directory"] = os.path.join(parquet_cache.CACHE_DIR, "duckdb_spill")
+                config["preserve_insertion_order"] = False
+            _connection = duckdb.connect(config=config)
+    return _connection.cursor()
+
+
+def materialize_parquet(location, version):
+    def write_parquet(csv_path, parquet_path):
+        _cursor().execute(
+            f"COPY (SELECT * FROM read_csv_auto('{csv_path}')) TO '{parquet_path}' (FORMAT PARQUET, ROW_GROUP_SIZE {ROW_GROUP_SIZE})"
+        )
+    return parquet_cache.materialize_parquet(location, version, write_parquet, "duckdb")
+
+
+def order_parquet(items):
+    # Salinan level pesanan dari Parquet level item: baris pertama per order_id (seperti segmen tahunan
+    # backend pandas), sehingga jumlah pesanan, pembayaran dan rata-rata review tidak terhitung per item
+    # Kategori pesanan multi-kategori = kategori item pertamanya, sama seperti segmen (lihat write_year_segments)
+    def write_parquet(source, parquet_path):
+        _cursor().execute(f"""
+            COPY (
+                SELECT * EXCLUDE (file_row_number) FROM read_parquet('{source}', file_row_number = true)
+                WHERE order_purchase_timestamp IS NOT NULL
+                QUALIFY row_number() OVER (PARTITION BY order_id ORDER BY file_row_number) = 1
+            ) TO '{parquet_path}' (FORMAT PARQUET, ROW_GROUP_SIZE {ROW_GROUP_SIZE})
+        """)
+    return parquet_cache.derived_parquet(items, "orders", write_parquet)
+
+
+def _query(source, sql, params=()):
+    return _cursor().execute(sql.replace("{source}", f"read_parquet('{source}')"), list(params)).df()
+
+
+_FILTER = """
+    CAST(order_purchase_timestamp AS DATE) BETWEEN ? AND ?
+    AND list_contains(?::VARCHAR[], product_category_name_english)
+"""
+
+
+def date_bounds(source):
+    row = _cursor().execute(
+        f"SELECT min(order_purchase_timestamp), max(order_purchase_timestamp) FROM read_parquet('{source}')"
+    ).fetchone()
+    return pd.Timestamp(row[0]), pd.Timestamp(row[1])
+
+
+def categories(source):
+    return _query(source, """
+        SELECT DISTINCT product_category_name_english AS category FROM {source}
+        WHERE product_category_name_english IS NOT NULL ORDER BY category
+    """)['category'].to_numpy(dtype=object)
+
+
+def delivery_status_counts(source, start_date, end_date, selected_categories):
+    df_late = _query(source, f"""
+        SELECT delivered_late, count(order_id) AS order_id FROM {{source}}
+        WHERE {_FILTER} AND delivered_late IS NOT NULL
+        GROUP BY delivered_late ORDER BY delivered_late
+    """, [start_date, end_date, list(selected_categories)])
+    return df_late[df_late['order_id'] > 0].reset_index(drop=True)
+
+
+def daily_status_counts(source, start_date, end_date, selected_categories):
+    # Agregat harian saja; pengelompokan per bulan/minggu/kuartal memakai dimensi kalender di pandas
+    return _query(source, f"""
+        SELECT CAST(order_purchase_timestamp AS DATE) AS order_day, delivered_late,
+               count(order_id) AS order_id
+        FROM {{source}}
+        WHERE {_FILTER} AND delivered_late IS NOT NULL
+        GROUP BY ALL ORDER BY order_day, delivered_late
+    """, [start_date, end_date, list(selected_categories)])
+
+
+def top_city_status(source, start_date, end_date, selected_categories, n=10):
+    top = _query(source, f"""
+        SELECT customer_city,
+               count(order_id) FILTER (WHERE NOT delivered_late) AS on_time,
+               count(order_id) FILTER (WHERE delivered_late) AS late
+        FROM {{source}}
+        WHERE {_FILTER} AND customer_city IS NOT NULL AND delivered_late IS NOT NULL
+        GROUP BY customer_city
+        ORDER BY on_time + late DESC, customer_city
+        LIMIT {int(n)}
+    """, [start_date, end_date, list(selected_categories)])
+    return top.set_index('customer_city').rename(columns={'on_time': False, 'late': True})
+
+
+def late_and_reviews(source, start_date, end_date, selected_categories):
+    df_late_and_reviews = _query(source, f"""
+        SELECT customer_city,
+               count(order_id) FILTER (WHERE delivered_late) AS late_orders,
+               avg(calculated_review_score) AS avg_review_score
+        FROM {{source}}
+        WHERE {_FILTER} AND customer_city IS NOT NULL
+        GROUP BY customer_city
+        HAVING late_orders > 0 AND count(calculated_review_score) > 0
+        ORDER BY customer_city
+    """, [start_date, end_date, list(selected_categories)])
+    return df_late_and_reviews.set_index('customer_city')
+
+
+# Kunci bucket sketsa waktu pengiriman (sama dengan delivery_times.sketch_keys) untuk kolom days
+_SKETCH_KEY = f"""
+    CASE WHEN abs(days) < {MIN_DAYS!r} THEN 0
+         ELSE sign(days) * (ceil(ln(least(abs(days), {MAX_DAYS!r}) / {MIN_DAYS!r}) / ln({GAMMA!r})) + 1) END
+"""
+
+
+def delivery_histogram(source, start_date, end_date, selected_categories, by):
+    # Histogram sketsa (kelompok, metrik, bucket) untuk persentil durasi pengiriman (metrik 0)
+    # dan selisih terhadap estimasi (metrik 1); persentilnya dihitung di delivery_times
+    if by not in ('customer_state', 'product_category_name_english'):
+        raise ValueError(f"Pengelompokan tidak dikenal: {by}")
+    return _query(source, f"""
+        WITH filtered AS (
+            SELECT {by} AS "group", order_purchase_timestamp, order_delivered_customer_date,
+                   order_estimated_delivery_date
+            FROM {{source}}
+            WHERE {_FILTER} AND {by} IS NOT NULL AND order_id IS NOT NULL
+        ), days AS (
+            SELECT "group", 0 AS metric,
+                   (epoch_us(order_delivered_customer_date) - epoch_us(order_purchase_timestamp)) / 86400e6 AS days
+            FROM filtered
+            UNION ALL
+            SELECT "group", 1 AS metric,
+                   (epoch_us(order_delivered_customer_date) - epoch_us(order_estimated_delivery_date)) / 86400e6 AS days
+            FROM filtered
+        )
+        SELECT "group", metric, CAST({_SKETCH_KEY} AS INTEGER) AS key, count(*) AS orders
+        FROM days WHERE days IS NOT NULL
+        GROUP BY ALL ORDER BY "group", metric, key
+    """, [start_date, end_date, list(selected_categories)])
+
+
+def state_customer_counts(source):
+    return _query(source, """
+        SELECT customer_state, count(DISTINCT customer_id) AS customer_count,
+               avg(geolocation_lat_cons) AS geolocation_lat_cons,
+               avg(geolocation_lng_cons) AS geolocation_lng_cons
+        FROM {source}
+        WHERE customer_state IS NOT NULL
+        GROUP BY customer_state ORDER BY customer_state
+    """)
+
+
+def product_features(source):
+    return _query(source, """
+        SELECT product_weight_g,
+               product_length_cm * product_height_cm * product_width_cm AS product_volume_cm3,
+               product_length_cm, product_height_cm, product_width_cm, shipping_late, delivered_late
+        FROM {source}
+        WHERE product_category_name_english IS NOT NULL AND product_weight_g IS NOT NULL
+          AND product_length_cm IS NOT NULL AND product_height_cm IS NOT NULL
+          AND product_width_cm IS NOT NULL AND shipping_late IS NOT NULL AND delivered_late IS NOT NULL
+    """)
+
+
+def latest_delivery(source):
+    row = _cursor().execute(
+        f"SELECT max(order_delivered_customer_date) FROM read_parquet('{source}')"
+    ).fetchone()
+    return pd.Timestamp(row[0])
+
+
+def rfm_metrics(source, as_of):
+    rfm = _query(source, """
+        SELECT customer_id,
+               floor(epoch($1::TIMESTAMP - max(order_delivered_customer_date)
+                     FILTER (WHERE order_delivered_customer_date < $1::TIMESTAMP)) / 86400) AS Recency,
+               count(order_id) AS Frequency,
+               coalesce(sum(payment_value_sum), 0) AS Monetary
+        FROM {source}
+        WHERE customer_id IS NOT NULL AND order_purchase_timestamp < $1::TIMESTAMP
+        GROUP BY customer_id ORDER BY customer_id
+    """, [snapshot_reference(as_of).to_pydatetime()])
+    rfm['Recency'] = rfm['Recency'].astype(np.float64)
+    return rfm.set_index('customer_id')
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import (
+    city_day_partials, combine_city_partials, combine_state_partials, daily_status_counts,
+    delivery_status_counts, late_and_reviews_from_partials, period_status_counts, state_counts_from_partials,
+    state_partials, status_index_from_counts, top_city_status
+)
+from calendar_dim import period_labels
+
+CATEGORIES = ['books', 'garden', 'health', 'toys']
+
+
+@pytest.fixture(scope="module")
+def orders():
+    # Pesanan acak dengan jam pembelian, status/review/kategori kosong, dan kota dengan jumlah pesanan kembar
+    rng = np.random.default_rng(7)
+    n = 3000
+    df = pd.DataFrame({
+        'order_id': [f"o{i}" for i in range(n)],
+        'customer_id': [f"c{i}" for i in rng.integers(0, 900, n)],
+        'order_purchase_timestamp': pd.Timestamp("2017-01-01") + pd.to_timedelta(rng.integers(0, 500 * 24, n), unit="h"),
+        'customer_city': rng.choice([f"city{i:02d}" for i in range(25)], n),
+        'customer_state': rng.choice(["SP", "RJ", "MG", None], n),
+        'geolocation_lat_cons': rng.normal(-20, 3, n),
+        'geolocation_lng_cons': rng.normal(-45, 3, n),
+        'calculated_review_score': rng.choice([1.0, 2.0, 3.0, 4.0, 5.0, np.nan], n),
+        'delivered_late': pd.array(rng.choice([True, False, None], n, p=[0.3, 0.65, 0.05]), dtype=object),
+        'product_category_name_english': pd.Categorical(
+            rng.choice(CATEGORIES + [None], n, p=[0.3, 0.3, 0.2, 0.15, 0.05]), categories=CATEGORIES
+        ),
+    })
+    df.loc[rng.choice(n, 40, replace=False), 'geolocation_lat_cons'] = np.nan
+    return df
+
+
+def batches(df, n=3):
+    # Data dibaca per batch seperti segmen; agregat parsial tiap batch digabung
+    bounds = np.linspace(0, len(df), n + 1).astype(int)
+    return [df.iloc[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def filtered(df, start_date, end_date, category_mask):
+    # Filter sidebar lama: tanggal pembelian (inklusif) dan kategori terpilih
+    selected = [category for category, keep in zip(CATEGORIES, category_mask) if keep]
+    day = df['order_purchase_timestamp'].dt.date
+    return df[(day >= start_date) & (day <= end_date) & df['product_category_name_english'].isin(selected)]
+
+
+def status_index(df):
+    # Seperti segments.order_aggregates: jumlah harian per batch dijumlahkan lalu dijadikan prefix sum
+    order_day = df['order_purchase_timestamp'].dt.normalize()
+    days = pd.date_range(order_day.min(), order_day.max(), freq='D')
+    counts = sum(daily_status_counts(batch, days) for batch in batches(df))
+    return status_index_from_counts(days, counts)
+
+
+def city_partials(df):
+    return combine_city_partials([city_day_partials(batch) for batch in batches(df)])
+
+
+WINDOWS = [
+    ("2017-01-01", "2018-05-15"),  # seluruh data
+    ("2017-03-10", "2017-11-02"),  # potongan di tengah bulan/minggu/kuartal
+    ("2017-06-01", "2017-06-01"),  # satu hari
+    ("2016-01-01", "2016-12-31"),  # sebelum data: kosong
+    ("2018-03-01", "2017-03-01"),  # rentang terbalik: kosong
+]
+MASKS = [
+    [True, True, True, True],
+    [True, False, True, False],
+    [False, False, False, True],
+    [False, False, False, False],  # tanpa kategori: kosong
+]
+CASES = [(window, mask) for window in WINDOWS for mask in MASKS]
+
+
+def dates(window):
+    return tuple(pd.Timestamp(day).date() for day in window)
+
+
+def assert_same(result, expected):
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True), expected.reset_index(drop=True),
+        check_dtype=False, check_index_type=False, check_column_type=False
+    )
+
+
+@pytest.mark.parametrize("window,mask", CASES)
+def test_delivery_status_counts_match_groupby(orders, window, mask):
+    start_date, end_date = dates(window)
+    expected = filtered(orders, start_date, end_date, mask).groupby(['delivered_late']).agg(
+        {"order_id": "count"}
+    ).reset_index()
+    result = delivery_status_counts(status_index(orders), start_date, end_date, np.array(mask))
+    assert_same(result, expected.astype({'delivered_late': bool}))
+
+
+@pytest.mark.parametrize("granularity", ['month', 'week', 'quarter'])
+@pytest.mark.parametrize("window,mask", CASES)
+def test_period_status_counts_match_groupby(orders, window, mask, granularity):
+    start_date, end_date = dates(window)
+    df = filtered(orders, start_date, end_date, mask)
+    timestamp = df['order_purchase_timestamp']
+    iso = timestamp.dt.isocalendar()
+    period_key = {
+        'month': timestamp.dt.year * 100 + timestamp.dt.month,
+        'week': iso['year'].astype(np.int64) * 100 + iso['week'].astype(np.int64),
+        'quarter': timestamp.dt.year * 10 + timestamp.dt.quarter,
+    }[granularity]
+    expected = df.assign(period_key=period_key).groupby(
+        ['period_key', 'delivered_late']
+    )['order_id'].count().reset_index()
+    expected.insert(1, 'order_period', period_labels(expected['period_key'], granularity))
+
+    result = period_status_counts(status_index(orders), start_date, end_date, np.array(mask), granularity)
+    assert_same(result, expected.astype({'delivered_late': bool}))
+
+
+@pytest.mark.parametrize("window,mask", CASES)
+def test_top_city_status_matches_groupby(orders, window, mask):
+    start_date, end_date = dates(window)
+    df_city_status = filtered(orders, start_date, end_date, mask).groupby(
+        ['customer_city', 'delivered_late']
+    )['order_id'].count().unstack(fill_value=0)
+    df_city_status = df_city_status.reindex(columns=[False, True], fill_value=0)
+    expected = df_city_status.loc[df_city_status.sum(axis=1).nlargest(10).index]
+
+    result = top_city_status(city_partials(orders), start_date, end_date, np.array(mask))
+    # Urutan kota (termasuk kota dengan total kembar) harus sama persis
+    assert list(result.index) == list(expected.index)
+    assert result.to_numpy().tolist() == expected.to_numpy().tolist()
+
+
+@pytest.mark.parametrize("window,mask", CASES)
+def test_late_and_reviews_match_groupby(orders, window, mask):
+    start_date, end_date = dates(window)
+    df = filtered(orders, start_date, end_date, mask)
+    late_orders = df[df['delivered_late'] == True].groupby('customer_city')['order_id'].count()
+    avg_review = df.groupby('customer_city')['calculated_review_score'].mean()
+    expected = pd.DataFrame({'late_orders': late_orders, 'avg_review_score': avg_review}).dropna()
+
+    result = late_and_reviews_from_partials(city_partials(orders), start_date, end_date, np.array(mask))
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_array_equal(result['late_orders'].to_numpy(), expected['late_orders'].to_numpy())
+    np.testing.assert_allclose(result['avg_review_score'].to_numpy(), expected['avg_review_score'].to_numpy())
+
+
+def test_state_counts_match_groupby(orders):
+    expected = orders.groupby('customer_state').agg({
+        'customer_id': 'nunique', 'geolocation_lat_cons': 'mean', 'geolocation_lng_cons': 'mean'
+    }).reset_index().rename(columns={'customer_id': 'customer_count'})
+    result = state_counts_from_partials(combine_state_partials(
+        [state_partials(batch) for batch in batches(orders)]
+    ))
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import parquet_cache
+import segments
+from aggregates import (
+    delivery_status_counts, late_and_reviews_from_partials, period_status_counts, top_city_status
+)
+from calendar_dim import rollup_daily_status
+from delivery_times import delivery_percentiles, percentiles_from_histogram
+from fact_tables import ITEM_COLUMNS, ORDER_COLUMNS
+
+
+@pytest.fixture
+def item_csv(tmp_path, monkeypatch):
+    # Data level item: pesanan dengan beberapa item (kadang beda kategori) dan baris item yang terduplikasi
+    monkeypatch.setattr(parquet_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    rng = np.random.default_rng(0)
+    purchase = pd.Timestamp("2017-01-01") + pd.to_timedelta(rng.integers(0, 700 * 24, 200), unit="h")
+    orders = pd.DataFrame({
+        'order_id': [f"o{i}" for i in range(200)],
+        'customer_id': [f"c{i}" for i in rng.integers(0, 60, 200)],
+        'order_purchase_timestamp': purchase,
+        'order_delivered_customer_date': purchase + pd.to_timedelta(rng.integers(1, 30, 200), unit="D"),
+        'order_estimated_delivery_date': purchase + pd.Timedelta(days=15),
+        # Banyak kota dengan sedikit pesanan: total kembar di antara 10 kota teratas
+        'customer_city': rng.choice([f"city{i:02d}" for i in range(15)], 200),
+        'customer_state': rng.choice(["SP", "RJ", None], 200),
+        'geolocation_lat_cons': rng.normal(size=200),
+        'geolocation_lng_cons': rng.normal(size=200),
+        'calculated_review_score': rng.choice([1.0, 2.0, 3.0, 4.0, 5.0, np.nan], 200),
+        'payment_value_sum': rng.uniform(10, 100, 200).round(2),
+    })
+    orders['delivered_late'] = orders['order_delivered_customer_date'] > orders['order_estimated_delivery_date']
+    items = orders.loc[orders.index.repeat(rng.integers(1, 4, 200))].reset_index(drop=True)
+    items['product_category_name_english'] = rng.choice(["toys", "books", "garden"], len(items))
+    items['shipping_late'] = rng.random(len(items)) < 0.2
+    for column in ['product_weight_g', 'product_length_cm', 'product_height_cm', 'product_width_cm']:
+        items[column] = rng.integers(1, 50, len(items)).astype(float)
+    path = tmp_path / "items.csv"
+    items[list(dict.fromkeys(ORDER_COLUMNS + ITEM_COLUMNS))].sample(frac=1, random_state=1).to_csv(path, index=False)
+    return str(path)
+
+
+def pandas_orders(item_csv):
+    # Referensi: segmen tahunan backend pandas (baris pertama per order_id)
+    paths = segments.year_segments(item_csv, "v1")
+    return paths, pd.concat([pd.read_parquet(path) for path in paths.values()], ignore_index=True)
+
+
+def assert_same_rfm(rfm, expected):
+    pd.testing.assert_frame_equal(
+        rfm.sort_index().astype(float), expected.sort_index().astype(float), check_names=False
+    )
+
+
+def test_duckdb_counts_orders_not_items(item_csv):
+    sql_backend = pytest.importorskip("sql_backend")
+    pytest.importorskip("duckdb")
+    paths, orders = pandas_orders(item_csv)
+    source = sql_backend.order_parquet(sql_backend.materialize_parquet(item_csv, "v1"))
+    start, end = orders['order_purchase_timestamp'].min().date(), orders['order_purchase_timestamp'].max().date()
+    categories = sorted(orders['product_category_name_english'].unique())
+
+    late = sql_backend.delivery_status_counts(source, start, end, categories)
+    expected = orders.groupby('delivered_late')['order_id'].count()
+    assert late.set_index('delivered_late')['order_id'].to_dict() == expected.to_dict()
+    assert_same_rfm(sql_backend.rfm_metrics(source, "2018-06-30"), segments.rfm_metrics(paths, "2018-06-30"))
+
+
+def test_polars_counts_orders_not_items(item_csv):
+    polars_backend = pytest.importorskip("polars_backend")
+    pytest.importorskip("polars")
+    paths, orders = pandas_orders(item_csv)
+    source = polars_backend.order_parquet(polars_backend.materialize_parquet(item_csv, "v1"))
+    start, end = orders['order_purchase_timestamp'].min().date(), orders['order_purchase_timestamp'].max().date()
+    categories = tuple(sorted(orders['product_category_name_english'].unique()))
+
+    late = polars_backend.dashboard_frames(source, start, end, categories)['df_late']
+    expected = orders.groupby('delivered_late')['order_id'].count()
+    assert late.set_index('delivered_late')['order_id'].to_dict() == expected.to_dict()
+    assert_same_rfm(polars_backend.rfm_metrics(source, "2018-06-30"), segments.rfm_metrics(paths, "2018-06-30"))
+
+
+WINDOWS = [
+    ("2017-01-01", "2018-12-31"),  # seluruh data
+    ("2017-03-10", "2017-11-02"),  # potongan di tengah bulan/minggu/kuartal
+    ("2017-06-01", "2017-06-01"),  # satu hari
+    ("2016-01-01", "2016-12-31"),  # sebelum data: kosong
+]
+
+
+def filter_cases(categories):
+    masks = [
+        np.ones(len(categories), dtype=bool),
+        np.arange(len(categories)) % 2 == 0,
+        np.zeros(len(categories), dtype=bool),  # tanpa kategori: kosong
+    ]
+    for window in WINDOWS:
+        for mask in masks:
+            yield pd.Timestamp(window[0]).date(), pd.Timestamp(window[1]).date(), mask
+
+
+def test_duckdb_queries_match_pandas_aggregates(item_csv):
+    # Query SQL yang semantiknya paling mudah bergeser (FILTER, HAVING, NULL, urutan nilai kembar)
+    # dibandingkan dengan agregat backend pandas untuk berbagai rentang tanggal dan kategori
+    sql_backend = pytest.importorskip("sql_backend")
+    pytest.importorskip("duckdb")
+    paths = segments.year_segments(item_csv, "v1")
+    summary = segments.scan(paths)
+    aggregates = segments.order_aggregates(paths, summary)
+    categories = summary['categories']
+    source = sql_backend.order_parquet(sql_backend.materialize_parquet(item_csv, "v1"))
+    assert list(sql_backend.categories(source)) == list(categories)
+
+    pd.testing.assert_frame_equal(
+        sql_backend.state_customer_counts(source), aggregates['state_grouped'], check_dtype=False
+    )
+    for start, end, mask in filter_cases(categories):
+        selected = list(categories[mask])
+
+        pd.testing.assert_frame_equal(
+            sql_backend.delivery_status_counts(source, start, end, selected),
+            delivery_status_counts(aggregates['status_index'], start, end, mask),
+            check_dtype=False,
+        )
+        for granularity in ['month', 'week', 'quarter']:
+            pd.testing.assert_frame_equal(
+                rollup_daily_status(sql_backend.daily_status_counts(source, start, end, selected), granularity),
+                period_status_counts(aggregates['status_index'], start, end, mask, granularity),
+                check_dtype=False,
+            )
+
+        top = sql_backend.top_city_status(source, start, end, selected)
+        expected = top_city_status(aggregates['city_partials'], start, end, mask)
+        assert list(top.index) == list(expected.index)
+        assert top.to_numpy().tolist() == expected.to_numpy().tolist()
+
+        late = sql_backend.late_and_reviews(source, start, end, selected)
+        expected = late_and_reviews_from_partials(aggregates['city_partials'], start, end, mask)
+        assert list(late.index) == list(expected.index)
+        assert late['late_orders'].tolist() == expected['late_orders'].tolist()
+        np.testing.assert_allclose(late['avg_review_score'], expected['avg_review_score'])
+
+        for by in ['customer_state', 'product_category_name_english']:
+            pd.testing.assert_frame_equal(
+                percentiles_from_histogram(sql_backend.delivery_histogram(source, start, end, selected, by), by),
+                delivery_percentiles(aggregates['delivery_index'], start, end, mask, by, categories),
+                check_dtype=False,
+            )
@@ -0,0 +1,18 @@
+import numpy as np
+
+from bootstrap import relationship_stats
+
+
+def test_relationship_stats_recovers_linear_trend():
+    x = np.arange(20, dtype=float)
+    stats = relationship_stats(x, 4.5 - 0.1 * x, n_resamples=200)
+    assert np.isclose(stats['pearson_r'], -1)
+    assert np.isclose(stats['slope'], -0.1)
+    assert np.isclose(stats['intercept'], 4.5)
+
+
+def test_relationship_stats_without_variation_is_undefined():
+    # Semua kota punya jumlah keterlambatan atau skor review yang sama
+    assert relationship_stats([1, 1, 1, 1], [4.0, 3.5, 5.0, 2.0]) is None
+    assert relationship_stats([1, 2, 3, 4], [4.0, 4.0, 4.0, 4.0]) is None
+    assert relationship_stats([1, 2], [4.0, 3.0]) is None
@@ -0,0 +1,58 @@
+from streamlit.testing.v1 import AppTest
+
+from category_filter import decode_mask
+
+CATEGORIES = ["books", "garden", "health", "toys", "watches"]
+
+
+def selector_app():
+    import streamlit as st
+
+    from category_filter import category_selector, encode_mask
+
+    mask = category_selector(["books", "garden", "health", "toys", "watches"])
+    st.text(encode_mask(mask))
+
+
+def run(at):
+    at.run()
+    assert not at.exception
+    return at.multiselect[0], decode_mask(at.text[0].value, len(CATEGORIES)).tolist()
+
+
+def test_multiselect_keeps_widget_and_mask_in_sync():
+    at = AppTest.from_function(selector_app, default_timeout=30)
+    widget, mask = run(at)
+    widget_id = widget.id
+    assert widget.value == CATEGORIES and all(mask)
+
+    # Pilihan pengguna ditulis balik ke bitmask; ID widget tetap (key stabil)
+    widget.unselect("health")
+    widget, mask = run(at)
+    assert mask == [True, True, False, True, True]
+    assert widget.value == ["books", "garden", "toys", "watches"]
+    assert widget.id == widget_id
+
+    # Pencarian mempersempit opsi; kategori di luar hasil pencarian tetap terpilih
+    at.text_input[0].input("o")
+    widget, mask = run(at)
+    assert widget.options == ["books", "toys"]
+    assert widget.value == ["books", "toys"]
+    assert widget.id == widget_id
+
+    # Kosongkan hanya kategori yang terlihat, lalu kembalikan semua opsi
+    at.button[1].click()
+    widget, mask = run(at)
+    assert widget.value == []
+    assert mask == [False, True, False, False, True]
+    at.text_input[0].input("")
+    widget, mask = run(at)
+    assert widget.value == ["garden", "watches"]
+    assert mask == [False, True, False, False, True]
+    assert widget.id == widget_id
+
+    # Perubahan pilihan di rerun berikutnya tetap dihitung dari bitmask terbaru
+    widget.select("books")
+    widget, mask = run(at)
+    assert widget.value == ["books", "garden", "watches"]
+    assert mask == [True, True, False, False, True]
@@ -0,0 +1,141 @@
+import io
+import json
+import os
+import threading
+import time
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+import fetch
+import parquet_cache
+from loadtest import _DataHandler
+
+
+class SlowHandler(_DataHandler):
+    # Server data dengan latensi buatan per respons dan per potongan isi (stream lambat), plus ETag dari
+    # mtime/ukuran file; setiap request dicatat (status dan header validator) untuk diperiksa test
+    latency = 0.05
+    chunk_delay = 0.002
+    requests = []
+
+    def _etag(self):
+        stat = os.stat(self.translate_path(self.path))
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    def do_GET(self):
+        self.requests.append({
+            "if_none_match": self.headers.get("If-None-Match"),
+            "if_modified_since": self.headers.get("If-Modified-Since"),
+        })
+        if self.headers.get("If-None-Match") == self._etag():
+            time.sleep(self.latency)
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        super().do_GET()
+
+    def send_response(self, code, message=None):
+        super().send_response(code, message)
+        self.requests[-1]["status"] = code
+        if code in (200, 304):
+            self.send_header("ETag", self._etag())
+
+    def copyfile(self, source, outputfile):
+        while chunk := source.read(16 * 1024):
+            time.sleep(self.chunk_delay)
+            outputfile.write(chunk)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(parquet_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    handler = type("Handler", (SlowHandler,), {"requests": []})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=str(data_dir)))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield data_dir, f"http://127.0.0.1:{httpd.server_port}/", handler.requests
+    httpd.shutdown()
+
+
+def write_csv(path, seed, mtime):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        'order_id': [f"o{seed}-{i}" for i in range(20_000)],
+        'customer_city': rng.choice(["sao paulo", "rio de janeiro", "curitiba"], 20_000),
+        'payment_value_sum': rng.random(20_000).round(2) * 500,
+        'calculated_review_score': rng.choice([1.0, 3.0, 5.0, np.nan], 20_000),
+    }).to_csv(path, index=False)
+    # Last-Modified berresolusi detik: versi baru diberi mtime yang jelas berbeda
+    os.utime(path, (mtime, mtime))
+
+
+def test_streamed_parse_matches_full_download(server):
+    data_dir, base_url, _ = server
+    write_csv(data_dir / "orders.csv", seed=0, mtime=1_700_000_000)
+    url = base_url + "orders.csv"
+
+    full = requests.get(url, timeout=fetch.TIMEOUT).content
+    streamed = fetch.read_csv(url)
+    pd.testing.assert_frame_equal(streamed, pd.read_csv(io.BytesIO(full)))
+
+    # Salinan cache hasil tee identik byte demi byte dengan unduhan penuh
+    path, _ = fetch._cache_paths(url)
+    with open(path, "rb") as cached:
+        assert cached.read() == full
+
+
+def test_parser_stopping_early_still_caches_whole_file(server):
+    data_dir, base_url, requests_seen = server
+    write_csv(data_dir / "orders.csv", seed=0, mtime=1_700_000_000)
+    url = base_url + "orders.csv"
+
+    head = fetch.read_csv(url, nrows=10)
+    assert len(head) == 10
+    path, _ = fetch._cache_paths(url)
+    with open(path, "rb") as cached, open(data_dir / "orders.csv", "rb") as original:
+        assert cached.read() == original.read()
+
+    # Salinan lengkap membuat request berikutnya cukup divalidasi ulang
+    pd.testing.assert_frame_equal(fetch.read_csv(url), pd.read_csv(data_dir / "orders.csv"))
+    assert [request["status"] for request in requests_seen] == [200, 304]
+
+
+def test_conditional_get_reuses_etag_and_last_modified(server):
+    data_dir, base_url, requests_seen = server
+    write_csv(data_dir / "orders.csv", seed=0, mtime=1_700_000_000)
+    url = base_url + "orders.csv"
+
+    first = fetch.read_csv(url)
+    _, meta_path = fetch._cache_paths(url)
+    with open(meta_path) as meta_file:
+        meta = json.load(meta_file)
+    assert meta["etag"] and meta["last_modified"]
+    assert requests_seen[0] == {"if_none_match": None, "if_modified_since": None, "status": 200}
+
+    # Tidak berubah: validator dari respons pertama dikirim ulang, server menjawab 304, isi dari cache disk
+    pd.testing.assert_frame_equal(fetch.read_csv(url), first)
+    assert requests_seen[1] == {
+        "if_none_match": meta["etag"], "if_modified_since": meta["last_modified"], "status": 304,
+    }
+
+    # Berubah: 200 dengan isi baru, lalu validator barunya yang dipakai untuk revalidasi berikutnya
+    write_csv(data_dir / "orders.csv", seed=1, mtime=1_700_000_100)
+    changed = fetch.read_csv(url)
+    pd.testing.assert_frame_equal(changed, pd.read_csv(data_dir / "orders.csv"))
+    assert not changed.equals(first)
+    assert requests_seen[2]["status"] == 200
+    with open(meta_path) as meta_file:
+        new_meta = json.load(meta_file)
+    assert new_meta["etag"] != meta["etag"]
+
+    pd.testing.assert_frame_equal(fetch.read_csv(url), changed)
+    assert requests_seen[3] == {
+        "if_none_match": new_meta["etag"], "if_modified_since": new_meta["last_modified"], "status": 304,
+    }
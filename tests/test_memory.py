@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import memory
+import segments
+
+
+@pytest.fixture(autouse=True)
+def reports(monkeypatch):
+    monkeypatch.setattr(memory, "REPORTS", {})
+
+
+def frame(n=1_000):
+    return pd.DataFrame({
+        'order_id': [f"o{i}" for i in range(n)],
+        'customer_state': np.resize(["SP", "RJ", "MG"], n),
+        'payment_value_sum': np.arange(n) * 0.5,
+        'order_items': np.ones(n, dtype=np.int64),
+    })
+
+
+def test_optimize_frame_leaves_input_untouched():
+    df = frame()
+    original = df.copy()
+    optimized = memory.optimize_frame("orders", df)
+    pd.testing.assert_frame_equal(df, original)
+    assert optimized is not df
+    assert str(optimized['customer_state'].dtype) == 'category'
+    assert optimized['order_items'].dtype == np.uint8
+    assert memory.REPORTS["orders"]['bytes_after'].sum() < memory.REPORTS["orders"]['bytes_before'].sum()
+
+
+def test_estimate_rejected_before_loading(tmp_path):
+    path = str(tmp_path / "items.parquet")
+    frame(50_000).to_parquet(path)
+    estimate = segments.estimated_bytes(path)
+    actual = pd.read_parquet(path).memory_usage(deep=True).sum()
+    assert 0.5 * actual < estimate < 2 * actual
+
+    budget_mb = estimate / 2**20 / 2
+    with pytest.raises(memory.MemoryBudgetExceeded, match="Memuat items"):
+        memory.check_estimate("items", estimate, budget_mb=budget_mb, mode="enforce")
+    with pytest.warns(ResourceWarning):
+        memory.check_estimate("items", estimate, budget_mb=budget_mb, mode="warn")
+    memory.check_estimate("items", estimate, budget_mb=2 * estimate / 2**20, mode="enforce")
+
+
+def test_estimate_replaces_previous_version():
+    memory.optimize_frame("items", frame(20_000))
+    loaded = memory.total_bytes()
+    # Versi baru dengan ukuran yang sama menggantikan versi lama, tidak ditambahkan di atasnya
+    memory.check_estimate("items", loaded, budget_mb=1.5 * loaded / 2**20, mode="enforce")
+    with pytest.raises(memory.MemoryBudgetExceeded):
+        memory.check_estimate("other", loaded, budget_mb=1.5 * loaded / 2**20, mode="enforce")
@@ -0,0 +1,46 @@
+import runpy
+import time
+
+import pytest
+
+import profiling
+
+SCRIPT = """
+import time
+import profiling
+
+profiler = profiling.start_rerun(__file__)
+time.sleep(0.05)
+if FAIL:
+    raise RuntimeError("rerun gagal")
+"""
+
+
+@pytest.fixture
+def run_script(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "ENABLED", True)
+    monkeypatch.setattr(profiling, "MIN_INTERVAL", 0.0)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(profiling, "_active", None)
+    monkeypatch.setattr(profiling, "_last_started", float("-inf"))
+    script = tmp_path / "app.py"
+    script.write_text(SCRIPT)
+    # Script app dijalankan di thread ini seperti oleh runner Streamlit
+    return lambda fail: runpy.run_path(str(script), init_globals={'FAIL': fail})
+
+
+def test_finished_rerun_writes_profile(run_script, tmp_path):
+    profiler = run_script(False)['profiler']
+    path = profiling.finish_rerun(profiler, state="default")
+    assert path.startswith(str(tmp_path / "profiles"))
+    assert profiling._active is None
+
+
+def test_failed_rerun_releases_profiler_slot(run_script):
+    with pytest.raises(RuntimeError):
+        run_script(True)
+    deadline = time.monotonic() + 2
+    while profiling._active is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert profiling._active is None
+    assert run_script(False)['profiler'] is not None
@@ -0,0 +1,59 @@
+import pandas as pd
+
+from rfm import RfmLookup, rfm_metrics, score_rfm
+
+
+def orders(n_customers=40, start="2017-01-05"):
+    # Satu pesanan per pelanggan per hari; pelanggan terakhir belum menerima pesanannya
+    purchase = pd.date_range(start, periods=n_customers, freq="D")
+    delivered = pd.Series(purchase + pd.Timedelta(days=3))
+    delivered.iloc[-1] = pd.NaT
+    return pd.DataFrame({
+        'order_id': [f"o{i}" for i in range(n_customers)],
+        'customer_id': [f"c{i}" for i in range(n_customers)],
+        'order_purchase_timestamp': purchase,
+        'order_delivered_customer_date': delivered,
+        'payment_value_sum': [10.0] * n_customers,
+    })
+
+
+def test_early_as_of_date_scores_every_customer():
+    # Di awal data Recency, Frequency dan Monetary hampir konstan: batas kuantil nilai tidak unik
+    df = orders()
+    rfm = score_rfm(rfm_metrics(df, "2017-01-10"))
+    assert len(rfm) == 6
+    for rank in ['R_rank', 'F_rank', 'M_rank']:
+        assert rfm[rank].between(1, 5).all()
+    assert set(rfm.attrs['rank_bins']) == {'Recency', 'Monetary'}
+    explained = RfmLookup(rfm).explain(rfm.index[0])
+    assert explained is not None
+
+
+def test_customer_without_delivery_is_least_recent():
+    df = orders(n_customers=10)
+    rfm = score_rfm(rfm_metrics(df, "2017-02-01"))
+    assert rfm.loc['c9', 'Recency'] == rfm['Recency'].max()
+    assert rfm.loc['c9', 'R_rank'] == 5
+
+
+def test_as_of_before_first_order_is_empty():
+    rfm = score_rfm(rfm_metrics(orders(), "2016-12-01"))
+    assert rfm.empty
+    assert list(rfm.columns[-2:]) == ['RFM_Score', 'Segment']
+
+
+def test_rank_fallback_survives_parquet_cache(tmp_path, monkeypatch):
+    # Pelanggan yang berulang membuat batas kuantil Frequency tidak unik (jalur skor berbasis peringkat)
+    import parquet_cache
+
+    monkeypatch.setattr(parquet_cache, "CACHE_DIR", str(tmp_path))
+    df = orders(n_customers=40)
+    df['customer_id'] = [f"c{i % 30}" for i in range(40)]
+    rfm = score_rfm(rfm_metrics(df, "2017-03-31"))
+    assert rfm['Frequency'].nunique() > 1
+
+    written = parquet_cache.cached_frame("rfm_test", "v1", lambda: rfm)
+    cached = parquet_cache.cached_frame("rfm_test", "v1", lambda: None)
+    pd.testing.assert_frame_equal(cached, written)
+    assert {metric: tuple(bins) for metric, bins in cached.attrs['rank_bins'].items()} == rfm.attrs['rank_bins']
+    assert RfmLookup(cached).explain('c0') is not None
@@ -0,0 +1,57 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import warmup
+
+
+@pytest.fixture
+def ready_url(monkeypatch):
+    monkeypatch.setattr(warmup, "_state", {"status": "pending", "error": None, "seconds": None, "attempts": 0})
+    monkeypatch.setattr(warmup.Runtime, "exists", staticmethod(lambda: True))
+    monkeypatch.setattr(warmup, "BACKOFF", 0)
+    monkeypatch.setattr(warmup, "RETRIES", 3)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), warmup._ReadinessHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/ready"
+    server.shutdown()
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.load(exc)
+
+
+def test_not_ready_while_retries_remain(ready_url, monkeypatch):
+    seen = []
+
+    def warm_caches(app):
+        # Status yang terlihat oleh health check saat percobaan berikutnya dimulai
+        seen.append(get(ready_url))
+        if len(seen) < 3:
+            raise OSError("sumber data belum bisa dijangkau")
+
+    monkeypatch.setattr(warmup, "warm_caches", warm_caches)
+    warmup._run("app_dinamyc.py")
+    assert [code for code, _ in seen] == [503, 503, 503]
+    assert [state["status"] for _, state in seen] == ["warming", "retrying", "retrying"]
+    code, state = get(ready_url)
+    assert (code, state["status"], state["error"], state["attempts"]) == (200, "ready", None, 3)
+
+
+def test_degraded_after_retries_exhausted(ready_url, monkeypatch):
+    def warm_caches(app):
+        raise OSError("sumber data tidak bisa dijangkau")
+
+    monkeypatch.setattr(warmup, "warm_caches", warm_caches)
+    warmup._run("app_dinamyc.py")
+    code, state = get(ready_url)
+    assert (code, state["status"], state["attempts"]) == (200, "degraded", 3)
+    assert "OSError" in state["error"]
@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from streamlit.runtime import Runtime
+
+from dashboard_data import warm_caches
+
+logger = logging.getLogger(__name__)
+
+READY_PORT = int(os.environ.get("WARMUP_READY_PORT", "8502"))
+# Endpoint kesiapan hanya untuk health check lokal/sidecar; isi 0.0.0.0 agar bisa diakses dari luar host
+READY_HOST = os.environ.get("WARMUP_READY_HOST", "127.0.0.1")
+# Warm-up yang gagal (misalnya sumber data sementara tidak bisa dijangkau) dicoba ulang dengan jeda
+# yang berlipat dua, dari BACKOFF sampai paling lama MAX_BACKOFF detik
+RETRIES = int(os.environ.get("WARMUP_RETRIES", "5"))
+BACKOFF = float(os.environ.get("WARMUP_BACKOFF", "2"))
+MAX_BACKOFF = float(os.environ.get("WARMUP_MAX_BACKOFF", "60"))
+
+# Status: pending -> warming -> ready; percobaan yang gagal membuat status "retrying" selama masih ada sisa
+# percobaan, lalu "degraded" jika semuanya habis (server tetap melayani dan mengisi cache saat dibutuhkan)
+_state = {"status": "pending", "error": None, "seconds": None, "attempts": 0}
+_lock = threading.Lock()
+_thread = None
+
+
+def readiness():
+    return dict(_state)
+
+
+def _run(app):
+    # Tunggu runtime Streamlit aktif supaya cache yang diisi adalah cache milik server
+    while not Runtime.exists():
+        time.sleep(0.1)
+
+    _state["status"] = "warming"
+    started = time.perf_counter()
+    delay = BACKOFF
+    for attempt in range(1, RETRIES + 1):
+        _state["attempts"] = attempt
+        try:
+            warm_caches(app)
+        except Exception as exc:
+            logger.exception("Cache warm-up gagal (percobaan %d dari %d)", attempt, RETRIES)
+            _state.update(status="retrying" if attempt < RETRIES else "degraded", error=repr(exc))
+            if attempt < RETRIES:
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_BACKOFF)
+        else:
+            _state.update(status="ready", error=None)
+            break
+    _state["seconds"] = round(time.perf_counter() - started, 2)
+    logger.info("Cache warm-up selesai: %s", _state)
+
+
+class _ReadinessHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("/ready", ""):
+            self.send_error(404)
+            return
+        state = readiness()
+        body = json.dumps(state).encode()
+        # 503 selama warm-up atau percobaan ulang masih berjalan; degraded (percobaan habis) tetap 200:
+        # server bisa melayani, hanya cache belum hangat (detail di "error")
+        self.send_response(200 if state["status"] in ("ready", "degraded") else 503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(app="app_dinamyc.py", ready_port=READY_PORT, ready_host=READY_HOST):
+    # Idempoten: hanya satu thread warm-up per proses server; app = script yang dijalankan server
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return _thread
+        _thread = threading.Thread(target=_run, args=(app,), name="cache-warmup", daemon=True)
+        _thread.start()
+
+        if ready_port:
+            server = ThreadingHTTPServer((ready_host, ready_port), _ReadinessHandler)
+            threading.Thread(target=server.serve_forever, name="readiness", daemon=True).start()
+    return _thread